@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import html
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from blockCoordinator import detect_block, get_coordinator, host_of
+from httpClient import async_headers, make_async_client, retry_delay
+from pdpExtractor import STRUCTURED_RE
+from priceHistory import HISTORY_DB
+from productSchema import extract_product
+from runMetrics import metrics
+from urlFrontier import canonicalize
+
+logger = logging.getLogger(__name__)
+
+WATCH_FIELDS = ['availability_shipping_status', 'availability_shipping_type',
+                'availability_collect_status', 'availability_collect_type']
+INTERVAL = 20        # seconds between polls of one product
+CONCURRENCY = 4      # requests in flight across the whole watchlist
+EVENTS_FILE = os.path.join('logs', 'availability_events.jsonl')
+TITLE_SCAN = 4096  # characters searched for the <title> of a block page
+
+def extract_availability(page_source):
+    """WATCH_FIELDS from the first data-productdatalayer on a product page, or None."""
+    for match in STRUCTURED_RE.finditer(page_source):
+        if match.group('dl') is None:
+            continue
+        try:
+            data = json.loads(html.unescape(match.group('dl')))
+        except ValueError:
+            continue
+        record = extract_product(data[0] if isinstance(data, list) and data else data, {})
+        return {field: record[field] for field in WATCH_FIELDS}
+    return None
+
+def page_title(page_source):
+    head = page_source[:TITLE_SCAN].lower()
+    start = head.find('<title>')
+    end = head.find('</title>', start)
+    return page_source[start + 7:end] if start >= 0 and end > start else None
+
+def resolve_targets(targets, history_path=HISTORY_DB):
+    """[(product_code or None, url)] for a mix of URLs and product codes; codes are looked up
+    in the price history's latest 'url' values."""
+    resolved, codes = [], []
+    for target in targets:
+        if target.isdigit():
+            codes.append(target)
+        else:
+            resolved.append((None, canonicalize(target)))
+    if codes:
+        known = {}
+        if os.path.exists(history_path):
+            conn = sqlite3.connect(history_path)
+            try:
+                known = dict(conn.execute(
+                    'SELECT p.product_code, l.value FROM products p JOIN latest l ON l.product_id = p.id '
+                    "WHERE l.field = 'url' AND p.product_code IN (%s)" % ','.join('?' * len(codes)), codes
+                ).fetchall())
+            finally:
+                conn.close()
+        for code in codes:
+            if known.get(code):
+                resolved.append((code, known[code]))
+            else:
+                logger.error("No URL known for product %s; pass its product page URL instead", code)
+    return resolved
+
+class Watch:
+    """Polls a few dozen product pages on a fixed cadence and reports availability changes.
+
+    Each page is fetched over one pooled HTTP client (no browser) with If-None-Match /
+    If-Modified-Since, so an unchanged page costs a 304. Polls are spread evenly over the
+    interval, at most `concurrency` are in flight, and a block pauses the host for every
+    scraper through the shared HostCoordinator. A change is reported within about one interval
+    plus one response time.
+    """
+
+    def __init__(self, targets, interval=INTERVAL, concurrency=CONCURRENCY, events_path=EVENTS_FILE,
+                 on_event=None):
+        self.targets = targets
+        self.interval = interval
+        self.concurrency = concurrency
+        self.events_path = events_path
+        self.on_event = on_event
+        self.state = {}
+        self.validators = {}
+        self.coordinator = get_coordinator()
+        if events_path and os.path.dirname(events_path):
+            os.makedirs(os.path.dirname(events_path), exist_ok=True)
+
+    async def run(self, duration=None):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        deadline = time.monotonic() + duration if duration else None
+        async with make_async_client(self.concurrency) as client:
+            await asyncio.gather(*(
+                self.watch(client, semaphore, code, url, self.interval * i / len(self.targets), deadline)
+                for i, (code, url) in enumerate(self.targets)
+            ))
+
+    async def watch(self, client, semaphore, code, url, offset, deadline):
+        due = time.monotonic() + offset
+        while deadline is None or due < deadline:
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            wait = await self.poll(client, semaphore, code, url)
+            due = max(due + self.interval, time.monotonic() + wait)
+
+    async def poll(self, client, semaphore, code, url):
+        """One conditional fetch; returns extra seconds to wait before this product's next poll."""
+        host = host_of(url)
+        paused = self.coordinator.blocked_for(host)
+        if paused:
+            return paused
+        headers = async_headers()
+        headers.update(self.validators.get(url, {}))
+        started = time.perf_counter()
+        try:
+            async with semaphore:
+                response = await client.get(url, headers=headers)
+        except Exception as e:
+            metrics.incr('fetch_errors')
+            logger.warning("Watch fetch failed for %s: %s", url, e)
+            return 0.0
+        metrics.observe('watch_fetch', time.perf_counter() - started)
+        metrics.incr('watch_polls')
+        if response.status_code == 304:
+            metrics.incr('not_modified')
+            return 0.0
+        if response.status_code in (429, 503):
+            # Rate limiting: back off this product as the server asks, without pausing the whole host
+            metrics.incr('throttled')
+            delay = retry_delay(2, response)
+            logger.warning("Watch got %s for %s, next poll in %.0fs", response.status_code, url, delay)
+            return delay
+        block = detect_block(response.status_code, page_title(response.text))
+        if block:
+            return self.coordinator.report_block(host, block)
+        if response.status_code != 200:
+            logger.warning("Watch got %s for %s", response.status_code, url)
+            return 0.0
+        self.coordinator.report_ok(host)
+        self.validators[url] = {
+            name: response.headers[header]
+            for name, header in (('If-None-Match', 'ETag'), ('If-Modified-Since', 'Last-Modified'))
+            if header in response.headers
+        }
+        current = extract_availability(response.text)
+        if current is None:
+            metrics.incr('watch_unparsed')
+            logger.warning("No data-productdatalayer on %s", url)
+            return 0.0
+        previous = self.state.get(url)
+        self.state[url] = current
+        if previous is None:
+            logger.info("Watching %s: %s", url, current)
+        else:
+            for field in WATCH_FIELDS:
+                if current[field] != previous[field]:
+                    self.emit({'product_code': code, 'url': url, 'field': field,
+                               'old': previous[field], 'new': current[field],
+                               'detected_at': datetime.now(timezone.utc).isoformat(timespec='milliseconds')})
+        return 0.0
+
+    def emit(self, event):
+        metrics.incr('availability_changes')
+        logger.warning("Availability change on %s: %s %r -> %r", event['url'], event['field'], event['old'], event['new'])
+        if self.events_path:
+            with open(self.events_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event) + '\n')
+        if self.on_event:
+            self.on_event(event)
+        else:
+            print(json.dumps(event), flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll product pages for availability changes (launch-day watch mode)")
+    parser.add_argument('targets', nargs='*', help="Product codes or product page URLs")
+    parser.add_argument('--file', help="File with one product code or URL per line")
+    parser.add_argument('--interval', type=float, default=INTERVAL, help="Seconds between polls of each product")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--duration', type=float, help="Stop after this many seconds (default: run until interrupted)")
+    parser.add_argument('--events', default=EVENTS_FILE, help="Append change events to this JSON-lines file")
+    parser.add_argument('--history', default=HISTORY_DB, help="Price history used to look up product codes")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    targets = list(args.targets)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            targets += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    resolved = resolve_targets(targets, args.history)
+    if not resolved:
+        parser.error("nothing to watch")
+    cycle = len(resolved) * 0.5 / args.concurrency  # at ~0.5s per response
+    if cycle > args.interval:
+        logger.warning("%s products at concurrency %s need about %.0fs per cycle, more than the %.0fs interval",
+                       len(resolved), args.concurrency, cycle, args.interval)
+    random.shuffle(resolved)
+    try:
+        asyncio.run(Watch(resolved, args.interval, args.concurrency, args.events).run(args.duration))
+    except KeyboardInterrupt:
+        pass
+    logger.info("Watch finished: %s", metrics.report()['counters'])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+from currysStandIn import add_config_arguments, config_from_args, start_server
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ['requests', 'selenium', 'proxy', 'playwright']
+
+def make_fetcher(backend):
+    """Return (fetch(url) -> soup or None, close()) for one of the scrapers' fetch paths."""
+    if backend == 'requests':
+        import currysScrapeBS4
+        return currysScrapeBS4.get_soup, lambda: None
+    if backend == 'selenium':
+        import fullDataLayerCatSync
+        from browserDaemon import close_driver
+        driver = fullDataLayerCatSync.setup_driver()
+        return lambda url: fullDataLayerCatSync.get_soup(url, driver), lambda: close_driver(driver)
+    if backend == 'proxy':
+        import fullDataLayerCatProxy
+        driver = fullDataLayerCatProxy.setup_driver()
+        return lambda url: fullDataLayerCatProxy.get_soup(url, driver, []), driver.quit
+    if backend == 'playwright':
+        import fullDataLayerCatPlayright
+        return fullDataLayerCatPlayright.get_soup_playwright, lambda: None
+    raise ValueError(f"Unknown backend {backend}")
+
+def recovery_times(log):
+    """Seconds from the first error of each failure streak to the next 200 on a listing page."""
+    times = []
+    streak_start = None
+    for entry in sorted(log, key=lambda e: e['t']):
+        if entry['path'].startswith('/__'):
+            continue
+        if entry['status'] != 200:
+            if streak_start is None:
+                streak_start = entry['t']
+        elif streak_start is not None:
+            times.append(entry['t'] - streak_start)
+            streak_start = None
+    return times
+
+def run_backend(backend, server, time_limit):
+    """Crawl every stand-in category by following a.next links until done or out of time."""
+    urlopen(server.base_url + '/__reset').read()
+    try:
+        fetch, close = make_fetcher(backend)
+    except Exception as e:
+        logger.warning("Skipping %s backend: %s", backend, e)
+        return None
+
+    pages = tiles = failures = 0
+    start = time.perf_counter()
+    try:
+        for category_url in server.category_urls():
+            url = category_url
+            while url and time.perf_counter() - start < time_limit:
+                soup = fetch(url)
+                if soup is None:
+                    failures += 1
+                    break
+                pages += 1
+                tiles += len(soup.select('div[data-productdatalayer]'))
+                next_link = soup.select_one('a.next')
+                url = next_link['href'] if next_link else None
+    finally:
+        close()
+    elapsed = time.perf_counter() - start
+
+    stats = json.loads(urlopen(server.base_url + '/__stats').read())
+    recoveries = recovery_times(stats['log'])
+    return {
+        'pages': pages,
+        'tiles': tiles,
+        'failed_pages': failures,
+        'requests': stats['requests'],
+        'seconds': round(elapsed, 2),
+        'pages_per_min': round(pages / elapsed * 60, 1) if elapsed else 0,
+        'recoveries': len(recoveries),
+        'mean_recovery_seconds': round(sum(recoveries) / len(recoveries), 2) if recoveries else None,
+        'max_recovery_seconds': round(max(recoveries), 2) if recoveries else None
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end fetch backend benchmark against the local Currys stand-in")
+    parser.add_argument('--backend', action='append', choices=BACKENDS, help="Backend(s) to run (default: all)")
+    parser.add_argument('--time-limit', type=float, default=300, help="Seconds per backend")
+    parser.add_argument('--output', help="Write results as JSON")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('SCRAPER_LOG_DIR', os.path.join(tempfile.gettempdir(), 'benchFetchBackends-logs'))
+    server = start_server(config_from_args(args))
+    results = {}
+    try:
+        for backend in args.backend or BACKENDS:
+            result = run_backend(backend, server, args.time_limit)
+            if result is None:
+                continue
+            results[backend] = result
+            recovery = result['mean_recovery_seconds']
+            print(f"{backend:10s} pages={result['pages']:4d} pages/min={result['pages_per_min']:7.1f} "
+                  f"failed={result['failed_pages']:3d} recoveries={result['recoveries']:3d} "
+                  f"mean_recovery={recovery if recovery is not None else '-'}s")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from urllib.request import urlopen
+import currysScrapeBS4
+from currysStandIn import add_config_arguments, config_from_args, start_server
+
+logger = logging.getLogger(__name__)
+
+MODES = ['session-per-url', 'async-pooled-c1', 'async-pooled']
+
+def crawl_session_per_url(category_urls, concurrency):
+    """The current sync path: categories one after another, a new Session per page."""
+    for category_url in category_urls:
+        url = category_url
+        while url:
+            soup = currysScrapeBS4.get_soup(url)
+            if soup is None:
+                break
+            next_link = soup.find('a', class_='next')
+            url = currysScrapeBS4.canonicalize(next_link['href']) if next_link else None
+
+def crawl_async(category_urls, concurrency):
+    asyncio.run(currysScrapeBS4.scrape_all_async(category_urls, concurrency, delay=None))
+
+def run_mode(mode, server, concurrency):
+    urlopen(server.base_url + '/__reset').read()
+    crawl = crawl_session_per_url if mode == 'session-per-url' else crawl_async
+    if mode == 'async-pooled-c1':
+        concurrency = 1
+    start = time.perf_counter()
+    crawl(server.category_urls(), concurrency)
+    elapsed = time.perf_counter() - start
+
+    stats = json.loads(urlopen(server.base_url + '/__stats').read())
+    pages = sum(1 for entry in stats['log'] if entry['status'] == 200 and not entry['path'].startswith('/__'))
+    return {
+        'pages': pages,
+        'requests': stats['requests'],
+        'connections': stats['connections'] - 1,  # minus the /__stats request itself
+        'seconds': round(elapsed, 2),
+        'pages_per_min': round(pages / elapsed * 60, 1) if elapsed else 0
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="currysScrapeBS4 throughput: per-URL requests.Session vs the pooled async client"
+    )
+    parser.add_argument('--mode', action='append', choices=MODES, help="Mode(s) to run (default: all)")
+    parser.add_argument('--concurrency', type=int, default=currysScrapeBS4.CONCURRENCY)
+    parser.add_argument('--output', help="Write results as JSON")
+    add_config_arguments(parser)
+    # Loopback connects are free; charge each new connection roughly what a TLS handshake costs live
+    parser.set_defaults(connect_latency=0.05, latency=0.1, jitter=0.05)
+    args = parser.parse_args(argv)
+
+    server = start_server(config_from_args(args))
+    results = {}
+    try:
+        for mode in args.mode or MODES:
+            results[mode] = result = run_mode(mode, server, args.concurrency)
+            print(f"{mode:16s} pages={result['pages']:4d} connections={result['connections']:4d} "
+                  f"seconds={result['seconds']:6.2f} pages/min={result['pages_per_min']:7.1f}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from syntheticPages import make_pdp_page
+from pdpExtractor import extract_pdp, extract_with_selectors
+
+PAGES = 200
+JSON_LD_BLOCK_RE = re.compile(r'<script type="application/ld\+json">.*?</script>', re.S)
+DATA_LAYER_ATTR_RE = re.compile(r' data-productdatalayer="[^"]*"')
+
+def time_per_page(func, pages):
+    timings = []
+    for page in pages:
+        start = time.perf_counter()
+        func(page)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(timings[len(timings) // 2], 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95)], 3)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-PDP parse time: structured extraction vs CSS selectors")
+    parser.add_argument('--pages', type=int, default=PAGES)
+    parser.add_argument('--output', help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    pages = [make_pdp_page(i) for i in range(args.pages)]
+    # Same pages with the structured data removed, to time the fallback path
+    bare_pages = [DATA_LAYER_ATTR_RE.sub('', JSON_LD_BLOCK_RE.sub('', page)) for page in pages]
+    assert all(extract_pdp(page, '')[1] == 'structured' for page in pages[:5])
+    assert all(extract_pdp(page, '')[1] == 'selectors' for page in bare_pages[:5])
+
+    cases = {
+        'structured (extract_pdp)': lambda page: extract_pdp(page, ''),
+        'fallback (extract_pdp, no JSON-LD)': lambda page: extract_pdp(page, ''),
+        'selectors html.parser (old)': lambda page: extract_with_selectors(page, 'html.parser'),
+        'selectors lxml': lambda page: extract_with_selectors(page, 'lxml')
+    }
+    results = {}
+    for name, func in cases.items():
+        inputs = bare_pages if name.startswith('fallback') else pages
+        try:
+            results[name] = time_per_page(func, inputs)
+        except Exception as e:  # e.g. lxml not installed
+            print(f"{name:36s} skipped: {e}")
+            continue
+        r = results[name]
+        print(f"{name:36s} mean={r['mean_ms']:7.3f} ms  p50={r['p50_ms']:7.3f} ms  p95={r['p95_ms']:7.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
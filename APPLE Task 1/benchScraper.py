@@ -0,0 +1,156 @@
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from syntheticPages import make_listing_page
+
+BASELINE_FILE = 'bench_baseline.json'
+FIXTURE_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'failed_page_*.html')
+TILE_COUNTS = [50, 500, 5000]
+BACKENDS = ['html.parser', 'lxml', 'html5lib']
+MIN_SECONDS = 2.0  # per timed repeat
+# The baseline stores each case's median repeat and --check compares the best repeat against it:
+# on a shared machine noise only ever slows a run down, so a slow repeat or a lucky baseline run
+# cannot fail the check on its own
+REPEATS = 5
+TOLERANCE = 0.20
+
+def available_backends():
+    from bs4 import BeautifulSoup
+    backends = []
+    for backend in BACKENDS:
+        try:
+            BeautifulSoup('<p></p>', backend)
+            backends.append(backend)
+        except Exception:
+            continue
+    return backends
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+def run_case(backend, page, expected_tiles, repeats=REPEATS, min_seconds=MIN_SECONDS):
+    """Parse + flatten one page repeatedly; runs in a fresh process so peak RSS is per case.
+
+    One untimed warm-up parse, then `repeats` timed runs of at least `min_seconds` each; the
+    rates reported are the best run's, with the median alongside to show the spread.
+    """
+    from parseWorkers import parse_listing_html
+    logging.getLogger().setLevel(logging.ERROR)
+
+    def parse():
+        return parse_listing_html('bench', page, backend).records
+
+    products = parse()
+    if expected_tiles and len(products) != expected_tiles:
+        raise RuntimeError(f"{backend}: parsed {len(products)} of {expected_tiles} tiles")
+    baseline_rss = peak_rss_bytes()
+    runs = []
+    for _ in range(max(1, repeats)):
+        rounds = 0
+        start = time.perf_counter()
+        while True:
+            parse()
+            rounds += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                break
+        runs.append((rounds / elapsed, rounds, elapsed))
+    runs.sort()
+    pages_per_sec, rounds, elapsed = runs[-1]
+    median = runs[len(runs) // 2][0]
+    return {
+        'repeats': len(runs),
+        'rounds': rounds,
+        'seconds': elapsed,
+        'pages_per_sec': pages_per_sec,
+        'tiles_per_sec': pages_per_sec * expected_tiles if expected_tiles else None,
+        'median_tiles_per_sec': median * expected_tiles if expected_tiles else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'rss_growth_bytes': peak_rss_bytes() - baseline_rss
+    }
+
+def fixture_cases():
+    """Saved pages (the captured block pages) plus synthetic listings of each size."""
+    cases = []
+    for path in sorted(glob.glob(FIXTURE_GLOB)):
+        with open(path, encoding='utf-8') as f:
+            cases.append((os.path.basename(path), f.read(), 0))
+    for tiles in TILE_COUNTS:
+        page = make_listing_page(tiles, next_href='/computing/laptops/laptops/apple?page=2', seed=tiles)
+        cases.append((f'synthetic-{tiles}', page, tiles))
+    return cases
+
+def run_benchmarks(backends, repeats=REPEATS, min_seconds=MIN_SECONDS):
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for name, page, tiles in fixture_cases():
+            for backend in backends:
+                result = pool.apply(run_case, (backend, page, tiles, repeats, min_seconds))
+                result['page_bytes'] = len(page.encode('utf-8'))
+                results[f'{backend}/{name}'] = result
+                tiles_per_sec = f"{result['tiles_per_sec']:.0f}" if result['tiles_per_sec'] else '-'
+                median = f"{result['median_tiles_per_sec']:.0f}" if result['median_tiles_per_sec'] else '-'
+                print(f"{backend:12s} {name:24s} tiles/s={tiles_per_sec:>8s} (median {median:>6s}) "
+                      f"pages/s={result['pages_per_sec']:8.1f} peak_rss={result['peak_rss_bytes'] / 2**20:7.1f} MiB")
+    return results
+
+def check_baseline(results, baseline, tolerance):
+    """Return the cases whose best tiles/sec fell more than `tolerance` below the stored (median) baseline."""
+    regressions = []
+    for case, expected in baseline.items():
+        current = results.get(case)
+        if not current or not expected.get('tiles_per_sec') or not current.get('tiles_per_sec'):
+            continue
+        floor = expected['tiles_per_sec'] * (1 - tolerance)
+        if current['tiles_per_sec'] < floor:
+            regressions.append((case, current['tiles_per_sec'], expected['tiles_per_sec']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline parse/flatten benchmark over saved and synthetic listing pages")
+    parser.add_argument('--backend', action='append', help="Parser backend(s) to run (default: all installed)")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--check', action='store_true', help="Exit 1 if tiles/sec drops below the baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="Timed runs per case; the best one counts")
+    parser.add_argument('--min-seconds', type=float, default=MIN_SECONDS, help="Minimum length of each timed run")
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--output', help="Write the full results as JSON")
+    args = parser.parse_args(argv)
+
+    # Keep the per-run logs of the spawned workers out of ./logs
+    os.environ.setdefault('SCRAPER_LOG_DIR', os.path.join(tempfile.gettempdir(), 'benchScraper-logs'))
+    backends = args.backend or available_backends()
+    results = run_benchmarks(backends, args.repeats, args.min_seconds)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        baseline = {case: {'tiles_per_sec': round(r['median_tiles_per_sec'])}
+                    for case, r in results.items() if r['median_tiles_per_sec']}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    if args.check:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = check_baseline(results, baseline, args.tolerance)
+        for case, current, expected in regressions:
+            print(f"REGRESSION {case}: {current:.0f} tiles/s < {expected:.0f} tiles/s baseline (-{args.tolerance:.0%} allowed)")
+        if regressions:
+            return 1
+        print("Throughput within baseline tolerance")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
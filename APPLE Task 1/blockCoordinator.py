@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from runMetrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, each process backs off on its own view
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = os.environ.get('SCRAPER_BACKOFF_FILE', os.path.join('logs', 'host_backoff.json'))
+BLOCK_STATUSES = {403, 429, 503}
+# Titles of Cloudflare / WAF interstitials, e.g. "Attention Required! | Cloudflare"
+BLOCK_TITLE_RE = re.compile(r'attention required|just a moment|access denied|you have been blocked|cloudflare', re.I)
+BASE_DELAY = 30
+MAX_DELAY = 15 * 60
+STRIKE_RESET = 30 * 60  # a block this long after the previous one starts the backoff again from BASE_DELAY
+
+def detect_block(status=None, title=None):
+    """Reason string if the response status or page title says we were blocked, else None."""
+    if status in BLOCK_STATUSES:
+        return f'status {status}'
+    if title and BLOCK_TITLE_RE.search(title):
+        return f'title {title.strip()[:80]!r}'
+    return None
+
+def response_status(driver, url):
+    """Status of the last main-document response for `url` seen by a selenium-wire driver, else None."""
+    for request in reversed(getattr(driver, 'requests', [])):
+        if request.response and request.url.split('#')[0] == url.split('#')[0]:
+            return request.response.status_code
+    return None
+
+def host_of(url):
+    return urlsplit(url).netloc.lower()
+
+class HostCoordinator:
+    """Per-host backoff shared by every scraper process through a small file-locked JSON state.
+
+    A block reported by any worker pauses all of them for that host, with the pause doubling on
+    each further block (BASE_DELAY .. MAX_DELAY, jittered); the first success after the pause
+    clears the strikes.
+    """
+
+    def __init__(self, path=STATE_FILE, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.has_strikes = False
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Yield the host state dict under an exclusive lock and write it back on exit."""
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = {}
+                yield state
+                with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+                os.replace(self.path + '.tmp', self.path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def blocked_for(self, host):
+        """Seconds left on the host's pause (0 if none)."""
+        entry = self._read().get(host)
+        return max(0.0, entry['blocked_until'] - time.time()) if entry else 0.0
+
+    def wait(self, host):
+        """Sleep until the host's shared pause is over. Re-checks, as another worker may extend it."""
+        remaining = self.blocked_for(host)
+        if not remaining:
+            return
+        with metrics.stage('backoff_wait'):
+            while remaining:
+                logger.warning("Host %s paused after a block, waiting %.0fs", host, remaining)
+                time.sleep(remaining)
+                remaining = self.blocked_for(host)
+
+    def report_block(self, host, reason):
+        """Record a block and extend the pause for every worker; returns the pause in seconds."""
+        metrics.incr('blocks')
+        now = time.time()
+        with self._locked() as state:
+            entry = state.get(host, {'strikes': 0, 'blocked_until': 0, 'last_block': 0})
+            strikes = entry['strikes'] + 1 if now - entry['last_block'] < STRIKE_RESET else 1
+            delay = min(self.base_delay * 2 ** (strikes - 1), self.max_delay) * random.uniform(0.8, 1.2)
+            entry.update(strikes=strikes, last_block=now, reason=reason,
+                         blocked_until=max(entry['blocked_until'], now + delay))
+            state[host] = entry
+        self.has_strikes = True
+        metrics.set_gauge('host_backoff_strikes', strikes)
+        logger.error("Blocked on %s (%s): strike %s, pausing host for %.0fs", host, reason, strikes, delay)
+        return delay
+
+    def report_ok(self, host):
+        """Clear the strikes after a successful page; cheap no-op unless this process saw a block."""
+        if not self.has_strikes:
+            return
+        with self._locked() as state:
+            entry = state.get(host)
+            if entry and entry['blocked_until'] <= time.time():
+                state.pop(host)
+                logger.info("Host %s responding again, backoff cleared", host)
+        self.has_strikes = False
+        metrics.set_gauge('host_backoff_strikes', 0)
+
+_coordinator = None
+
+def get_coordinator():
+    """Process-wide coordinator over the shared state file."""
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = HostCoordinator()
+    return _coordinator
@@ -0,0 +1,190 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'currys-scraper')
+DRIVER_CACHE_FILE = os.path.join(CACHE_DIR, 'chromedriver.json')
+DRIVER_CACHE_TTL = 24 * 60 * 60
+STATE_FILE = os.path.join(CACHE_DIR, 'browser_daemon.json')
+PROFILE_DIR = os.path.join(CACHE_DIR, 'chrome-profile')
+DEFAULT_PORT = 9222
+CONSENT_URL = 'https://www.currys.co.uk/'
+COOKIE_BUTTON_SELECTOR = "button[id*='cookie'], button[class*='cookie'], a[class*='cookie'], #onetrust-accept-btn-handler"
+
+CHROME_CANDIDATES = [
+    'google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser',
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
+]
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+def cached_driver_path(ttl=DRIVER_CACHE_TTL):
+    """chromedriver path from ChromeDriverManager, cached so warm runs skip the version lookup."""
+    try:
+        with open(DRIVER_CACHE_FILE, encoding='utf-8') as f:
+            cached = json.load(f)
+        if time.time() - cached['resolved_at'] < ttl and os.path.exists(cached['path']):
+            return cached['path']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(DRIVER_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'path': path, 'resolved_at': time.time()}, f)
+    logger.info("Resolved chromedriver %s", path)
+    return path
+
+def find_chrome():
+    binary = os.environ.get('CHROME_BINARY')
+    if binary:
+        return binary
+    for candidate in CHROME_CANDIDATES:
+        path = shutil.which(candidate) or (candidate if os.path.exists(candidate) else None)
+        if path:
+            return path
+    raise FileNotFoundError("No Chrome/Chromium binary found; set CHROME_BINARY")
+
+def port_open(port, host='127.0.0.1'):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(0.5)
+        return s.connect_ex((host, port)) == 0
+
+def read_state():
+    """Daemon state ({'pid', 'port', ...}) if a daemon is running and reachable, else None."""
+    try:
+        with open(STATE_FILE, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if port_open(state['port']) else None
+
+def cdp_endpoint():
+    """http://127.0.0.1:<port> of the warm browser, for Playwright's connect_over_cdp."""
+    state = read_state()
+    return f"http://127.0.0.1:{state['port']}" if state else None
+
+def attach_driver():
+    """Selenium driver attached to the warm browser over its DevTools port, or None if no daemon."""
+    state = read_state()
+    if not state:
+        return None
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    options = Options()
+    options.debugger_address = f"127.0.0.1:{state['port']}"
+    driver = webdriver.Chrome(service=Service(cached_driver_path()), options=options)
+    driver.attached_to_daemon = True
+    logger.info("Attached to warm browser on port %s", state['port'])
+    return driver
+
+def close_driver(driver):
+    """quit() a driver we launched; only stop chromedriver for one attached to the daemon."""
+    if getattr(driver, 'attached_to_daemon', False):
+        driver.service.stop()
+    else:
+        driver.quit()
+
+def pre_consent(port):
+    """Open Currys once and accept cookies so the profile carries the consent for later runs."""
+    # Provisional state so attach_driver can find the port before start() records the pid
+    with open(STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'port': port}, f)
+    driver = attach_driver()
+    try:
+        driver.get(CONSENT_URL)
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, COOKIE_BUTTON_SELECTOR))
+        ).click()
+        logger.info("Accepted cookies in the warm profile")
+    except Exception as e:
+        logger.warning("Pre-consent step failed: %s", e)
+    finally:
+        close_driver(driver)
+
+def start(port=DEFAULT_PORT, headless=True, consent=True):
+    if read_state():
+        logger.info("Browser daemon already running")
+        return read_state()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    started = time.perf_counter()
+    args = [
+        find_chrome(),
+        f'--remote-debugging-port={port}',
+        f'--user-data-dir={PROFILE_DIR}',
+        '--no-first-run', '--no-default-browser-check',
+        '--disable-gpu', '--no-sandbox', '--disable-dev-shm-usage',
+        f'--user-agent={USER_AGENT}',
+        'about:blank'
+    ]
+    if headless:
+        args.insert(1, '--headless=new')
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + 30
+    while not port_open(port):
+        if process.poll() is not None or time.time() > deadline:
+            raise RuntimeError("Chrome did not open its DevTools port")
+        time.sleep(0.2)
+    cached_driver_path()
+    if consent:
+        pre_consent(port)
+    state = {'pid': process.pid, 'port': port, 'started': time.time(),
+             'startup_seconds': round(time.perf_counter() - started, 2)}
+    with open(STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    logger.info("Browser daemon pid %s listening on %s (%.1fs to warm)", process.pid, port, state['startup_seconds'])
+    return state
+
+def stop():
+    try:
+        with open(STATE_FILE, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        logger.info("No browser daemon state")
+        return
+    pid = state.get('pid')
+    if pid:
+        try:
+            os.killpg(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    os.remove(STATE_FILE)
+    logger.info("Stopped browser daemon pid %s", pid)
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived warm Chrome the scrapers attach to over CDP")
+    parser.add_argument('command', choices=['start', 'stop', 'status', 'resolve-driver'])
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--headed', action='store_true')
+    parser.add_argument('--no-consent', action='store_true', help="Skip the cookie pre-consent visit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'start':
+        start(args.port, headless=not args.headed, consent=not args.no_consent)
+    elif args.command == 'stop':
+        stop()
+    elif args.command == 'status':
+        state = read_state()
+        print(json.dumps(state) if state else 'not running')
+        return 0 if state else 1
+    elif args.command == 'resolve-driver':
+        print(cached_driver_path(ttl=0))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
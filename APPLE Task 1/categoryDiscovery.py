@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import time
+from urllib.parse import urlsplit
+from httpClient import RateLimiter, get_soup_async, make_async_client
+from runMetrics import metrics
+from urlFrontier import BASE_URL, canonicalize
+
+logger = logging.getLogger(__name__)
+
+# The categories every scraper crawled before discovery; still used when discovery finds nothing
+DEFAULT_CATEGORY_URLS = [
+    'https://www.currys.co.uk/computing/desktop-pcs/desktops/apple',
+    'https://www.currys.co.uk/computing/laptops/laptops/apple',
+    'https://www.currys.co.uk/phones/mobile-phones/mobile-phones/apple',
+    'https://www.currys.co.uk/smart-tech/smart-watches-and-fitness/smart-watches/apple',
+    'https://www.currys.co.uk/computing/ipad-tablets-and-ereaders/tablets/apple',
+    'https://www.currys.co.uk/phones/mobile-phone-accessories/mobile-phone-accessories/apple'
+]
+
+BRAND_URL = os.environ.get('SCRAPER_BRAND_URL', BASE_URL + '/brands/apple')
+DISCOVERY_ENABLED = os.environ.get('SCRAPER_DISCOVER', '1') != '0'
+DISCOVERY_CACHE = os.environ.get('SCRAPER_CATEGORY_CACHE', os.path.join('logs', 'category_cache.json'))
+DISCOVERY_TTL = int(os.environ.get('SCRAPER_DISCOVERY_TTL', 24 * 60 * 60))
+MAX_DEPTH = int(os.environ.get('SCRAPER_DISCOVERY_DEPTH', 3))   # link hops from the brand page
+MAX_PAGES = int(os.environ.get('SCRAPER_DISCOVERY_PAGES', 150))  # pages fetched per discovery
+DISCOVERY_CONCURRENCY = 4
+DISCOVERY_RATE = 2  # requests per second
+
+# Brand-filtered listing pages: /<department>/<group>/<category>/apple, the shape of DEFAULT_CATEGORY_URLS
+CATEGORY_RE = re.compile(os.environ.get('SCRAPER_CATEGORY_RE', r'^(?:/[a-z0-9-]+){3}/apple$'))
+# Navigation worth following: anything mentioning apple, short of product pages and site furniture
+FOLLOW_RE = re.compile(r'apple', re.I)
+SKIP_RE = re.compile(r'^/(?:products|services|help-and-support|store-finder|my-account|account|basket|checkout|search)(?:/|$)'
+                     r'|\.html$', re.I)
+
+def is_category(url):
+    parts = urlsplit(url)
+    return not parts.query and bool(CATEGORY_RE.match(parts.path))
+
+def worth_following(url, host):
+    parts = urlsplit(url)
+    return parts.netloc == host and not parts.query and bool(FOLLOW_RE.search(parts.path)) \
+        and not SKIP_RE.search(parts.path)
+
+async def discover(start_url=BRAND_URL, max_depth=MAX_DEPTH, max_pages=MAX_PAGES,
+                   concurrency=DISCOVERY_CONCURRENCY, rate=DISCOVERY_RATE):
+    """Sorted category URLs reachable from `start_url` within `max_depth` link hops.
+
+    Breadth-first, one level at a time: every page of a level is fetched in parallel (at most
+    `concurrency` in flight, `rate` requests a second), and the links they carry make the next
+    level. Category pages are collected and also expanded, since a category's navigation
+    often lists its sibling categories.
+    """
+    start_url = canonicalize(start_url)
+    host = urlsplit(start_url).netloc
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+    seen = {start_url}
+    categories = set()
+    level = [start_url]
+    fetched = 0
+
+    async def links_of(client, url):
+        await limiter.wait()
+        soup = await get_soup_async(client, url, semaphore)
+        if soup is None:
+            return []
+        try:
+            return [canonicalize(a['href'], base=url) for a in soup.find_all('a', href=True)]
+        finally:
+            soup.decompose()
+
+    async with make_async_client(concurrency) as client:
+        for depth in range(max_depth):
+            level = level[:max(0, max_pages - fetched)]
+            if not level:
+                break
+            fetched += len(level)
+            logger.info("Discovery depth %s: fetching %s page(s)", depth, len(level))
+            pages = await asyncio.gather(*(links_of(client, url) for url in level))
+            next_level = []
+            for links in pages:
+                for link in links:
+                    if not link or link in seen:
+                        continue
+                    seen.add(link)
+                    if urlsplit(link).netloc == host and is_category(link):
+                        categories.add(link)
+                        next_level.append(link)
+                    elif worth_following(link, host):
+                        next_level.append(link)
+            level = next_level
+    metrics.set_gauge('discovery_pages', fetched)
+    metrics.set_gauge('categories_discovered', len(categories))
+    logger.info("Discovery fetched %s page(s) and found %s categories", fetched, len(categories))
+    return sorted(categories)
+
+def read_cache(path=DISCOVERY_CACHE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_cache(categories, start_url, path=DISCOVERY_CACHE):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'discovered_at': time.time(), 'start_url': start_url, 'categories': categories}, f, indent=2)
+    os.replace(tmp_path, path)
+
+def merge_categories(categories, cache, start_url, refresh=False):
+    """The category set to keep after a discovery: the union with the cached set for the same
+    start page, so a partial discovery (a blocked or timed-out listing page) never drops a
+    category. `refresh` replaces the cached set instead."""
+    cached = set(cache.get('categories', [])) if cache and cache.get('start_url') == start_url else set()
+    if refresh or not cached:
+        return sorted(categories)
+    missing = sorted(cached - set(categories))
+    if missing:
+        logger.warning("%s cached categories were not found again, keeping them until a --refresh: %s",
+                       len(missing), ', '.join(missing))
+    return sorted(cached | set(categories))
+
+def get_category_urls(start_url=BRAND_URL, ttl=DISCOVERY_TTL, cache_path=DISCOVERY_CACHE, refresh=False):
+    """Category URLs for a crawl: the cached discovery while younger than `ttl`, otherwise a fresh
+    discovery merged into the cached set (see merge_categories). Falls back to the last cached set,
+    then DEFAULT_CATEGORY_URLS, if discovery finds nothing (e.g. the brand page is blocked to plain
+    HTTP clients)."""
+    if not DISCOVERY_ENABLED:
+        return list(DEFAULT_CATEGORY_URLS)
+    cache = read_cache(cache_path)
+    if cache and cache.get('start_url') == start_url and not refresh \
+            and time.time() - cache.get('discovered_at', 0) < ttl and cache.get('categories'):
+        logger.info("Using %s cached categories discovered %.0f min ago", len(cache['categories']),
+                    (time.time() - cache['discovered_at']) / 60)
+        return cache['categories']
+    try:
+        categories = asyncio.run(discover(start_url))
+    except Exception as e:
+        logger.error("Category discovery failed: %s", e)
+        categories = []
+    if categories:
+        added = sorted(set(categories) - set(cache.get('categories', []) if cache else DEFAULT_CATEGORY_URLS))
+        if added:
+            logger.warning("New categories discovered: %s", ', '.join(added))
+        categories = merge_categories(categories, cache, start_url, refresh)
+        write_cache(categories, start_url, cache_path)
+        return categories
+    fallback = (cache or {}).get('categories') or list(DEFAULT_CATEGORY_URLS)
+    logger.warning("Discovery found no categories; crawling %s previously known", len(fallback))
+    return fallback
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Discover Apple category pages from the brand landing page")
+    parser.add_argument('--start', default=BRAND_URL, help="Brand landing page to start from")
+    parser.add_argument('--depth', type=int, default=MAX_DEPTH)
+    parser.add_argument('--max-pages', type=int, default=MAX_PAGES)
+    parser.add_argument('--concurrency', type=int, default=DISCOVERY_CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=DISCOVERY_RATE, help="Requests per second")
+    parser.add_argument('--cache', default=DISCOVERY_CACHE)
+    parser.add_argument('--no-cache', action='store_true', help="Print the discovered set without updating the cache")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Replace the cached set instead of adding to it, dropping categories no longer linked")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    started = time.perf_counter()
+    categories = asyncio.run(discover(args.start, args.depth, args.max_pages, args.concurrency, args.rate))
+    logger.info("Discovery took %.1fs", time.perf_counter() - started)
+    for url in categories:
+        print(url)
+    if categories and not args.no_cache:
+        write_cache(merge_categories(categories, read_cache(args.cache), args.start, args.refresh), args.start, args.cache)
+    return 0 if categories else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
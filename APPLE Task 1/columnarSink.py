@@ -0,0 +1,160 @@
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from productSchema import DICTIONARY_COLUMNS, SCHEMA
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for the columnar sink
+    pa = None
+    ds = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_DIR = 'catalogue'
+
+PARTITION_COLUMNS = ['scrape_date', 'category_planning_group']
+
+def arrow_schema():
+    """Build the Arrow schema for a catalogue snapshot from productSchema.FIELD_SPEC."""
+    types = {
+        'str': pa.string(),
+        'float': pa.float64(),
+        'int': pa.int64(),
+        'list': pa.list_(pa.string())
+    }
+    fields = []
+    for column, kind in SCHEMA.items():
+        if column in DICTIONARY_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, types[kind]))
+    fields.append(pa.field('scraped_at', pa.timestamp('s', tz='UTC')))
+    fields.append(pa.field('scrape_date', pa.string()))
+    return pa.schema(fields)
+
+def catalogue_partitioning():
+    return ds.partitioning(
+        pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]),
+        flavor='hive'
+    )
+
+def make_run_id(scraped_at):
+    return f"{scraped_at.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def catalogue_table(records, scraped_at):
+    """Typed Arrow table of records, with the scraped_at and scrape_date columns filled in."""
+    columns = {column: [record.get(column) for record in records] for column in SCHEMA}
+    columns['scraped_at'] = [scraped_at.replace(microsecond=0)] * len(records)
+    columns['scrape_date'] = [scraped_at.strftime('%Y-%m-%d')] * len(records)
+    return pa.Table.from_pydict(columns, schema=arrow_schema())
+
+def write_catalogue(records, root=CATALOGUE_DIR, scraped_at=None, file_format='parquet'):
+    """Append a run's typed records to a hive-partitioned Parquet (or Arrow IPC) dataset.
+
+    Files land under root/scrape_date=YYYY-MM-DD/category_planning_group=.../ and are
+    named per run, so earlier runs are kept rather than overwritten.
+    """
+    if pa is None:
+        logger.warning("pyarrow is not installed, skipping columnar catalogue output")
+        return None
+    if not records:
+        logger.info("No records to write to columnar catalogue")
+        return None
+
+    scraped_at = scraped_at or datetime.now(timezone.utc)
+    scrape_date = scraped_at.strftime('%Y-%m-%d')
+    table = catalogue_table(records, scraped_at)
+
+    if file_format == 'parquet':
+        file_options = ds.ParquetFileFormat().make_write_options(
+            use_dictionary=DICTIONARY_COLUMNS,
+            compression='zstd'
+        )
+    else:
+        file_options = ds.IpcFileFormat().make_write_options(compression='zstd')
+
+    ds.write_dataset(
+        table,
+        root,
+        format=file_format,
+        file_options=file_options,
+        partitioning=catalogue_partitioning(),
+        basename_template=f'part-{make_run_id(scraped_at)}-{{i}}.{file_format}',
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    logger.info("Wrote %s products to columnar catalogue %s (%s)", len(records), root, scrape_date)
+    return root
+
+class CatalogueWriter:
+    """Appends a run's record batches to the Parquet catalogue with one file open per partition.
+
+    write_catalogue adds a new file per call, so a run that flushes every BATCH_SIZE records
+    would leave one small file per batch and category. Here each partition gets a single
+    part-<run_id>-0.parquet for the whole run, laid out exactly as write_catalogue lays it out.
+    """
+
+    def __init__(self, root=CATALOGUE_DIR, scraped_at=None):
+        self.root = root
+        self.scraped_at = scraped_at or datetime.now(timezone.utc)
+        self.run_id = make_run_id(self.scraped_at)
+        self.writers = {}
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, records):
+        if pa is None:
+            if not self.count:
+                logger.warning("pyarrow is not installed, skipping columnar catalogue output")
+            self.count += len(records)
+            return
+        by_partition = {}
+        for record in records:
+            by_partition.setdefault(record.get('category_planning_group'), []).append(record)
+        for group, partition_records in by_partition.items():
+            table = catalogue_table(partition_records, self.scraped_at).drop_columns(PARTITION_COLUMNS)
+            self.writer(group, table.schema).write_table(table)
+        self.count += len(records)
+
+    def writer(self, group, schema):
+        if group not in self.writers:
+            partition_filter = ds.field('scrape_date') == self.scraped_at.strftime('%Y-%m-%d')
+            if group is None:
+                partition_filter &= ds.field('category_planning_group').is_null()
+            else:
+                partition_filter &= ds.field('category_planning_group') == group
+            directory = os.path.join(self.root, catalogue_partitioning().format(partition_filter)[0])
+            os.makedirs(directory, exist_ok=True)
+            self.writers[group] = pq.ParquetWriter(
+                os.path.join(directory, f'part-{self.run_id}-0.parquet'), schema,
+                use_dictionary=DICTIONARY_COLUMNS, compression='zstd'
+            )
+        return self.writers[group]
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        if self.writers:
+            logger.info("Wrote %s products to columnar catalogue %s (%s files)",
+                        self.count, self.root, len(self.writers))
+        self.writers = {}
+
+def read_catalogue(root=CATALOGUE_DIR, columns=None, filter=None, file_format='parquet'):
+    """Read selected columns/partitions of the catalogue as an Arrow table.
+
+    Example: read_catalogue(columns=['product_code', 'price_revenue', 'scrape_date'],
+                            filter=ds.field('scrape_date') >= '2025-07-01')
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to read the columnar catalogue")
+    dataset = ds.dataset(root, format=file_format, partitioning='hive')
+    return dataset.to_table(columns=columns, filter=filter)
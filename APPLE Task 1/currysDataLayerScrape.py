@@ -6,19 +6,15 @@ import json
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
+from scraperLogging import setup_logging, get_tile_logger
+from browserDaemon import cached_driver_path
+from urlFrontier import canonicalize
+from categoryDiscovery import get_category_urls
+from driverLifecycle import apply_timeouts
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraper.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
+tile_logger = get_tile_logger(__name__)
 
 def setup_driver():
     logger.info("Setting up Chrome driver")
@@ -33,33 +29,33 @@ def setup_driver():
     chrome_options.add_argument('accept-encoding=gzip, deflate, br')
     
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        driver = webdriver.Chrome(service=Service(cached_driver_path()), options=chrome_options)
         logger.info("Chrome driver initialized with newer Selenium syntax")
     except TypeError:
-        driver = webdriver.Chrome(executable_path=ChromeDriverManager().install(), chrome_options=chrome_options)
+        driver = webdriver.Chrome(executable_path=cached_driver_path(), chrome_options=chrome_options)
         logger.info("Chrome driver initialized with older Selenium syntax (fallback)")
-    return driver
+    return apply_timeouts(driver)
 
 def get_soup(url, driver, retries=3):
-    logger.info(f"Fetching URL: {url}")
+    logger.info("Fetching URL: %s", url)
     for attempt in range(retries):
         try:
             driver.get(url)
-            logger.info(f"Waiting for page to load (attempt {attempt + 1}/{retries})")
+            logger.info("Waiting for page to load (attempt %s/%s)", attempt + 1, retries)
             time.sleep(random.uniform(2, 4))
             page_source = driver.page_source
-            logger.info(f"Page source retrieved, length: {len(page_source)} characters")
+            logger.info("Page source retrieved, length: %s characters", len(page_source))
             soup = BeautifulSoup(page_source, 'html.parser')
             logger.info("Page parsed with BeautifulSoup")
             return soup
         except Exception as e:
-            logger.error(f"Error fetching {url} (attempt {attempt + 1}/{retries}): {e}")
+            logger.error("Error fetching %s (attempt %s/%s): %s", url, attempt + 1, retries, e)
             time.sleep(random.uniform(2, 5))
-    logger.error(f"Failed to fetch {url} after {retries} attempts")
+    logger.error("Failed to fetch %s after %s attempts", url, retries)
     return None
 
 def scrape_product_info(product):
-    logger.info("Scraping product information")
+    tile_logger.info("Scraping product information")
     try:
         # Extract data-productdatalayer JSON
         data_layer = product.get('data-productdatalayer')
@@ -71,7 +67,7 @@ def scrape_product_info(product):
         try:
             data = json.loads(data_layer)[0]
         except json.JSONDecodeError as e:
-            logger.error(f"Error parsing data-productdatalayer: {e}")
+            logger.error("Error parsing data-productdatalayer: %s", e)
             return None
 
         # Extract title, price, and product code from data-productdatalayer
@@ -81,7 +77,7 @@ def scrape_product_info(product):
 
         # Extract URL from the product link
         link = product.find('a', class_='link text-truncate pdpLink', href=True)
-        product_url = 'https://www.currys.co.uk' + link['href'] if link and not link['href'].startswith('http') else link['href'] if link else 'No URL'
+        product_url = canonicalize(link['href']) if link else 'No URL'
 
         # Extract rating and reviews from HTML
         rating = product.find('span', class_='nvda_star_reading')
@@ -90,7 +86,7 @@ def scrape_product_info(product):
         reviews_text = reviews.text.strip() if reviews else 'No reviews'
 
         if title_text != 'No title' and price_text != 'No price':
-            logger.info(f"Scraped product: {title_text}, Price: {price_text}, Code: {product_code_text}, Rating: {rating_text}, Reviews: {reviews_text}, URL: {product_url}")
+            tile_logger.info("Scraped product: %s, Price: %s, Code: %s, Rating: %s, Reviews: %s, URL: %s", title_text, price_text, product_code_text, rating_text, reviews_text, product_url)
             return {
                 'title': title_text,
                 'price': price_text,
@@ -100,14 +96,14 @@ def scrape_product_info(product):
                 'url': product_url
             }
         else:
-            logger.warning(f"Missing title or price for product: {product_url}")
+            logger.warning("Missing title or price for product: %s", product_url)
             return None
     except Exception as e:
-        logger.error(f"Error parsing product: {e}")
+        logger.error("Error parsing product: %s", e)
         return None
 
 def scrape_page(url, driver):
-    logger.info(f"Scraping lister page: {url}")
+    logger.info("Scraping lister page: %s", url)
     soup = get_soup(url, driver)
     if not soup:
         logger.error("No soup object returned, skipping page")
@@ -119,7 +115,7 @@ def scrape_page(url, driver):
         products = []
     else:
         products = product_grid.find_all('div', class_='product')
-        logger.info(f"Found {len(products)} products on page")
+        logger.info("Found %s products on page", len(products))
     
     product_data = []
     for product in products:
@@ -127,46 +123,39 @@ def scrape_page(url, driver):
         if info:
             product_data.append(info)
     
-    logger.info(f"Collected {len(product_data)} valid products from page")
+    logger.info("Collected %s valid products from page", len(product_data))
     
     next_link = soup.find('a', class_='next')
     next_url = next_link['href'] if next_link else None
-    if next_url and not next_url.startswith('http'):
-        next_url = 'https://www.currys.co.uk' + next_url
-    logger.info(f"Next page link: {next_url if next_url else 'None'}")
+    next_url = canonicalize(next_url)
+    logger.info("Next page link: %s", next_url if next_url else 'None')
     
     return product_data, next_url
 
 def scrape_category(category_url, driver):
-    logger.info(f"Starting to scrape category: {category_url}")
+    logger.info("Starting to scrape category: %s", category_url)
     all_products = []
     current_url = category_url
     while current_url:
         products, next_path = scrape_page(current_url, driver)
         all_products.extend(products)
-        logger.info(f"Total products collected in category so far: {len(all_products)}")
+        logger.info("Total products collected in category so far: %s", len(all_products))
         
         if next_path:
             current_url = next_path
-            logger.info(f"Moving to next page: {current_url}")
+            logger.info("Moving to next page: %s", current_url)
             time.sleep(random.uniform(2, 4))
         else:
             logger.info("No more pages in category")
             current_url = None
     
-    logger.info(f"Finished scraping category, collected {len(all_products)} products")
+    logger.info("Finished scraping category, collected %s products", len(all_products))
     return all_products
 
 def main():
-    # Provided category URLs
-    category_urls = [
-        'https://www.currys.co.uk/computing/desktop-pcs/desktops/apple',
-        'https://www.currys.co.uk/computing/laptops/laptops/apple',
-        'https://www.currys.co.uk/phones/mobile-phones/mobile-phones/apple',
-        'https://www.currys.co.uk/smart-tech/smart-watches-and-fitness/smart-watches/apple',
-        'https://www.currys.co.uk/computing/ipad-tablets-and-ereaders/tablets/apple',
-        'https://www.currys.co.uk/phones/mobile-phone-accessories/mobile-phone-accessories/apple'
-    ]
+    # Configure logging here, not at import: a plain import shouldn't start a run log
+    setup_logging()
+    category_urls = get_category_urls()
     
     logger.info("Starting scraper")
     driver = setup_driver()
@@ -174,21 +163,21 @@ def main():
     
     try:
         for category_url in category_urls:
-            logger.info(f"Processing category: {category_url}")
+            logger.info("Processing category: %s", category_url)
             products = scrape_category(category_url, driver)
             all_products.extend(products)
-            logger.info(f"Total products collected across all categories: {len(all_products)}")
+            logger.info("Total products collected across all categories: %s", len(all_products))
     finally:
         logger.info("Closing Chrome driver")
         driver.quit()
     
-    logger.info(f"Writing {len(all_products)} products to CSV")
+    logger.info("Writing %s products to CSV", len(all_products))
     with open('apple_products.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.DictWriter(f, fieldnames=['title', 'price', 'product_code', 'rating', 'reviews', 'url'])
         writer.writeheader()
         writer.writerows(all_products)
     
-    logger.info(f"Scraped {len(all_products)} products from all categories. Data saved to apple_products.csv")
+    logger.info("Scraped %s products from all categories. Data saved to apple_products.csv", len(all_products))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,19 +5,17 @@ import logging
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
+from scraperLogging import setup_logging, get_tile_logger
+from browserDaemon import cached_driver_path
+from dedupIndex import DedupIndex
+from urlFrontier import canonicalize
+from pdpExtractor import PDP_FIELDS, extract_pdp
+from categoryDiscovery import get_category_urls
+from driverLifecycle import apply_timeouts
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraper.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
+tile_logger = get_tile_logger(__name__)
 
 def setup_driver():
     logger.info("Setting up Chrome driver")
@@ -32,70 +30,54 @@ def setup_driver():
     chrome_options.add_argument('accept-encoding=gzip, deflate, br')
     
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        driver = webdriver.Chrome(service=Service(cached_driver_path()), options=chrome_options)
         logger.info("Chrome driver initialized with newer Selenium syntax")
     except TypeError:
-        driver = webdriver.Chrome(executable_path=ChromeDriverManager().install(), chrome_options=chrome_options)
+        driver = webdriver.Chrome(executable_path=cached_driver_path(), chrome_options=chrome_options)
         logger.info("Chrome driver initialized with older Selenium syntax (fallback)")
-    return driver
+    return apply_timeouts(driver)
 
-def get_soup(url, driver, retries=3):
-    logger.info(f"Fetching URL: {url}")
+def get_page_source(url, driver, retries=3):
+    logger.info("Fetching URL: %s", url)
     for attempt in range(retries):
         try:
             driver.get(url)
-            logger.info(f"Waiting for page to load (attempt {attempt + 1}/{retries})")
+            logger.info("Waiting for page to load (attempt %s/%s)", attempt + 1, retries)
             time.sleep(random.uniform(2, 4))
             page_source = driver.page_source
-            logger.info(f"Page source retrieved, length: {len(page_source)} characters")
-            soup = BeautifulSoup(page_source, 'html.parser')
-            logger.info("Page parsed with BeautifulSoup")
-            return soup
+            logger.info("Page source retrieved, length: %s characters", len(page_source))
+            return page_source
         except Exception as e:
-            logger.error(f"Error fetching {url} (attempt {attempt + 1}/{retries}): {e}")
+            logger.error("Error fetching %s (attempt %s/%s): %s", url, attempt + 1, retries, e)
             time.sleep(random.uniform(2, 5))
-    logger.error(f"Failed to fetch {url} after {retries} attempts")
+    logger.error("Failed to fetch %s after %s attempts", url, retries)
     return None
 
+def get_soup(url, driver, retries=3):
+    page_source = get_page_source(url, driver, retries)
+    if page_source is None:
+        return None
+    soup = BeautifulSoup(page_source, 'html.parser')
+    logger.info("Page parsed with BeautifulSoup")
+    return soup
+
 def scrape_product_detail(url, driver):
-    logger.info(f"Scraping product detail page: {url}")
-    soup = get_soup(url, driver)
-    if not soup:
-        logger.error(f"No soup object returned for {url}, skipping")
+    logger.info("Scraping product detail page: %s", url)
+    page_source = get_page_source(url, driver)
+    if not page_source:
+        logger.error("No page source returned for %s, skipping", url)
         return None
 
-    try:
-        title = soup.find('h1', class_='product-name')
-        price = soup.find('span', class_='value')
-        product_code = soup.find('div', class_='product-code')
-        rating = soup.find('span', class_='nvda_star_reading')
-        reviews = soup.find('span', class_='rating-count d-inline-flex mt-1 d-block average-reviews')
-        
-        if title and price:
-            title_text = title.text.strip()
-            price_text = price.text.strip()
-            product_code_text = product_code.text.strip() if product_code else 'No product code'
-            rating_text = rating.text.strip() if rating else 'No rating'
-            reviews_text = reviews.text.strip() if reviews else 'No reviews'
-            
-            logger.info(f"Scraped product: {title_text}, Price: {price_text}, Code: {product_code_text}, Rating: {rating_text}, Reviews: {reviews_text}, URL: {url}")
-            return {
-                'title': title_text,
-                'price': price_text,
-                'product_code': product_code_text,
-                'rating': rating_text,
-                'reviews': reviews_text,
-                'url': url
-            }
-        else:
-            logger.warning(f"Product title or price not found on {url}")
-            return None
-    except AttributeError as e:
-        logger.error(f"Error parsing product detail page {url}: {e}")
+    # JSON-LD / dataLayer straight from the raw HTML; CSS selectors only if those are missing
+    record, source = extract_pdp(page_source, url)
+    if record is None:
+        logger.warning("Product title or price not found on %s", url)
         return None
+    tile_logger.info("Scraped product (%s): %s, Price: %s, Code: %s, Rating: %s, Reviews: %s, URL: %s", source, record['title'], record['price'], record['product_code'], record['rating'], record['reviews'], url)
+    return record
 
-def scrape_page(url, driver):
-    logger.info(f"Scraping lister page: {url}")
+def scrape_page(url, driver, dedup=None):
+    logger.info("Scraping lister page: %s", url)
     soup = get_soup(url, driver)
     if not soup:
         logger.error("No soup object returned, skipping page")
@@ -112,85 +94,86 @@ def scrape_page(url, driver):
         for item in product_items:
             link = item.find('a', href=True)
             if link:
-                product_url = link['href']
-                if not product_url.startswith('http'):
-                    product_url = 'https://www.currys.co.uk' + product_url
+                product_url = canonicalize(link['href'])
                 # Filter URLs to include only product detail pages
                 if '/products/' in product_url:
                     product_urls.append(product_url)
                 else:
-                    logger.info(f"Skipping non-product URL: {product_url}")
-        logger.info(f"Found {len(product_urls)} product URLs on page")
+                    logger.info("Skipping non-product URL: %s", product_url)
+        logger.info("Found %s product URLs on page", len(product_urls))
     
     product_data = []
     for product_url in product_urls:
+        # Products listed under several categories are only fetched once per run
+        if dedup and dedup.check(url=product_url):
+            tile_logger.info("Skipping duplicate product: %s", product_url)
+            continue
         info = scrape_product_detail(product_url, driver)
         if info:
             product_data.append(info)
+            if dedup:
+                dedup.add(url=product_url)
         time.sleep(random.uniform(1, 3))  # Delay between product detail page requests
     
-    logger.info(f"Collected {len(product_data)} valid products from page")
+    logger.info("Collected %s valid products from page", len(product_data))
     
     next_link = soup.find('a', class_='next')
     next_url = next_link['href'] if next_link else None
-    if next_url and not next_url.startswith('http'):
-        next_url = 'https://www.currys.co.uk' + next_url
-    logger.info(f"Next page link: {next_url if next_url else 'None'}")
+    next_url = canonicalize(next_url)
+    logger.info("Next page link: %s", next_url if next_url else 'None')
     
     return product_data, next_url
 
-def scrape_category(category_url, driver):
-    logger.info(f"Starting to scrape category: {category_url}")
+def scrape_category(category_url, driver, dedup=None):
+    logger.info("Starting to scrape category: %s", category_url)
+    if dedup:
+        dedup.begin_category(category_url)
     all_products = []
     current_url = category_url
     while current_url:
-        products, next_path = scrape_page(current_url, driver)
+        products, next_path = scrape_page(current_url, driver, dedup)
         all_products.extend(products)
-        logger.info(f"Total products collected in category so far: {len(all_products)}")
+        logger.info("Total products collected in category so far: %s", len(all_products))
         
         if next_path:
             current_url = next_path
-            logger.info(f"Moving to next page: {current_url}")
+            logger.info("Moving to next page: %s", current_url)
             time.sleep(random.uniform(2, 4))
         else:
             logger.info("No more pages in category")
             current_url = None
     
-    logger.info(f"Finished scraping category, collected {len(all_products)} products")
+    logger.info("Finished scraping category, collected %s products", len(all_products))
     return all_products
 
 def main():
-    # Provided category URLs
-    category_urls = [
-        'https://www.currys.co.uk/computing/desktop-pcs/desktops/apple',
-        'https://www.currys.co.uk/computing/laptops/laptops/apple',
-        'https://www.currys.co.uk/phones/mobile-phones/mobile-phones/apple',
-        'https://www.currys.co.uk/smart-tech/smart-watches-and-fitness/smart-watches/apple',
-        'https://www.currys.co.uk/computing/ipad-tablets-and-ereaders/tablets/apple',
-        'https://www.currys.co.uk/phones/mobile-phone-accessories/mobile-phone-accessories/apple'
-    ]
+    # Configure logging here, not at import: a plain import shouldn't start a run log
+    setup_logging()
+    category_urls = get_category_urls()
     
     logger.info("Starting scraper")
     driver = setup_driver()
+    dedup = DedupIndex()
     all_products = []
     
     try:
         for category_url in category_urls:
-            logger.info(f"Processing category: {category_url}")
-            products = scrape_category(category_url, driver)
+            logger.info("Processing category: %s", category_url)
+            products = scrape_category(category_url, driver, dedup)
             all_products.extend(products)
-            logger.info(f"Total products collected across all categories: {len(all_products)}")
+            logger.info("Total products collected across all categories: %s", len(all_products))
     finally:
         logger.info("Closing Chrome driver")
         driver.quit()
+    dedup.log_report()
     
-    logger.info(f"Writing {len(all_products)} products to CSV")
+    logger.info("Writing %s products to CSV", len(all_products))
     with open('apple_products.csv', 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['title', 'price', 'product_code', 'rating', 'reviews', 'url'])
+        writer = csv.DictWriter(f, fieldnames=PDP_FIELDS)
         writer.writeheader()
         writer.writerows(all_products)
     
-    logger.info(f"Scraped {len(all_products)} products from all categories. Data saved to apple_products.csv")
+    logger.info("Scraped %s products from all categories. Data saved to apple_products.csv", len(all_products))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,19 +5,15 @@ import logging
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
+from scraperLogging import setup_logging, get_tile_logger
+from browserDaemon import cached_driver_path
+from urlFrontier import canonicalize
+from categoryDiscovery import get_category_urls
+from driverLifecycle import apply_timeouts
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraper.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
+tile_logger = get_tile_logger(__name__)
 
 def setup_driver():
     logger.info("Setting up Chrome driver")
@@ -32,33 +28,33 @@ def setup_driver():
     chrome_options.add_argument('accept-encoding=gzip, deflate, br')
     
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        driver = webdriver.Chrome(service=Service(cached_driver_path()), options=chrome_options)
         logger.info("Chrome driver initialized with newer Selenium syntax")
     except TypeError:
-        driver = webdriver.Chrome(executable_path=ChromeDriverManager().install(), chrome_options=chrome_options)
+        driver = webdriver.Chrome(executable_path=cached_driver_path(), chrome_options=chrome_options)
         logger.info("Chrome driver initialized with older Selenium syntax (fallback)")
-    return driver
+    return apply_timeouts(driver)
 
 def get_soup(url, driver, retries=3):
-    logger.info(f"Fetching URL: {url}")
+    logger.info("Fetching URL: %s", url)
     for attempt in range(retries):
         try:
             driver.get(url)
-            logger.info(f"Waiting for page to load (attempt {attempt + 1}/{retries})")
+            logger.info("Waiting for page to load (attempt %s/%s)", attempt + 1, retries)
             time.sleep(random.uniform(2, 4))
             page_source = driver.page_source
-            logger.info(f"Page source retrieved, length: {len(page_source)} characters")
+            logger.info("Page source retrieved, length: %s characters", len(page_source))
             soup = BeautifulSoup(page_source, 'html.parser')
             logger.info("Page parsed with BeautifulSoup")
             return soup
         except Exception as e:
-            logger.error(f"Error fetching {url} (attempt {attempt + 1}/{retries}): {e}")
+            logger.error("Error fetching %s (attempt %s/%s): %s", url, attempt + 1, retries, e)
             time.sleep(random.uniform(2, 5))
-    logger.error(f"Failed to fetch {url} after {retries} attempts")
+    logger.error("Failed to fetch %s after %s attempts", url, retries)
     return None
 
 def scrape_product_info(product):
-    logger.info("Scraping product information")
+    tile_logger.info("Scraping product information")
     try:
         name = product.find('h2', class_='pdp-grid-product-name')
         price = product.find('span', class_='value')
@@ -69,13 +65,11 @@ def scrape_product_info(product):
         if name and price and link:
             name_text = name.text.strip()
             price_text = price.text.strip()
-            product_url = link['href']
-            if not product_url.startswith('http'):
-                product_url = 'https://www.currys.co.uk' + product_url
+            product_url = canonicalize(link['href'])
             rating_text = rating.text.strip() if rating else 'No rating'
             reviews_text = reviews.text.strip() if reviews else 'No reviews'
             
-            logger.info(f"Found product: {name_text}, Price: {price_text}, URL: {product_url}, Rating: {rating_text}, Reviews: {reviews_text}")
+            tile_logger.info("Found product: %s, Price: %s, URL: %s, Rating: %s, Reviews: %s", name_text, price_text, product_url, rating_text, reviews_text)
             return {
                 'name': name_text,
                 'price': price_text,
@@ -87,11 +81,11 @@ def scrape_product_info(product):
             logger.warning("Product name, price, or URL not found")
             return None
     except AttributeError as e:
-        logger.error(f"Error parsing product: {e}")
+        logger.error("Error parsing product: %s", e)
         return None
 
 def scrape_page(url, driver):
-    logger.info(f"Scraping page: {url}")
+    logger.info("Scraping page: %s", url)
     soup = get_soup(url, driver)
     if not soup:
         logger.error("No soup object returned, skipping page")
@@ -103,7 +97,7 @@ def scrape_page(url, driver):
         products = []
     else:
         products = product_grid.find_all('div', class_='row plp-list-grid')
-        logger.info(f"Found {len(products)} products on page")
+        logger.info("Found %s products on page", len(products))
     
     product_data = []
     for product in products:
@@ -111,47 +105,38 @@ def scrape_page(url, driver):
         if info:
             product_data.append(info)
     
-    logger.info(f"Collected {len(product_data)} valid products from page")
+    logger.info("Collected %s valid products from page", len(product_data))
     
     next_link = soup.find('a', class_='next')
     next_url = next_link['href'] if next_link else None
-    logger.info(f"Next page link: {next_url if next_url else 'None'}")
+    logger.info("Next page link: %s", next_url if next_url else 'None')
     
     return product_data, next_url
 
 def scrape_category(category_url, driver):
-    logger.info(f"Starting to scrape category: {category_url}")
+    logger.info("Starting to scrape category: %s", category_url)
     all_products = []
     current_url = category_url
     while current_url:
         products, next_path = scrape_page(current_url, driver)
         all_products.extend(products)
-        logger.info(f"Total products collected in category so far: {len(all_products)}")
+        logger.info("Total products collected in category so far: %s", len(all_products))
         
         if next_path:
-            if next_path.startswith('http'):
-                current_url = next_path
-            else:
-                current_url = 'https://www.currys.co.uk' + next_path
-            logger.info(f"Moving to next page: {current_url}")
+            current_url = canonicalize(next_path)
+            logger.info("Moving to next page: %s", current_url)
             time.sleep(random.uniform(2, 4))
         else:
             logger.info("No more pages in category")
             current_url = None
     
-    logger.info(f"Finished scraping category, collected {len(all_products)} products")
+    logger.info("Finished scraping category, collected %s products", len(all_products))
     return all_products
 
 def main():
-    # Provided category URLs
-    category_urls = [
-        'https://www.currys.co.uk/computing/desktop-pcs/desktops/apple',
-        'https://www.currys.co.uk/computing/laptops/laptops/apple',
-        'https://www.currys.co.uk/phones/mobile-phones/mobile-phones/apple',
-        'https://www.currys.co.uk/smart-tech/smart-watches-and-fitness/smart-watches/apple',
-        'https://www.currys.co.uk/computing/ipad-tablets-and-ereaders/tablets/apple',
-        'https://www.currys.co.uk/phones/mobile-phone-accessories/mobile-phone-accessories/apple'
-    ]
+    # Configure logging here, not at import: a plain import shouldn't start a run log
+    setup_logging()
+    category_urls = get_category_urls()
     
     logger.info("Starting scraper")
     driver = setup_driver()
@@ -159,21 +144,21 @@ def main():
     
     try:
         for category_url in category_urls:
-            logger.info(f"Processing category: {category_url}")
+            logger.info("Processing category: %s", category_url)
             products = scrape_category(category_url, driver)
             all_products.extend(products)
-            logger.info(f"Total products collected across all categories: {len(all_products)}")
+            logger.info("Total products collected across all categories: %s", len(all_products))
     finally:
         logger.info("Closing Chrome driver")
         driver.quit()
     
-    logger.info(f"Writing {len(all_products)} products to CSV")
+    logger.info("Writing %s products to CSV", len(all_products))
     with open('apple_products.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.DictWriter(f, fieldnames=['name', 'price', 'url', 'rating', 'reviews'])
         writer.writeheader()
         writer.writerows(all_products)
     
-    logger.info(f"Scraped {len(all_products)} products from all categories. Data saved to apple_products.csv")
+    logger.info("Scraped %s products from all categories. Data saved to apple_products.csv", len(all_products))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
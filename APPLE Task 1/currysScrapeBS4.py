@@ -1,38 +1,28 @@
 import requests
 from bs4 import BeautifulSoup
+import argparse
+import asyncio
 import csv
 import time
 import random
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from categoryDiscovery import get_category_urls
+from httpClient import (BACKOFF_FACTOR, CONCURRENCY, RETRY_STATUSES, TIMEOUT, get_headers, get_soup_async,
+                        make_async_client)
+from urlFrontier import canonicalize
 
-def get_headers():
-    user_agents = [
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Safari/605.1.15',
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
-        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
-        'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Mobile/15E148 Safari/604.1'
-    ]
-    return {
-        'User-Agent': random.choice(user_agents),
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Referer': 'https://www.currys.co.uk/'
-    }
+PAGE_DELAY = (1, 3)
 
 def get_soup(url, retries=3):
     session = requests.Session()
-    retry = Retry(total=retries, backoff_factor=1, status_forcelist=[403, 429, 500, 502, 503, 504])
+    retry = Retry(total=retries, backoff_factor=BACKOFF_FACTOR, status_forcelist=RETRY_STATUSES)
     adapter = HTTPAdapter(max_retries=retry)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
     
     try:
-        response = session.get(url, headers=get_headers(), timeout=10)
+        response = session.get(url, headers=get_headers(), timeout=TIMEOUT)
         response.raise_for_status()
         return BeautifulSoup(response.text, 'html.parser')
     except requests.RequestException as e:
@@ -47,11 +37,7 @@ def scrape_product_info(product):
     except AttributeError:
         return None
 
-def scrape_page(url):
-    soup = get_soup(url)
-    if not soup:
-        return [], None
-
+def parse_page(soup):
     products = soup.find_all('article', class_='product')
     product_data = []
     
@@ -65,6 +51,12 @@ def scrape_page(url):
     
     return product_data, next_url
 
+def scrape_page(url):
+    soup = get_soup(url)
+    if not soup:
+        return [], None
+    return parse_page(soup)
+
 def scrape_category(category_url):
     all_products = []
     current_url = category_url
@@ -74,32 +66,55 @@ def scrape_category(category_url):
         all_products.extend(products)
         
         if next_path:
-            if next_path.startswith('http'):
-                current_url = next_path
-            else:
-                current_url = 'https://www.currys.co.uk' + next_path
+            current_url = canonicalize(next_path)
             time.sleep(random.uniform(1, 3))
         else:
             current_url = None
     
     return all_products
 
-def main():
-    # Provided category URLs
-    category_urls = [
-        'https://www.currys.co.uk/computing/desktop-pcs/desktops/apple',
-        'https://www.currys.co.uk/computing/laptops/laptops/apple',
-        'https://www.currys.co.uk/phones/mobile-phones/mobile-phones/apple',
-        'https://www.currys.co.uk/smart-tech/smart-watches-and-fitness/smart-watches/apple',
-        'https://www.currys.co.uk/computing/ipad-tablets-and-ereaders/tablets/apple',
-        'https://www.currys.co.uk/phones/mobile-phone-accessories/mobile-phone-accessories/apple'
-    ]
-    
+async def scrape_category_async(client, category_url, semaphore, delay=PAGE_DELAY):
+    """Pages of one category in order; other categories run alongside on the same pool."""
     all_products = []
-    for category_url in category_urls:
-        print(f"Processing category: {category_url}")
-        products = scrape_category(category_url)
+    current_url = category_url
+    while current_url:
+        print(f"Scraping category page: {current_url}")
+        soup = await get_soup_async(client, current_url, semaphore)
+        if not soup:
+            break
+        products, next_path = parse_page(soup)
+        soup.decompose()
         all_products.extend(products)
+        current_url = canonicalize(next_path) if next_path else None
+        if current_url and delay:
+            await asyncio.sleep(random.uniform(*delay))
+    return all_products
+
+async def scrape_all_async(category_urls, concurrency=CONCURRENCY, delay=PAGE_DELAY):
+    semaphore = asyncio.Semaphore(concurrency)
+    async with make_async_client(concurrency) as client:
+        results = await asyncio.gather(
+            *(scrape_category_async(client, url, semaphore, delay) for url in category_urls)
+        )
+    return [product for products in results for product in products]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape Apple products from Currys category pages")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Fetch categories concurrently over one pooled HTTP/2 client")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="Requests in flight with --async")
+    args = parser.parse_args(argv)
+
+    category_urls = get_category_urls()
+    
+    if args.use_async:
+        all_products = asyncio.run(scrape_all_async(category_urls, args.concurrency))
+    else:
+        all_products = []
+        for category_url in category_urls:
+            print(f"Processing category: {category_url}")
+            products = scrape_category(category_url)
+            all_products.extend(products)
     
     with open('apple_products.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.DictWriter(f, fieldnames=['name', 'price'])
@@ -0,0 +1,294 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+from syntheticPages import make_brand_page, make_listing_page, make_pdp_page, make_tiles
+
+logger = logging.getLogger(__name__)
+
+# Same paths as the category_urls the scrapers crawl on www.currys.co.uk
+CATEGORY_PATHS = [
+    '/computing/desktop-pcs/desktops/apple',
+    '/computing/laptops/laptops/apple',
+    '/phones/mobile-phones/mobile-phones/apple',
+    '/smart-tech/smart-watches-and-fitness/smart-watches/apple',
+    '/computing/ipad-tablets-and-ereaders/tablets/apple',
+    '/phones/mobile-phone-accessories/mobile-phone-accessories/apple'
+]
+
+# Brand landing pages for category discovery: four categories straight from the brand page,
+# the other two one hop further down, behind product-line pages
+BRAND_PAGES = {
+    '/brands/apple': [(path, path.rsplit('/', 2)[-2]) for path in CATEGORY_PATHS[:4]] + [
+        ('/brands/apple/iphone', 'iPhone'), ('/brands/apple/ipad', 'iPad'),
+        ('/products/apple-iphone-15-128-gb-black-10000001.html', 'iPhone 15'), ('/store-finder', 'Stores')
+    ],
+    '/brands/apple/iphone': [(CATEGORY_PATHS[2], 'iPhones'), (CATEGORY_PATHS[5], 'iPhone accessories'),
+                             ('/brands/apple', 'Apple')],
+    '/brands/apple/ipad': [(CATEGORY_PATHS[4], 'iPads'), ('/brands/apple', 'Apple')]
+}
+
+BLOCK_PAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'failed_page_1_apple.html')
+
+PDP_RE = re.compile(r'^/products/.*-(\d+)\.html$')
+
+class StandInConfig:
+    def __init__(self, pages=5, tiles=24, latency=0.2, jitter=0.1, burst_every=0, burst_length=3,
+                 burst_status=429, block_rate=0.0, load_more=False, connect_latency=0.0, seed=0):
+        self.pages = pages                  # listing pages per category
+        self.tiles = tiles                  # tiles per listing page
+        self.latency = latency              # mean added response latency (seconds)
+        self.jitter = jitter                # +/- uniform jitter on the latency
+        self.burst_every = burst_every      # every N requests start an error burst (0 = off)
+        self.burst_length = burst_length    # consecutive error responses per burst
+        self.burst_status = burst_status    # 429 or 503
+        self.block_rate = block_rate        # share of requests answered with a Cloudflare block page
+        self.load_more = load_more          # serve half the tiles behind a load-more button
+        self.connect_latency = connect_latency  # added once per new connection, standing in for TCP+TLS setup
+        self.seed = seed
+
+class StandInServer(ThreadingHTTPServer):
+    """Serves synthetic Currys category and product pages and records every response."""
+
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StandInHandler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.connections = 0
+        self.availability = {}  # product index -> availability list set through /__availability
+        self.log = []
+        with open(BLOCK_PAGE_PATH, encoding='utf-8') as f:
+            self.block_page = f.read()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def category_urls(self):
+        return [self.base_url + path for path in CATEGORY_PATHS]
+
+    def next_fault(self):
+        """Decide, under the lock, whether this request gets an error burst, a block or a page."""
+        with self.lock:
+            self.request_count += 1
+            config = self.config
+            if config.burst_every and (self.request_count % config.burst_every) < config.burst_length:
+                return config.burst_status
+            if config.block_rate and self.rng.random() < config.block_rate:
+                return 403
+            return None
+
+    def record(self, path, status, started):
+        with self.lock:
+            self.log.append({'t': started, 'path': path, 'status': status,
+                             'seconds': round(time.time() - started, 4)})
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = 'CurrysStandIn/1.0'
+    protocol_version = 'HTTP/1.1'  # keep-alive, so clients that reuse connections benefit as they would live
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        if self.server.config.connect_latency > 0:
+            time.sleep(self.server.config.connect_latency)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def send_body(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        started = time.time()
+        server = self.server
+        config = server.config
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        if parts.path == '/__stats':
+            with server.lock:
+                body = json.dumps({'requests': server.request_count, 'connections': server.connections,
+                                   'log': server.log})
+            return self.send_body(200, body, 'application/json')
+        if parts.path == '/__reset':
+            with server.lock:
+                server.request_count = 0
+                server.connections = 0
+                server.availability = {}
+                server.log = []
+            return self.send_body(200, '{}', 'application/json')
+        if parts.path == '/__availability':
+            # /__availability?code=10000005&shipping=Out+of+stock&collect=Unavailable
+            index = int(query['code'][0]) - 10_000_000
+            with server.lock:
+                server.availability[index] = [
+                    {'availabilityStatus': 'shipping', 'availabilityType': query.get('shipping', ['Delivery available'])[0]},
+                    {'availabilityStatus': 'collect in store', 'availabilityType': query.get('collect', ['Unavailable'])[0]}
+                ]
+            return self.send_body(200, '{}', 'application/json')
+
+        delay = config.latency + random.uniform(-config.jitter, config.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        status = server.next_fault()
+        if status in (429, 503):
+            self.send_body(status, f'<html><body><h1>{status}</h1></body></html>', headers={'Retry-After': '1'})
+        elif status == 403:
+            self.send_body(403, server.block_page)
+        elif parts.path in CATEGORY_PATHS:
+            status = self.send_listing(parts.path, query)
+        elif parts.path in BRAND_PAGES:
+            status = 200
+            self.send_body(200, make_brand_page(BRAND_PAGES[parts.path]))
+        elif parts.path == '/__more':
+            status = self.send_more(query)
+        elif parts.path.endswith('/Stores-InventoryCheck'):
+            status = self.send_store_stock(query)
+        elif PDP_RE.match(parts.path):
+            index = int(PDP_RE.match(parts.path).group(1)) - 10_000_000
+            status = self.send_pdp(index)
+        else:
+            status = 404
+            self.send_body(404, '<html><body><h1>Not found</h1></body></html>')
+        server.record(self.path, status, started)
+
+    def send_pdp(self, index):
+        """Product page with an ETag; a matching If-None-Match gets an empty 304."""
+        body = make_pdp_page(index, availability=self.server.availability.get(index))
+        etag = '"%s"' % hashlib.blake2b(body.encode('utf-8'), digest_size=8).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return 304
+        self.send_body(200, body, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+        return 200
+
+    def send_store_stock(self, query):
+        """Store stock JSON for ?pid=&storeIds=a,b,c; a store's status is fixed by the seed,
+        product and store, except products flipped through /__availability, which are out of stock."""
+        pid = query.get('pid', [''])[0]
+        store_ids = [store_id for store_id in query.get('storeIds', [''])[0].split(',') if store_id]
+        flipped = pid.isdigit() and int(pid) - 10_000_000 in self.server.availability
+        stores = []
+        for store_id in store_ids:
+            roll = random.Random(f'{self.server.config.seed}:{pid}:{store_id}').random()
+            status = 'Out of stock' if flipped or roll < 0.25 else 'Low stock' if roll < 0.4 else 'In stock'
+            stores.append({'storeId': store_id, 'status': status})
+        self.send_body(200, json.dumps({'pid': pid, 'stores': stores}), 'application/json')
+        return 200
+
+    def tile_range(self, path, page):
+        config = self.server.config
+        category = CATEGORY_PATHS.index(path)
+        start = category * 100_000 + (page - 1) * config.tiles
+        return start, config.seed * 1_000_003 + start
+
+    def send_listing(self, path, query):
+        config = self.server.config
+        page = int(query.get('page', ['1'])[0])
+        if page < 1 or page > config.pages:
+            self.send_body(404, '<html><body><h1>Not found</h1></body></html>')
+            return 404
+        start, seed = self.tile_range(path, page)
+        next_href = f'{self.server.base_url}{path}?page={page + 1}' if page < config.pages else None
+        if config.load_more:
+            shown = config.tiles // 2
+            more_url = '/__more?' + urlencode({'path': path, 'page': page})
+            body = make_listing_page(shown, start, next_href, load_more=more_url, seed=seed)
+        else:
+            body = make_listing_page(config.tiles, start, next_href, seed=seed)
+        self.send_body(200, body)
+        return 200
+
+    def send_more(self, query):
+        """Tiles revealed by the load-more button: the second half of the page."""
+        config = self.server.config
+        path = query.get('path', [''])[0]
+        page = int(query.get('page', ['1'])[0])
+        if path not in CATEGORY_PATHS:
+            self.send_body(404, '')
+            return 404
+        start, seed = self.tile_range(path, page)
+        shown = config.tiles // 2
+        # Regenerate the full page's tiles with the same seed so products match a non-load-more page
+        tiles = make_tiles(config.tiles, start, seed)
+        split = tiles.split('<div class="product" ')
+        remaining = ''.join('<div class="product" ' + tile for tile in split[1 + shown:])
+        self.send_body(200, remaining)
+        return 200
+
+def start_server(config=None, host='127.0.0.1', port=0):
+    """Start the stand-in on a background thread; port=0 picks a free port."""
+    server = StandInServer((host, port), config or StandInConfig())
+    thread = threading.Thread(target=server.serve_forever, name='currys-stand-in', daemon=True)
+    thread.start()
+    logger.info("Currys stand-in listening on %s", server.base_url)
+    return server
+
+def add_config_arguments(parser):
+    parser.add_argument('--pages', type=int, default=5, help="Listing pages per category")
+    parser.add_argument('--tiles', type=int, default=24, help="Tiles per listing page")
+    parser.add_argument('--latency', type=float, default=0.2, help="Mean added latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--burst-every', type=int, default=0, help="Start an error burst every N requests")
+    parser.add_argument('--burst-length', type=int, default=3)
+    parser.add_argument('--burst-status', type=int, choices=[429, 503], default=429)
+    parser.add_argument('--block-rate', type=float, default=0.0, help="Share of Cloudflare-style 403 block pages")
+    parser.add_argument('--load-more', action='store_true', help="Serve half of each page behind a load-more button")
+    parser.add_argument('--connect-latency', type=float, default=0.0,
+                        help="Seconds added to each new connection (simulated TCP+TLS handshake)")
+    parser.add_argument('--seed', type=int, default=0)
+
+def config_from_args(args):
+    return StandInConfig(
+        pages=args.pages, tiles=args.tiles, latency=args.latency, jitter=args.jitter,
+        burst_every=args.burst_every, burst_length=args.burst_length, burst_status=args.burst_status,
+        block_rate=args.block_rate, load_more=args.load_more,
+        connect_latency=args.connect_latency, seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Currys category/product pages")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    server = StandInServer((args.host, args.port), config_from_args(args))
+    logger.info("Currys stand-in listening on %s", server.base_url)
+    for url in server.category_urls():
+        logger.info("Category: %s", url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import logging
+from productSchema import is_missing
+from runMetrics import metrics
+from urlFrontier import canonicalize
+
+logger = logging.getLogger(__name__)
+
+class DedupIndex:
+    """Products already collected in this run, keyed by product_code, sku and canonical URL.
+
+    Products are listed under several categories; check() lets the scrapers skip a tile or a
+    PDP fetch before the expensive work, and counts the duplicates against the current category.
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.category = None
+        self.stats = {}
+
+    def begin_category(self, category_url):
+        self.category = category_url
+        self.stats.setdefault(category_url, {'unique': 0, 'duplicates': 0})
+
+    def _keys(self, product_code=None, sku=None, url=None):
+        keys = []
+        if not is_missing(product_code):
+            keys.append(('code', str(product_code)))
+        if not is_missing(sku):
+            keys.append(('sku', str(sku)))
+        url = canonicalize(url)
+        if url:
+            keys.append(('url', url))
+        return keys
+
+    def check(self, product_code=None, sku=None, url=None):
+        """True (and counted as a duplicate) if any of the given keys was already added."""
+        if any(key in self.keys for key in self._keys(product_code, sku, url)):
+            metrics.incr('duplicates')
+            if self.category in self.stats:
+                self.stats[self.category]['duplicates'] += 1
+            return True
+        return False
+
+    def add(self, product_code=None, sku=None, url=None):
+        self.keys.update(self._keys(product_code, sku, url))
+        if self.category in self.stats:
+            self.stats[self.category]['unique'] += 1
+
+    def report(self):
+        """{category_url: {'unique', 'duplicates', 'duplicate_rate'}} for the run so far."""
+        report = {}
+        for category, stats in self.stats.items():
+            seen = stats['unique'] + stats['duplicates']
+            report[category] = dict(stats, duplicate_rate=round(stats['duplicates'] / seen, 3) if seen else 0.0)
+        return report
+
+    def log_report(self):
+        for category, stats in self.report().items():
+            logger.info("Duplicates in %s: %s of %s products (%.1f%%)", category, stats['duplicates'],
+                        stats['unique'] + stats['duplicates'], stats['duplicate_rate'] * 100)
+        metrics.set_section('duplicates', self.report())
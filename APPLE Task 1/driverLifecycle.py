@@ -0,0 +1,327 @@
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from runMetrics import metrics
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGES = int(os.environ.get('SCRAPER_DRIVER_MAX_PAGES', 150))
+MAX_RSS_BYTES = int(os.environ.get('SCRAPER_DRIVER_MAX_RSS_MB', 1500)) * 2**20
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+PAGE_LOAD_TIMEOUT = int(os.environ.get('SCRAPER_PAGE_LOAD_TIMEOUT', 30))  # driver.get / script calls, enforced by Chrome
+PAGE_DEADLINE = float(os.environ.get('SCRAPER_PAGE_DEADLINE', 120))       # whole page incl. waits, enforced by the watchdog
+RUN_DEADLINE = float(os.environ.get('SCRAPER_RUN_DEADLINE', 0)) or None   # seconds per run, unset = no limit
+PAGE_REQUEUES = int(os.environ.get('SCRAPER_PAGE_REQUEUES', 1))           # retries of a page after a watchdog kill
+
+class PageTimeout(Exception):
+    """A page overran its deadline and the watchdog killed the browser serving it."""
+
+def _proc_children():
+    """ppid -> [pid] for every process, read from /proc."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', encoding='utf-8') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the parenthesised command name: state, ppid, ...
+        ppid = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+def _proc_rss(pid):
+    try:
+        with open(f'/proc/{pid}/statm', encoding='utf-8') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def tree_rss(root_pid):
+    """Resident memory in bytes of a process and all its descendants (Chrome + renderers)."""
+    if psutil:
+        try:
+            root = psutil.Process(root_pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return 0
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                continue
+        return total
+    if not os.path.isdir('/proc'):
+        return 0
+    children = _proc_children()
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += _proc_rss(pid)
+        stack.extend(children.get(pid, []))
+    return total
+
+def kill_tree(root_pid):
+    """SIGKILL a process and all its descendants, children first."""
+    if psutil:
+        try:
+            root = psutil.Process(root_pid)
+            processes = root.children(recursive=True) + [root]
+        except psutil.NoSuchProcess:
+            return
+        for process in processes:
+            try:
+                process.kill()
+            except psutil.NoSuchProcess:
+                continue
+        return
+    children = _proc_children() if os.path.isdir('/proc') else {}
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    for pid in reversed(pids):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            continue
+
+def apply_timeouts(driver, page_load=PAGE_LOAD_TIMEOUT):
+    """Bound driver.get and execute_script in Chrome itself; Selenium's defaults never time out."""
+    try:
+        driver.set_page_load_timeout(page_load)
+        driver.set_script_timeout(page_load)
+    except Exception as e:
+        logger.warning("Could not set driver timeouts: %s", e)
+    return driver
+
+class Watchdog:
+    """Calls `on_expire` once `seconds` of unpaused time have passed, unless finished first."""
+
+    def __init__(self, seconds, on_expire):
+        self.remaining = seconds
+        self.on_expire = on_expire
+        self.lock = threading.Lock()
+        self.timer = None
+        self.started = None
+        self.fired = False
+        self.done = False
+
+    def start(self):
+        with self.lock:
+            self._arm()
+
+    def _arm(self):
+        self.started = time.monotonic()
+        self.timer = threading.Timer(self.remaining, self._fire)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _fire(self):
+        with self.lock:
+            if self.done or self.timer is None or self.remaining - (time.monotonic() - self.started) > 0.05:
+                return
+            self.fired = True
+            self.done = True
+        self.on_expire()
+
+    def pause(self):
+        with self.lock:
+            if self.done or self.timer is None:
+                return
+            self.timer.cancel()
+            self.timer = None
+            self.remaining = max(0.0, self.remaining - (time.monotonic() - self.started))
+
+    def resume(self):
+        with self.lock:
+            if not self.done and self.timer is None:
+                self._arm()
+
+    def finish(self):
+        """Stop the clock; True if the watchdog had already fired."""
+        with self.lock:
+            self.done = True
+            if self.timer is not None:
+                self.timer.cancel()
+            return self.fired
+
+_active = threading.local()
+
+@contextmanager
+def pause_deadline():
+    """Stop the current page deadline's clock while waiting on something other than the browser."""
+    watchdog = getattr(_active, 'watchdog', None)
+    if watchdog is None:
+        yield
+        return
+    watchdog.pause()
+    try:
+        yield
+    finally:
+        watchdog.resume()
+
+class RunDeadline:
+    """Wall-clock budget for a whole run; the crawl stops starting pages once it is spent."""
+
+    def __init__(self, seconds=RUN_DEADLINE):
+        self.ends = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        return None if self.ends is None else max(0.0, self.ends - time.monotonic())
+
+    def expired(self):
+        return self.ends is not None and time.monotonic() >= self.ends
+
+    def cap(self, seconds):
+        """`seconds`, shortened to what is left of the run."""
+        remaining = self.remaining()
+        return seconds if remaining is None else min(seconds, remaining)
+
+def browser_root_pid(driver):
+    """chromedriver's pid for a launched driver (Chrome is its child), the daemon's Chrome pid for an attached one."""
+    if getattr(driver, 'attached_to_daemon', False):
+        from browserDaemon import read_state
+        state = read_state()
+        return state.get('pid') if state else None
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return process.pid if process else None
+
+def fresh_tab(driver):
+    """Swap the current tab for a new one so the old renderer process and its heap are released."""
+    old_handles = driver.window_handles
+    driver.switch_to.new_window('tab')
+    new_handle = driver.current_window_handle
+    for handle in old_handles:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(new_handle)
+
+class DriverManager:
+    """Owns the Selenium driver for a crawl: samples browser RSS after every page and
+    replaces the driver once it has served `max_pages` pages or grown past `max_rss_bytes`.
+
+    Recycling only happens in page_done(), i.e. between pages, so callers keep their own
+    pagination position and simply fetch the next URL with `manager.driver`. The one exception
+    is deadline(): a page that overruns it has its chromedriver (and a launched Chrome) killed
+    from a watchdog timer, which unblocks the hung WebDriver call, and the driver is replaced
+    before PageTimeout reaches the caller.
+    """
+
+    def __init__(self, factory, closer=None, max_pages=MAX_PAGES, max_rss_bytes=MAX_RSS_BYTES,
+                 page_load_timeout=PAGE_LOAD_TIMEOUT):
+        self.factory = factory
+        self.closer = closer or (lambda driver: driver.quit())
+        self.max_pages = max_pages
+        self.max_rss_bytes = max_rss_bytes
+        self.page_load_timeout = page_load_timeout
+        self._driver = None
+        self.pages = 0
+        self.peak_rss = 0
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = apply_timeouts(self.factory(), self.page_load_timeout)
+            self.pages = 0
+        return self._driver
+
+    @contextmanager
+    def deadline(self, url, seconds=PAGE_DEADLINE):
+        """Kill and replace the browser if the enclosed page work runs past `seconds`.
+
+        Time spent inside pause_deadline() (the shared host backoff) does not count.
+        """
+        driver = self.driver
+
+        def expire():
+            metrics.incr('page_timeouts')
+            process = getattr(getattr(driver, 'service', None), 'process', None)
+            logger.error("Page %s overran its %.0fs deadline, killing the browser", url, seconds)
+            if process is not None:
+                kill_tree(process.pid)
+
+        watchdog = Watchdog(seconds, expire)
+        _active.watchdog = watchdog
+        watchdog.start()
+        error = None
+        try:
+            yield driver
+        except Exception as e:
+            error = e
+        finally:
+            # After finish() the timer can no longer fire, so a late expiry cannot discard a good page
+            killed = watchdog.finish()
+            _active.watchdog = None
+        if killed:
+            self.replace(f'deadline on {url}')
+            raise PageTimeout(f'{url} took longer than {seconds:.0f}s') from error
+        if error is not None:
+            raise error
+
+    def rss(self):
+        pid = browser_root_pid(self._driver) if self._driver else None
+        return tree_rss(pid) if pid else 0
+
+    def page_done(self):
+        """Call after each page: records memory and recycles the driver if over a threshold."""
+        self.pages += 1
+        rss = self.rss()
+        metrics.sample('browser_rss_bytes', rss)
+        if rss > self.peak_rss:
+            self.peak_rss = rss
+            metrics.set_gauge('browser_peak_rss_bytes', rss)
+        if self.pages >= self.max_pages:
+            self.recycle(f'{self.pages} pages')
+        elif self.max_rss_bytes and rss > self.max_rss_bytes:
+            self.recycle(f'RSS {rss / 2**20:.0f} MiB')
+
+    def recycle(self, reason):
+        logger.info("Recycling Chrome driver after %s", reason)
+        metrics.incr('driver_recycles')
+        with metrics.stage('driver_restart'):
+            if getattr(self._driver, 'attached_to_daemon', False):
+                # The daemon browser outlives us; dropping the tab is what frees its memory
+                try:
+                    fresh_tab(self._driver)
+                except Exception as e:
+                    logger.warning("Could not open a fresh tab: %s", e)
+            self.close()
+            self._driver = apply_timeouts(self.factory(), self.page_load_timeout)
+            self.pages = 0
+
+    def replace(self, reason):
+        """Swap out a killed or unresponsive driver; nothing on it is touched but quit()."""
+        logger.warning("Replacing Chrome driver after %s", reason)
+        metrics.incr('driver_kills')
+        with metrics.stage('driver_restart'):
+            self.close()
+            self._driver = apply_timeouts(self.factory(), self.page_load_timeout)
+            self.pages = 0
+            if getattr(self._driver, 'attached_to_daemon', False):
+                # The daemon browser survived; leave the hung tab behind
+                try:
+                    fresh_tab(self._driver)
+                except Exception as e:
+                    logger.warning("Could not open a fresh tab: %s", e)
+
+    def close(self):
+        if self._driver is not None:
+            try:
+                self.closer(self._driver)
+            except Exception as e:
+                logger.warning("Error closing driver: %s", e)
+            self._driver = None
@@ -0,0 +1,186 @@
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # fall back to gzip when zstandard is not installed
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FAILED_PAGES_DIR = 'failed_pages'
+MAX_STORE_BYTES = 200 * 1024 * 1024
+MAX_PENDING = 100
+
+class FailedPageStore:
+    """Compressed, content-addressed store for the page source of failed fetches.
+
+    Blobs live at root/<sha[:2]>/<sha>.html.zst (or .html.gz) so identical block
+    pages are stored once; every failure is still recorded in root/index.jsonl
+    with its URL, attempt and blob extension. Writes happen on a background thread
+    and the oldest blobs, with their index entries, are evicted once the store grows
+    past max_bytes.
+    """
+
+    def __init__(self, root=FAILED_PAGES_DIR, max_bytes=MAX_STORE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.extension = '.html.zst' if zstandard else '.html.gz'
+        self.pending = queue.Queue(maxsize=MAX_PENDING)
+        self.dropped = 0
+        os.makedirs(root, exist_ok=True)
+        self.total_bytes = sum(size for _, _, size in self._blobs())
+        self.worker = threading.Thread(target=self._run, name='failed-page-store', daemon=True)
+        self.worker.start()
+
+    def save(self, url, attempt, page_source, reason=None):
+        """Queue a failed page for storage; never blocks the caller."""
+        try:
+            self.pending.put_nowait((url, attempt, page_source or '', reason, time.time()))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Failed-page store backlog full, dropped page for %s", url)
+
+    def close(self):
+        """Flush queued pages and stop the writer thread."""
+        if self.worker.is_alive():
+            self.pending.put(None)
+            self.worker.join()
+
+    def load(self, sha, extension=None):
+        """Return the decompressed page source for a content hash.
+
+        `extension` comes from the index entry; without it the blob is looked up under either
+        codec, so pages stored before a codec change still load.
+        """
+        path = self._path(sha, extension) if extension else self._find(sha)
+        if path is None:
+            raise FileNotFoundError(f"No stored page for {sha}")
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"{path} is zstd-compressed: pip install zstandard")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = gzip.decompress(data)
+        return data.decode('utf-8')
+
+    def _path(self, sha, extension=None):
+        return os.path.join(self.root, sha[:2], sha + (extension or self.extension))
+
+    def _find(self, sha):
+        """Path of the stored blob for `sha` under either codec, or None."""
+        for extension in (self.extension, '.html.zst', '.html.gz'):
+            path = self._path(sha, extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+            except Exception as e:
+                logger.error("Error storing failed page for %s: %s", item[0], e)
+
+    def _write(self, url, attempt, page_source, reason, saved_at):
+        raw = page_source.encode('utf-8')
+        sha = hashlib.sha256(raw).hexdigest()
+        path = self._find(sha)
+        duplicate = path is not None
+        if duplicate:
+            os.utime(path)  # keep recently seen block pages from being evicted first
+        else:
+            path = self._path(sha)
+            if zstandard:
+                blob = zstandard.ZstdCompressor(level=10).compress(raw)
+            else:
+                blob = gzip.compress(raw, compresslevel=6)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+            self.total_bytes += len(blob)
+
+        entry = {
+            'sha256': sha,
+            'url': url,
+            'attempt': attempt,
+            'reason': reason,
+            'saved_at': saved_at,
+            'bytes': len(raw),
+            'duplicate': duplicate,
+            'extension': os.path.basename(path)[len(sha):]
+        }
+        with open(os.path.join(self.root, 'index.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+        logger.info("Stored failed page for %s (attempt %s) as %s%s",
+                    url, attempt, sha[:12], ' (duplicate)' if duplicate else '')
+
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _blobs(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(('.html.zst', '.html.gz')):
+                    path = os.path.join(dirpath, filename)
+                    stat = os.stat(path)
+                    yield stat.st_mtime, path, stat.st_size
+
+    def _evict(self):
+        """Delete least recently stored/seen blobs until the store is back under its cap,
+        then drop their entries from the index."""
+        evicted = set()
+        for _, path, size in sorted(self._blobs()):
+            if self.total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            self.total_bytes -= size
+            evicted.add(os.path.basename(path).split('.', 1)[0])
+            logger.info("Evicted failed page %s", os.path.basename(path))
+        if evicted:
+            self._prune_index(evicted)
+
+    def _prune_index(self, evicted):
+        index_path = os.path.join(self.root, 'index.jsonl')
+        tmp_path = index_path + '.tmp'
+        kept = dropped = 0
+        with open(index_path, encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+            for line in src:
+                try:
+                    sha = json.loads(line).get('sha256')
+                except ValueError:
+                    sha = None
+                if sha in evicted:
+                    dropped += 1
+                    continue
+                dst.write(line)
+                kept += 1
+        os.replace(tmp_path, index_path)
+        logger.info("Pruned %s index entries for evicted pages, %s kept", dropped, kept)
+
+_store = None
+
+def get_failed_page_store():
+    """Process-wide store, flushed at exit."""
+    global _store
+    if _store is None:
+        _store = FailedPageStore()
+        atexit.register(_store.close)
+    return _store
+
+def save_failed_page(url, attempt, page_source, reason=None):
+    get_failed_page_store().save(url, attempt, page_source, reason)
@@ -1,29 +1,43 @@
 import time
+import math
 import random
-import csv
 import logging
-import json
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
+from priceHistory import PriceHistory
+from recrawlScheduler import CRAWL_BUDGET, RecrawlScheduler
+from recordSink import RecordSink
+from dedupIndex import DedupIndex
+from urlFrontier import Frontier, canonicalize
+from parseWorkers import ParsePool, parse_listing_html
+from failedPageStore import save_failed_page
+from pageArchive import archive_page
+from runMetrics import metrics
+from scraperLogging import setup_logging, get_tile_logger
+from browserDaemon import attach_driver, cached_driver_path, close_driver
+from driverLifecycle import PAGE_DEADLINE, PAGE_REQUEUES, DriverManager, PageTimeout, RunDeadline, pause_deadline
+from blockCoordinator import detect_block, get_coordinator, host_of
+from categoryDiscovery import get_category_urls
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraper.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
+tile_logger = get_tile_logger(__name__)
+
+# A category's next page goes ahead of every category still waiting in the frontier
+NEXT_PAGE_PRIORITY = math.inf
 
 def setup_driver():
+    """Attach to the warm browser daemon if one is running, otherwise launch a fresh Chrome."""
+    with metrics.stage('startup'):
+        driver = attach_driver()
+        metrics.set_gauge('warm_start', 1 if driver else 0)
+        return driver or _launch_driver()
+
+def _launch_driver():
     logger.info("Setting up Chrome driver")
     user_agents = [
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -42,258 +56,204 @@ def setup_driver():
     chrome_options.add_argument('accept-encoding=gzip, deflate, br')
     
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        driver = webdriver.Chrome(service=Service(cached_driver_path()), options=chrome_options)
         logger.info("Chrome driver initialized with newer Selenium syntax")
     except TypeError:
-        driver = webdriver.Chrome(executable_path=ChromeDriverManager().install(), chrome_options=chrome_options)
+        driver = webdriver.Chrome(executable_path=cached_driver_path(), chrome_options=chrome_options)
         logger.info("Chrome driver initialized with older Selenium syntax (fallback)")
     return driver
 
 def get_soup(url, driver, retries=3):
-    logger.info(f"Fetching URL: {url}")
+    page_source = get_page_source(url, driver, retries)
+    if page_source is None:
+        return None
+    with metrics.stage('parse'):
+        soup = BeautifulSoup(page_source, 'html.parser')
+    logger.info("Page parsed with BeautifulSoup")
+    return soup
+
+def get_page_source(url, driver, retries=3):
+    logger.info("Fetching URL: %s", url)
+    host = host_of(url)
+    coordinator = get_coordinator()
     for attempt in range(retries):
         try:
-            driver.get(url)
-            logger.info(f"Waiting for page to load (attempt {attempt + 1}/{retries})")
-            # Wait for product grid or product elements
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div[class*='product-grid'], div.product"))
-            )
-            # Scroll to trigger JavaScript rendering
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(2, 4))  # Additional delay for content to settle
+            if attempt > 0:
+                metrics.incr('retries')
+            with pause_deadline():  # a host backoff (up to 15 min) is not a hung browser
+                coordinator.wait(host)
+            with metrics.stage('fetch'):
+                driver.get(url)
+            block = detect_block(title=driver.title)
+            if block:
+                save_failed_page(url, attempt + 1, driver.page_source, reason=block)
+                coordinator.report_block(host, block)
+                continue
+            logger.info("Waiting for page to load (attempt %s/%s)", attempt + 1, retries)
+            with metrics.stage('wait'):
+                # Wait for product grid or product elements
+                WebDriverWait(driver, 15).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "div[class*='product-grid'], div.product"))
+                )
+                # Scroll to trigger JavaScript rendering
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                time.sleep(random.uniform(2, 4))  # Additional delay for content to settle
             page_source = driver.page_source
-            logger.info(f"Page source retrieved, length: {len(page_source)} characters")
-            soup = BeautifulSoup(page_source, 'html.parser')
-            logger.info("Page parsed with BeautifulSoup")
-            return soup
+            metrics.incr('bytes', len(page_source))
+            logger.info("Page source retrieved, length: %s characters", len(page_source))
+            archive_page(url, page_source)
+            coordinator.report_ok(host)
+            return page_source
         except Exception as e:
-            logger.error(f"Error fetching {url} (attempt {attempt + 1}/{retries}): {e}")
-            # Compute filename component outside f-string
-            url_last_part = url.split('/')[-1].replace('/', '_')  # Replace any slashes for valid filename
-            filename = f'failed_page_{attempt + 1}_{url_last_part}.html'
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(driver.page_source)
-            logger.info(f"Saved failed page source to {filename}")
+            metrics.incr('fetch_errors')
+            logger.error("Error fetching %s (attempt %s/%s): %s", url, attempt + 1, retries, e)
+            save_failed_page(url, attempt + 1, driver.page_source, reason=str(e))
             time.sleep(random.uniform(2, 5))
-    logger.error(f"Failed to fetch {url} after {retries} attempts")
+    metrics.incr('failed_pages')
+    logger.error("Failed to fetch %s after %s attempts", url, retries)
     return None
 
-def flatten_product_data(data, product_url, rating_text, reviews_text):
-    """Flatten the JSON data-productdatalayer into a dictionary for CSV."""
-    try:
-        # Initialize default values
-        flat_data = {
-            'title': 'No title',
-            'price_revenue': 'No price',
-            'product_code': 'No product code',
-            'rating': rating_text,
-            'reviews': reviews_text,
-            'url': product_url,
-            'brand': 'No brand',
-            'ean': 'No EAN',
-            'sku': 'No SKU',
-            'price_base_revenue': 'No base revenue',
-            'price_currency': 'No currency',
-            'price_tax': 'No tax',
-            'price_offers': 'No offers',
-            'payment_one_off_amount': 'No one-off amount',
-            'payment_monthly_amount': 'No monthly amount',
-            'availability_shipping_status': 'No shipping status',
-            'availability_collect_status': 'No collect status',
-            'availability_shipping_type': 'No shipping type',
-            'availability_collect_type': 'No collect type',
-            'category_categories': 'No categories',
-            'category_merchendising_area': 'No merchendising area',
-            'category_sub_planning_group': 'No sub planning group',
-            'category_planning_group': 'No planning group',
-            'category_product_type': 'No product type'
-        }
-
-        # Core product info
-        flat_data['title'] = data.get('name', 'No title')
-        flat_data['product_code'] = data.get('id', 'No product code')
-        flat_data['brand'] = data.get('brand', 'No brand')
-        flat_data['ean'] = data.get('ean', 'No EAN')
-        flat_data['sku'] = data.get('sku', 'No SKU')
-
-        # Price info
-        price = data.get('price', [{}])[0]
-        flat_data['price_revenue'] = str(price.get('revenue', 'No price'))
-        flat_data['price_base_revenue'] = str(price.get('baseRevenue', 'No base revenue'))
-        flat_data['price_currency'] = price.get('currency', 'No currency')
-        flat_data['price_tax'] = str(price.get('tax', 'No tax'))
-        flat_data['price_offers'] = ', '.join([offer.get('name', '') for offer in price.get('offer', [])]) or 'No offers'
-
-        # Payment info
-        for payment in data.get('payment', []):
-            if payment.get('frequency') == 'one off':
-                flat_data['payment_one_off_amount'] = str(payment.get('amount', 'No one-off amount'))
-            elif payment.get('frequency') == 'monthly':
-                flat_data['payment_monthly_amount'] = str(payment.get('amount', 'No monthly amount'))
-
-        # Availability info
-        for avail in data.get('availability', []):
-            if avail.get('availabilityStatus') == 'shipping':
-                flat_data['availability_shipping_status'] = avail.get('availabilityStatus', 'No shipping status')
-                flat_data['availability_shipping_type'] = avail.get('availabilityType', 'No shipping type')
-            elif avail.get('availabilityStatus') == 'collect in store':
-                flat_data['availability_collect_status'] = avail.get('availabilityStatus', 'No collect status')
-                flat_data['availability_collect_type'] = avail.get('availabilityType', 'No collect type')
-
-        # Category info
-        category = data.get('category', {})
-        flat_data['category_categories'] = ', '.join(category.get('categories', [])) or 'No categories'
-        flat_data['category_merchendising_area'] = category.get('merchendisingArea', 'No merchendising area')
-        flat_data['category_sub_planning_group'] = category.get('subPlanningGroup', 'No sub planning group')
-        flat_data['category_planning_group'] = category.get('planningGroup', 'No planning group')
-        flat_data['category_product_type'] = category.get('productType', 'No product type')
-
-        return flat_data
-    except Exception as e:
-        logger.error(f"Error flattening product data: {e}")
-        return None
-
-def scrape_product_info(product):
-    logger.info("Scraping product information")
-    try:
-        # Extract data-productdatalayer JSON
-        data_layer = product.get('data-productdatalayer')
-        if not data_layer:
-            logger.warning("No data-productdatalayer found for product")
-            return None
-        
-        # Parse JSON (remove square brackets and parse first object)
-        try:
-            data = json.loads(data_layer)[0]
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing data-productdatalayer: {e}")
+def scrape_page(url, driver):
+    """Fetch one listing page and parse it with the same parser as a crawl; returns (records, next_url),
+    or None when the page could not be fetched (errors or a block on every attempt)."""
+    with metrics.stage('page'):
+        logger.info("Scraping lister page: %s", url)
+        metrics.incr('pages')
+        page_source = get_page_source(url, driver)
+        if page_source is None:
+            logger.error("No page source returned, skipping page")
             return None
+        page = parse_listing_html(url, page_source)
+        metrics.observe('parse', page.seconds)
+        metrics.incr('tiles', page.tiles)
+        metrics.incr('products', len(page.records))
+        return page.records, page.next_url
 
-        # Extract URL from the product link
-        link = product.find('a', class_='link text-truncate pdpLink', href=True)
-        product_url = 'https://www.currys.co.uk' + link['href'] if link and not link['href'].startswith('http') else link['href'] if link else 'No URL'
+def scrape_category(category_url, manager, dedup=None, frontier=None, pool=None, run_deadline=None, on_listed=None):
+    """Yield a category's product records as each page is parsed.
 
-        # Extract rating and reviews from HTML
-        rating = product.find('span', class_='nvda_star_reading')
-        reviews = product.find('span', class_='rating-count average-reviews')
-        rating_text = rating.text.strip() if rating else 'No rating'
-        reviews_text = reviews.text.strip() if reviews else 'No reviews'
+    `manager` may swap in a fresh driver between pages. Pages go through the URL frontier, so a
+    page reached twice under different URLs (or a pagination loop) is fetched once. With a
+    ParsePool, pages are parsed in worker processes while the browser fetches the next one.
+    Each page runs under the manager's watchdog deadline and is retried on a fresh browser
+    after a kill; no new page starts once `run_deadline` is spent. `on_listed` sees every valid
+    tile before the dedup check, so category membership does not depend on crawl order.
+    """
+    logger.info("Starting to scrape category: %s", category_url)
+    metrics.incr('categories')
+    if dedup:
+        dedup.begin_category(category_url)
+    if frontier is None:  # not `or`: an empty Frontier is falsy
+        frontier = Frontier()
+    pool = pool or ParsePool(workers=0)
+    run_deadline = run_deadline or RunDeadline(None)
+    count = 0
 
-        # Flatten the JSON data
-        flat_data = flatten_product_data(data, product_url, rating_text, reviews_text)
-        if not flat_data:
-            logger.warning(f"Failed to flatten data for product: {product_url}")
-            return None
+    def fetch_page(url):
+        logger.info("Scraping lister page: %s", url)
+        metrics.incr('pages')
+        page_source = None
+        started = time.perf_counter()
+        for attempt in range(PAGE_REQUEUES + 1):
+            if run_deadline.expired():
+                break
+            if attempt:
+                metrics.incr('requeued_pages')
+                logger.warning("Requeueing %s on a fresh browser (%s/%s)", url, attempt, PAGE_REQUEUES)
+            try:
+                with manager.deadline(url, run_deadline.cap(PAGE_DEADLINE)) as driver:
+                    page_source = get_page_source(url, driver)
+                break
+            except PageTimeout as e:
+                logger.error("%s", e)
+        metrics.observe('page_fetch', time.perf_counter() - started)
+        if page_source is None:
+            logger.error("No page source returned, skipping page")
+        manager.page_done()
+        return page_source
 
-        if flat_data['title'] != 'No title' and flat_data['price_revenue'] != 'No price':
-            logger.info(f"Scraped product: {flat_data['title']}, Price: {flat_data['price_revenue']}, Code: {flat_data['product_code']}, Rating: {flat_data['rating']}, Reviews: {flat_data['reviews']}, URL: {flat_data['url']}")
-            return flat_data
-        else:
-            logger.warning(f"Missing title or price for product: {product_url}")
+    def follow(next_path):
+        if run_deadline.expired():
+            logger.warning("Run deadline reached, not following %s", next_path)
             return None
-    except Exception as e:
-        logger.error(f"Error parsing product: {e}")
-        return None
-
-def scrape_page(url, driver):
-    logger.info(f"Scraping lister page: {url}")
-    soup = get_soup(url, driver)
-    if not soup:
-        logger.error("No soup object returned, skipping page")
-        return [], None
-
-    # Try primary product grid selector (used in desktop category)
-    product_grid = soup.find('div', class_='row product-grid list-view justify-content-center')
-    if product_grid:
-        products = product_grid.find_all('div', class_='product')
-        logger.info(f"Found {len(products)} products using primary grid selector")
-    else:
-        logger.warning("Primary product grid not found, trying fallback selector")
-        # Fallback: Find all divs with class 'product' or containing data-productdatalayer
-        products = soup.find_all('div', class_='product')
-        if not products:
-            products = soup.find_all('div', attrs={'data-productdatalayer': True})
-        logger.info(f"Found {len(products)} products using fallback selector")
-    
-    product_data = []
-    for product in products:
-        info = scrape_product_info(product)
-        if info:
-            product_data.append(info)
-    
-    logger.info(f"Collected {len(product_data)} valid products from page")
-    
-    next_link = soup.find('a', class_='next')
-    next_url = next_link['href'] if next_link else None
-    if next_url and not next_url.startswith('http'):
-        next_url = 'https://www.currys.co.uk' + next_url
-    logger.info(f"Next page link: {next_url if next_url else 'None'}")
-    
-    return product_data, next_url
-
-def scrape_category(category_url, driver):
-    logger.info(f"Starting to scrape category: {category_url}")
-    all_products = []
-    current_url = category_url
-    while current_url:
-        products, next_path = scrape_page(current_url, driver)
-        all_products.extend(products)
-        logger.info(f"Total products collected in category so far: {len(all_products)}")
-        
-        if next_path:
-            current_url = next_path
-            logger.info(f"Moving to next page: {current_url}")
+        if not frontier.add(next_path, NEXT_PAGE_PRIORITY, category_url=category_url):
+            logger.info("Next page %s already fetched, stopping", next_path)
+            return None
+        logger.info("Moving to next page: %s", next_path)
+        with metrics.stage('delay'):
             time.sleep(random.uniform(2, 4))
-        else:
-            logger.info("No more pages in category")
-            current_url = None
+        return frontier.pop().url
+
+    # main() seeds the frontier with every planned category; a standalone call queues its own
+    if frontier.add(category_url, NEXT_PAGE_PRIORITY, category_url=category_url):
+        frontier.pop()
+    with metrics.stage('category'):
+        for page in pool.crawl(canonicalize(category_url), fetch_page, follow):
+            # Workers parse and flatten every tile, duplicates included: membership needs each tile's
+            # keys, and flattening is ~6% of a page's parse next to building the tree, which a
+            # duplicate costs either way. Only the records written out are deduplicated.
+            for record in page.records:
+                if on_listed:
+                    on_listed(record)
+                if dedup:
+                    if dedup.check(record['product_code'], record['sku'], record['url']):
+                        tile_logger.info("Skipping duplicate product: %s", record['product_code'])
+                        continue
+                    dedup.add(record['product_code'], record['sku'], record['url'])
+                tile_logger.info("Scraped product: %s, Price: %s, Code: %s, Rating: %s, Reviews: %s, URL: %s", record['title'], record['price_revenue'], record['product_code'], record['rating'], record['reviews'], record['url'])
+                count += 1
+                yield record
+            logger.info("Collected %s products from %s; category total so far: %s", len(page.records), page.url, count)
     
-    logger.info(f"Finished scraping category, collected {len(all_products)} products")
-    return all_products
+    logger.info("Finished scraping category, collected %s products", count)
 
 def main():
-    # Provided category URLs
-    category_urls = [
-        'https://www.currys.co.uk/computing/desktop-pcs/desktops/apple',
-        'https://www.currys.co.uk/computing/laptops/laptops/apple',
-        'https://www.currys.co.uk/phones/mobile-phones/mobile-phones/apple',
-        'https://www.currys.co.uk/smart-tech/smart-watches-and-fitness/smart-watches/apple',
-        'https://www.currys.co.uk/computing/ipad-tablets-and-ereaders/tablets/apple',
-        'https://www.currys.co.uk/phones/mobile-phone-accessories/mobile-phone-accessories/apple'
-    ]
+    # Configure logging here, not at import, so spawned parse workers don't each start a run log
+    run_id = setup_logging()
+    category_urls = get_category_urls()
     
     logger.info("Starting scraper")
-    driver = setup_driver()
-    all_products = []
+    with PriceHistory() as history:
+        plan = RecrawlScheduler(history).plan(category_urls, CRAWL_BUDGET)
+    manager = DriverManager(setup_driver, close_driver)
+    run_deadline = RunDeadline()
+    dedup = DedupIndex()
+    frontier = Frontier()
+    pool = ParsePool()
+    # The plan's order becomes frontier priority, so the fetch layer takes categories in plan order
+    entries = {}
+    for rank, entry in enumerate(plan):
+        url = frontier.add(entry['url'], len(plan) - rank, kind='category', category_url=entry['url'])
+        if url:
+            entries[url] = entry
     
+    # Records stream from each parsed page straight into the CSV / catalogue / history sink
     try:
-        for category_url in category_urls:
-            logger.info(f"Processing category: {category_url}")
-            products = scrape_category(category_url, driver)
-            all_products.extend(products)
-            logger.info(f"Total products collected across all categories: {len(all_products)}")
-            time.sleep(random.uniform(5, 10))  # Add delay between categories
+        with RecordSink('apple_products_dataLayer.csv', encoding='utf-8') as sink:
+            while len(frontier):
+                if run_deadline.expired():
+                    metrics.incr('run_deadline_hit')
+                    logger.warning("Run deadline reached, skipping the remaining categories")
+                    break
+                entry = entries[frontier.pop().url]
+                category_url = entry['url']
+                logger.info("Processing category: %s (due=%s, priority=%.1f)", category_url, entry['due'], entry['priority'])
+                started = time.perf_counter()
+                listed = lambda record, url=category_url: sink.add_member(url, record)
+                for record in scrape_category(category_url, manager, dedup, frontier, pool, run_deadline, listed):
+                    sink.write(record)
+                sink.end_category(category_url, time.perf_counter() - started)
+                logger.info("Total products collected across all categories: %s", sink.count)
+                time.sleep(random.uniform(5, 10))  # Add delay between categories
     finally:
         logger.info("Closing Chrome driver")
-        driver.quit()
-    
-    logger.info(f"Writing {len(all_products)} products to CSV")
-    with open('apple_products_dataLayer.csv', 'w', newline='', encoding='utf-8') as f:
-        fieldnames = [
-            'title', 'price_revenue', 'product_code', 'rating', 'reviews', 'url',
-            'brand', 'ean', 'sku', 'price_base_revenue', 'price_currency', 'price_tax',
-            'price_offers', 'payment_one_off_amount', 'payment_monthly_amount',
-            'availability_shipping_status', 'availability_collect_status',
-            'availability_shipping_type', 'availability_collect_type',
-            'category_categories', 'category_merchendising_area',
-            'category_sub_planning_group', 'category_planning_group', 'category_product_type'
-        ]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(all_products)
+        manager.close()
+        pool.close()
+    dedup.log_report()
+    metrics.log_summary()
+    metrics.write_report('fullDataLayerCatSync', run_id)
     
-    logger.info(f"Scraped {len(all_products)} products from all categories. Data saved to apple_products_dataLayer.csv")
+    logger.info("Scraped %s products from all categories. Data saved to apple_products_dataLayer.csv", sink.count)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,24 +1,22 @@
 import time
 import random
-import csv
 import logging
 import json
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
+from productSchema import flatten_product_data, missing_required, write_products_csv
+from columnarSink import write_catalogue
+from priceHistory import PriceHistory
+from scraperLogging import setup_logging, get_tile_logger
+from browserDaemon import cached_driver_path
+from urlFrontier import canonicalize
+from categoryDiscovery import get_category_urls
+from driverLifecycle import apply_timeouts
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraper.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
+tile_logger = get_tile_logger(__name__)
 
 def setup_driver():
     logger.info("Setting up Chrome driver")
@@ -33,108 +31,33 @@ def setup_driver():
     chrome_options.add_argument('accept-encoding=gzip, deflate, br')
     
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        driver = webdriver.Chrome(service=Service(cached_driver_path()), options=chrome_options)
         logger.info("Chrome driver initialized with newer Selenium syntax")
     except TypeError:
-        driver = webdriver.Chrome(executable_path=ChromeDriverManager().install(), chrome_options=chrome_options)
+        driver = webdriver.Chrome(executable_path=cached_driver_path(), chrome_options=chrome_options)
         logger.info("Chrome driver initialized with older Selenium syntax (fallback)")
-    return driver
+    return apply_timeouts(driver)
 
 def get_soup(url, driver, retries=3):
-    logger.info(f"Fetching URL: {url}")
+    logger.info("Fetching URL: %s", url)
     for attempt in range(retries):
         try:
             driver.get(url)
-            logger.info(f"Waiting for page to load (attempt {attempt + 1}/{retries})")
+            logger.info("Waiting for page to load (attempt %s/%s)", attempt + 1, retries)
             time.sleep(random.uniform(2, 4))
             page_source = driver.page_source
-            logger.info(f"Page source retrieved, length: {len(page_source)} characters")
+            logger.info("Page source retrieved, length: %s characters", len(page_source))
             soup = BeautifulSoup(page_source, 'html.parser')
             logger.info("Page parsed with BeautifulSoup")
             return soup
         except Exception as e:
-            logger.error(f"Error fetching {url} (attempt {attempt + 1}/{retries}): {e}")
+            logger.error("Error fetching %s (attempt %s/%s): %s", url, attempt + 1, retries, e)
             time.sleep(random.uniform(2, 5))
-    logger.error(f"Failed to fetch {url} after {retries} attempts")
+    logger.error("Failed to fetch %s after %s attempts", url, retries)
     return None
 
-def flatten_product_data(data, product_url, rating_text, reviews_text):
-    """Flatten the JSON data-productdatalayer into a dictionary for CSV."""
-    try:
-        # Initialize default values
-        flat_data = {
-            'title': 'No title',
-            'price_revenue': 'No price',
-            'product_code': 'No product code',
-            'rating': rating_text,
-            'reviews': reviews_text,
-            'url': product_url,
-            'brand': 'No brand',
-            'ean': 'No EAN',
-            'sku': 'No SKU',
-            'price_base_revenue': 'No base revenue',
-            'price_currency': 'No currency',
-            'price_tax': 'No tax',
-            'price_offers': 'No offers',
-            'payment_one_off_amount': 'No one-off amount',
-            'payment_monthly_amount': 'No monthly amount',
-            'availability_shipping_status': 'No shipping status',
-            'availability_collect_status': 'No collect status',
-            'availability_shipping_type': 'No shipping type',
-            'availability_collect_type': 'No collect type',
-            'category_categories': 'No categories',
-            'category_merchendising_area': 'No merchendising area',
-            'category_sub_planning_group': 'No sub planning group',
-            'category_planning_group': 'No planning group',
-            'category_product_type': 'No product type'
-        }
-
-        # Core product info
-        flat_data['title'] = data.get('name', 'No title')
-        flat_data['product_code'] = data.get('id', 'No product code')
-        flat_data['brand'] = data.get('brand', 'No brand')
-        flat_data['ean'] = data.get('ean', 'No EAN')
-        flat_data['sku'] = data.get('sku', 'No SKU')
-
-        # Price info
-        price = data.get('price', [{}])[0]
-        flat_data['price_revenue'] = str(price.get('revenue', 'No price'))
-        flat_data['price_base_revenue'] = str(price.get('baseRevenue', 'No base revenue'))
-        flat_data['price_currency'] = price.get('currency', 'No currency')
-        flat_data['price_tax'] = str(price.get('tax', 'No tax'))
-        flat_data['price_offers'] = ', '.join([offer.get('name', '') for offer in price.get('offer', [])]) or 'No offers'
-
-        # Payment info
-        for payment in data.get('payment', []):
-            if payment.get('frequency') == 'one off':
-                flat_data['payment_one_off_amount'] = str(payment.get('amount', 'No one-off amount'))
-            elif payment.get('frequency') == 'monthly':
-                flat_data['payment_monthly_amount'] = str(payment.get('amount', 'No monthly amount'))
-
-        # Availability info
-        for avail in data.get('availability', []):
-            if avail.get('availabilityStatus') == 'shipping':
-                flat_data['availability_shipping_status'] = avail.get('availabilityStatus', 'No shipping status')
-                flat_data['availability_shipping_type'] = avail.get('availabilityType', 'No shipping type')
-            elif avail.get('availabilityStatus') == 'collect in store':
-                flat_data['availability_collect_status'] = avail.get('availabilityStatus', 'No collect status')
-                flat_data['availability_collect_type'] = avail.get('availabilityType', 'No collect type')
-
-        # Category info
-        category = data.get('category', {})
-        flat_data['category_categories'] = ', '.join(category.get('categories', [])) or 'No categories'
-        flat_data['category_merchendising_area'] = category.get('merchendisingArea', 'No merchendising area')
-        flat_data['category_sub_planning_group'] = category.get('subPlanningGroup', 'No sub planning group')
-        flat_data['category_planning_group'] = category.get('planningGroup', 'No planning group')
-        flat_data['category_product_type'] = category.get('productType', 'No product type')
-
-        return flat_data
-    except Exception as e:
-        logger.error(f"Error flattening product data: {e}")
-        return None
-
 def scrape_product_info(product):
-    logger.info("Scraping product information")
+    tile_logger.info("Scraping product information")
     try:
         # Extract data-productdatalayer JSON
         data_layer = product.get('data-productdatalayer')
@@ -146,12 +69,12 @@ def scrape_product_info(product):
         try:
             data = json.loads(data_layer)[0]
         except json.JSONDecodeError as e:
-            logger.error(f"Error parsing data-productdatalayer: {e}")
+            logger.error("Error parsing data-productdatalayer: %s", e)
             return None
 
         # Extract URL from the product link
         link = product.find('a', class_='link text-truncate pdpLink', href=True)
-        product_url = 'https://www.currys.co.uk' + link['href'] if link and not link['href'].startswith('http') else link['href'] if link else 'No URL'
+        product_url = canonicalize(link['href']) if link else 'No URL'
 
         # Extract rating and reviews from HTML
         rating = product.find('span', class_='nvda_star_reading')
@@ -162,21 +85,22 @@ def scrape_product_info(product):
         # Flatten the JSON data
         flat_data = flatten_product_data(data, product_url, rating_text, reviews_text)
         if not flat_data:
-            logger.warning(f"Failed to flatten data for product: {product_url}")
+            logger.warning("Failed to flatten data for product: %s", product_url)
             return None
 
-        if flat_data['title'] != 'No title' and flat_data['price_revenue'] != 'No price':
-            logger.info(f"Scraped product: {flat_data['title']}, Price: {flat_data['price_revenue']}, Code: {flat_data['product_code']}, Rating: {flat_data['rating']}, Reviews: {flat_data['reviews']}, URL: {flat_data['url']}")
+        missing = missing_required(flat_data)
+        if not missing:
+            tile_logger.info("Scraped product: %s, Price: %s, Code: %s, Rating: %s, Reviews: %s, URL: %s", flat_data['title'], flat_data['price_revenue'], flat_data['product_code'], flat_data['rating'], flat_data['reviews'], flat_data['url'])
             return flat_data
         else:
-            logger.warning(f"Missing title or price for product: {product_url}")
+            logger.warning("Missing %s for product: %s", ", ".join(missing), product_url)
             return None
     except Exception as e:
-        logger.error(f"Error parsing product: {e}")
+        logger.error("Error parsing product: %s", e)
         return None
 
 def scrape_page(url, driver):
-    logger.info(f"Scraping lister page: {url}")
+    logger.info("Scraping lister page: %s", url)
     soup = get_soup(url, driver)
     if not soup:
         logger.error("No soup object returned, skipping page")
@@ -188,7 +112,7 @@ def scrape_page(url, driver):
         products = []
     else:
         products = product_grid.find_all('div', class_='product')
-        logger.info(f"Found {len(products)} products on page")
+        logger.info("Found %s products on page", len(products))
     
     product_data = []
     for product in products:
@@ -196,46 +120,39 @@ def scrape_page(url, driver):
         if info:
             product_data.append(info)
     
-    logger.info(f"Collected {len(product_data)} valid products from page")
+    logger.info("Collected %s valid products from page", len(product_data))
     
     next_link = soup.find('a', class_='next')
     next_url = next_link['href'] if next_link else None
-    if next_url and not next_url.startswith('http'):
-        next_url = 'https://www.currys.co.uk' + next_url
-    logger.info(f"Next page link: {next_url if next_url else 'None'}")
+    next_url = canonicalize(next_url)
+    logger.info("Next page link: %s", next_url if next_url else 'None')
     
     return product_data, next_url
 
 def scrape_category(category_url, driver):
-    logger.info(f"Starting to scrape category: {category_url}")
+    logger.info("Starting to scrape category: %s", category_url)
     all_products = []
     current_url = category_url
     while current_url:
         products, next_path = scrape_page(current_url, driver)
         all_products.extend(products)
-        logger.info(f"Total products collected in category so far: {len(all_products)}")
+        logger.info("Total products collected in category so far: %s", len(all_products))
         
         if next_path:
             current_url = next_path
-            logger.info(f"Moving to next page: {current_url}")
+            logger.info("Moving to next page: %s", current_url)
             time.sleep(random.uniform(2, 4))
         else:
             logger.info("No more pages in category")
             current_url = None
     
-    logger.info(f"Finished scraping category, collected {len(all_products)} products")
+    logger.info("Finished scraping category, collected %s products", len(all_products))
     return all_products
 
 def main():
-    # Provided category URLs
-    category_urls = [
-        'https://www.currys.co.uk/computing/desktop-pcs/desktops/apple',
-        'https://www.currys.co.uk/computing/laptops/laptops/apple',
-        'https://www.currys.co.uk/phones/mobile-phones/mobile-phones/apple',
-        'https://www.currys.co.uk/smart-tech/smart-watches-and-fitness/smart-watches/apple',
-        'https://www.currys.co.uk/computing/ipad-tablets-and-ereaders/tablets/apple',
-        'https://www.currys.co.uk/phones/mobile-phone-accessories/mobile-phone-accessories/apple'
-    ]
+    # Configure logging here, not at import: a plain import shouldn't start a run log
+    setup_logging()
+    category_urls = get_category_urls()
     
     logger.info("Starting scraper")
     driver = setup_driver()
@@ -243,30 +160,21 @@ def main():
     
     try:
         for category_url in category_urls:
-            logger.info(f"Processing category: {category_url}")
+            logger.info("Processing category: %s", category_url)
             products = scrape_category(category_url, driver)
             all_products.extend(products)
-            logger.info(f"Total products collected across all categories: {len(all_products)}")
+            logger.info("Total products collected across all categories: %s", len(all_products))
     finally:
         logger.info("Closing Chrome driver")
         driver.quit()
     
-    logger.info(f"Writing {len(all_products)} products to CSV")
-    with open('apple_products_dataLayer.csv', 'w', newline='', encoding='utf-8') as f:
-        fieldnames = [
-            'title', 'price_revenue', 'product_code', 'rating', 'reviews', 'url',
-            'brand', 'ean', 'sku', 'price_base_revenue', 'price_currency', 'price_tax',
-            'price_offers', 'payment_one_off_amount', 'payment_monthly_amount',
-            'availability_shipping_status', 'availability_collect_status',
-            'availability_shipping_type', 'availability_collect_type',
-            'category_categories', 'category_merchendising_area',
-            'category_sub_planning_group', 'category_planning_group', 'category_product_type'
-        ]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(all_products)
+    logger.info("Writing %s products to CSV", len(all_products))
+    write_products_csv('apple_products_dataLayer.csv', all_products, mode='w', encoding='utf-8')
+    write_catalogue(all_products)
+    with PriceHistory() as history:
+        history.record_run(all_products)
     
-    logger.info(f"Scraped {len(all_products)} products from all categories. Data saved to apple_products.csv")
+    logger.info("Scraped %s products from all categories. Data saved to apple_products.csv", len(all_products))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from bs4 import BeautifulSoup
+
+try:
+    import httpx
+except ImportError:  # only needed by the async callers; make_async_client reports it
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+RETRIES = 3
+BACKOFF_FACTOR = 1
+BACKOFF_MAX = 120
+RETRY_STATUSES = [403, 429, 500, 502, 503, 504]
+RETRY_AFTER_STATUSES = [413, 429, 503]
+CONCURRENCY = 6
+TIMEOUT = 10
+
+def get_headers():
+    user_agents = [
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Safari/605.1.15',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
+        'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Mobile/15E148 Safari/604.1'
+    ]
+    return {
+        'User-Agent': random.choice(user_agents),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Referer': 'https://www.currys.co.uk/'
+    }
+
+def async_headers():
+    # httpx negotiates Accept-Encoding itself, and HTTP/2 forbids the Connection header
+    headers = get_headers()
+    del headers['Connection'], headers['Accept-Encoding']
+    return headers
+
+def make_async_client(concurrency=CONCURRENCY):
+    """One pooled client for the whole run: keep-alive connections, HTTP/2 where the server offers it."""
+    if httpx is None:
+        raise RuntimeError("The async client needs httpx: pip install 'httpx[http2]'")
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        timeout=TIMEOUT,
+        follow_redirects=True
+    )
+
+def retry_delay(attempt, response=None):
+    """Same schedule as urllib3's Retry: Retry-After when the server sends one, else
+    backoff_factor * 2 ** (attempt - 1) from the second consecutive failure on."""
+    if response is not None and response.status_code in RETRY_AFTER_STATUSES:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+    if attempt <= 1:
+        return 0.0
+    return min(BACKOFF_MAX, BACKOFF_FACTOR * 2 ** (attempt - 1))
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across every task of the loop."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def get_soup_async(client, url, semaphore, retries=RETRIES):
+    """Async page fetch: at most `semaphore` requests in flight across all callers, and
+    retries on RETRY_STATUSES and connection errors like the sync Retry adapter."""
+    for attempt in range(1, retries + 2):
+        response = None
+        try:
+            async with semaphore:
+                response = await client.get(url, headers=async_headers())
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return BeautifulSoup(response.text, 'html.parser')
+            error = f"{response.status_code} {response.reason_phrase}"
+        except httpx.HTTPStatusError as e:  # e.g. 404: not worth retrying
+            logger.warning("Error fetching %s: %s", url, e)
+            return None
+        except httpx.TransportError as e:
+            error = e
+        if attempt > retries:
+            break
+        await asyncio.sleep(retry_delay(attempt, response))
+    logger.warning("Error fetching %s: %s", url, error)
+    return None
@@ -0,0 +1,347 @@
+import argparse
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timezone
+import scraperLogging
+from runMetrics import metrics
+from urlFrontier import canonicalize
+
+try:
+    import zstandard
+except ImportError:  # fall back to zlib with a preset dictionary
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DB = os.environ.get('SCRAPER_ARCHIVE_DB', os.path.join('page_archive', 'pages.db'))
+ARCHIVE_ENABLED = os.environ.get('SCRAPER_ARCHIVE', '1') != '0'
+TRAIN_SAMPLES = 40             # pages collected before the first dictionary is trained
+DICT_SIZE = 112 * 1024         # zstd dictionary size
+ZLIB_DICT_SIZE = 32 * 1024     # zlib only looks back 32 KiB
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+MAX_PENDING = 100
+
+class PageArchive:
+    """Every fetched listing page, compressed, in one SQLite file indexed by URL and fetch time.
+
+    Listing pages share most of their markup, so pages are compressed against a dictionary
+    trained on earlier pages (zstd, or zlib's preset dictionary without zstandard). Until
+    TRAIN_SAMPLES pages have been seen pages are stored without one. Each row keeps the id of
+    the dictionary it was written with, so retraining never invalidates older rows.
+    """
+
+    def __init__(self, path=ARCHIVE_DB, codec=None):
+        self.path = path
+        self.codec = codec or ('zstd' if zstandard else 'zlib')
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS dictionaries (
+                id INTEGER PRIMARY KEY,
+                codec TEXT NOT NULL,
+                trained_at REAL NOT NULL,
+                samples INTEGER NOT NULL,
+                data BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                run_id TEXT,
+                codec TEXT NOT NULL,
+                dict_id INTEGER REFERENCES dictionaries (id),
+                raw_bytes INTEGER NOT NULL,
+                data BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_url_time ON pages (url, fetched_at);
+            CREATE INDEX IF NOT EXISTS pages_time ON pages (fetched_at);
+            CREATE INDEX IF NOT EXISTS pages_run ON pages (run_id);
+        ''')
+        self.dictionaries = {}
+        self.compressors = {}
+        self.decompressors = {}
+        self.samples = []
+        row = self.conn.execute(
+            'SELECT id FROM dictionaries WHERE codec = ? ORDER BY id DESC LIMIT 1', (self.codec,)
+        ).fetchone()
+        self.dict_id = row[0] if row else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _dictionary(self, dict_id):
+        if dict_id not in self.dictionaries:
+            row = self.conn.execute('SELECT data FROM dictionaries WHERE id = ?', (dict_id,)).fetchone()
+            self.dictionaries[dict_id] = row[0]
+        return self.dictionaries[dict_id]
+
+    def _compress(self, raw):
+        if self.codec == 'zstd':
+            if self.dict_id not in self.compressors:
+                dict_data = zstandard.ZstdCompressionDict(self._dictionary(self.dict_id)) if self.dict_id else None
+                self.compressors[self.dict_id] = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data)
+            return self.compressors[self.dict_id].compress(raw)
+        if self.dict_id:
+            compressor = zlib.compressobj(ZLIB_LEVEL, zdict=self._dictionary(self.dict_id))
+        else:
+            compressor = zlib.compressobj(ZLIB_LEVEL)
+        return compressor.compress(raw) + compressor.flush()
+
+    def _decompress(self, codec, dict_id, blob):
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd archive rows")
+            if dict_id not in self.decompressors:
+                dict_data = zstandard.ZstdCompressionDict(self._dictionary(dict_id)) if dict_id else None
+                self.decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dict_data)
+            return self.decompressors[dict_id].decompress(blob)
+        if dict_id:
+            decompressor = zlib.decompressobj(zdict=self._dictionary(dict_id))
+        else:
+            decompressor = zlib.decompressobj()
+        return decompressor.decompress(blob) + decompressor.flush()
+
+    def train(self, samples=None):
+        """Train a new dictionary from `samples` (raw page bytes), or from the newest archived pages."""
+        if samples is None:
+            rows = self.conn.execute(
+                'SELECT id FROM pages ORDER BY fetched_at DESC LIMIT ?', (TRAIN_SAMPLES * 5,)
+            ).fetchall()
+            samples = [self.get_bytes(page_id) for page_id, in rows]
+        if not samples:
+            return None
+        if self.codec == 'zstd':
+            data = zstandard.train_dictionary(DICT_SIZE, samples).as_bytes()
+        else:
+            # zlib's window is the preset dictionary followed by the page, so the most useful
+            # bytes are markup every page repeats: the tail of a typical page
+            data = samples[len(samples) // 2][-ZLIB_DICT_SIZE:]
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO dictionaries (codec, trained_at, samples, data) VALUES (?, ?, ?, ?)',
+                (self.codec, time.time(), len(samples), data)
+            )
+        self.dict_id = cursor.lastrowid
+        logger.info("Trained %s archive dictionary %s from %s pages (%s bytes)",
+                    self.codec, self.dict_id, len(samples), len(data))
+        return self.dict_id
+
+    def put(self, url, page_source, fetched_at=None, run_id=None):
+        raw = page_source.encode('utf-8') if isinstance(page_source, str) else page_source
+        if self.dict_id is None:
+            self.samples.append(raw)
+            if len(self.samples) >= TRAIN_SAMPLES:
+                self.train(self.samples)
+                self.samples = []
+        blob = self._compress(raw)
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO pages (url, fetched_at, run_id, codec, dict_id, raw_bytes, data) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (canonicalize(url) or url, fetched_at or time.time(), run_id, self.codec, self.dict_id, len(raw), blob)
+            )
+
+    def get_bytes(self, page_id):
+        codec, dict_id, blob = self.conn.execute(
+            'SELECT codec, dict_id, data FROM pages WHERE id = ?', (page_id,)
+        ).fetchone()
+        return self._decompress(codec, dict_id, blob)
+
+    def get(self, page_id):
+        return self.get_bytes(page_id).decode('utf-8')
+
+    def snapshot(self, run_id=None, since=None, until=None):
+        """[(id, url, fetched_at)] of the newest copy of each URL in a run and/or time window, in fetch order."""
+        where, params = [], []
+        if run_id:
+            where.append('run_id = ?')
+            params.append(run_id)
+        if since is not None:
+            where.append('fetched_at >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('fetched_at < ?')
+            params.append(until)
+        sql = 'SELECT id, url, MAX(fetched_at) FROM pages'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' GROUP BY url ORDER BY 3'
+        return self.conn.execute(sql, params).fetchall()
+
+    def runs(self):
+        """Per-run page counts, time span and compression ratio, newest first."""
+        rows = self.conn.execute('''
+            SELECT run_id, COUNT(*), MIN(fetched_at), MAX(fetched_at), SUM(raw_bytes), SUM(LENGTH(data))
+            FROM pages GROUP BY run_id ORDER BY MIN(fetched_at) DESC
+        ''').fetchall()
+        return [
+            {'run_id': run_id, 'pages': pages, 'first': first, 'last': last,
+             'raw_bytes': raw, 'stored_bytes': stored, 'ratio': round(raw / stored, 1) if stored else None}
+            for run_id, pages, first, last, raw, stored in rows
+        ]
+
+class ArchiveWriter:
+    """Archives pages on a background thread so compression never holds up the browser."""
+
+    def __init__(self, path=ARCHIVE_DB):
+        self.path = path
+        self.pending = queue.Queue(maxsize=MAX_PENDING)
+        self.dropped = 0
+        self.worker = threading.Thread(target=self._run, name='page-archive', daemon=True)
+        self.worker.start()
+
+    def save(self, url, page_source):
+        try:
+            self.pending.put_nowait((url, page_source, time.time(), scraperLogging.run_id))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Page archive backlog full, dropped page for %s", url)
+
+    def close(self):
+        if self.worker.is_alive():
+            self.pending.put(None)
+            self.worker.join()
+
+    def _run(self):
+        # SQLite connections stay on the thread that opened them
+        archive = PageArchive(self.path)
+        try:
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    break
+                url, page_source, fetched_at, run_id = item
+                try:
+                    archive.put(url, page_source, fetched_at, run_id)
+                except Exception as e:
+                    logger.error("Error archiving page for %s: %s", url, e)
+        finally:
+            archive.close()
+
+_writer = None
+
+def get_archive_writer():
+    """Process-wide writer, flushed at exit."""
+    global _writer
+    if _writer is None:
+        _writer = ArchiveWriter()
+        atexit.register(_writer.close)
+    return _writer
+
+def archive_page(url, page_source):
+    if ARCHIVE_ENABLED and page_source:
+        get_archive_writer().save(url, page_source)
+
+def reparse(archive, csv_path=None, catalogue_root=None, run_id=None, since=None, until=None, workers=None):
+    """Rebuild a CSV and/or columnar snapshot from archived pages with today's parser; returns the records.
+
+    Uses the newest copy of each page in the selected run/window and the same duplicate
+    handling as a live crawl. Nothing is fetched.
+    """
+    from columnarSink import write_catalogue
+    from dedupIndex import DedupIndex
+    from parseWorkers import PARSE_WORKERS, ParsePool
+    from productSchema import write_products_csv
+
+    pages = archive.snapshot(run_id, since, until)
+    if not pages:
+        logger.warning("No archived pages match run=%s since=%s until=%s", run_id, since, until)
+        return []
+    dedup = DedupIndex()
+    records = []
+    failed = 0
+    started = time.perf_counter()
+    with ParsePool(PARSE_WORKERS if workers is None else workers) as pool:
+        pending = deque()
+        for page_id, url, _ in pages:
+            pending.append((pool.submit(url, archive.get_bytes(page_id)), url))
+            while pending and (pending[0][0].done() or len(pending) >= pool.max_pending):
+                failed += _collect(*pending.popleft(), dedup, records)
+        while pending:
+            failed += _collect(*pending.popleft(), dedup, records)
+    elapsed = time.perf_counter() - started
+    logger.info("Reparsed %s pages into %s products in %.2fs (%.0f pages/s, %s failed)",
+                len(pages), len(records), elapsed, len(pages) / elapsed if elapsed else 0, failed)
+
+    scraped_at = datetime.fromtimestamp(pages[0][2], timezone.utc)
+    if csv_path:
+        write_products_csv(csv_path, records, encoding='utf-8')
+        logger.info("Wrote %s products to %s", len(records), csv_path)
+    if catalogue_root:
+        write_catalogue(records, catalogue_root, scraped_at)
+    return records
+
+def _collect(future, url, dedup, records):
+    """Add one reparsed page's new records; a page the parser fails on is counted and
+    skipped, as ParsePool.crawl does in a live crawl. Returns 1 for a failed page."""
+    try:
+        page = future.result()
+    except Exception as e:
+        metrics.incr('parse_errors')
+        logger.error("Reparse failed for %s: %s", url, e)
+        return 1
+    records.extend(_unique(page.records, dedup))
+    return 0
+
+def _unique(records, dedup):
+    for record in records:
+        if not dedup.check(record['product_code'], record['sku'], record['url']):
+            dedup.add(record['product_code'], record['sku'], record['url'])
+            yield record
+
+def _timestamp(value):
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressed archive of fetched listing pages")
+    parser.add_argument('--db', default=ARCHIVE_DB)
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--runs', action='store_true', help="List archived runs")
+    mode.add_argument('--train', action='store_true', help="Train a new dictionary from the newest pages")
+    mode.add_argument('--reparse', action='store_true', help="Rebuild a snapshot from archived pages")
+    parser.add_argument('--run', help="Run id to reparse (see --runs)")
+    parser.add_argument('--since', help="ISO date/time (UTC), inclusive")
+    parser.add_argument('--until', help="ISO date/time (UTC), exclusive")
+    parser.add_argument('--csv', default='apple_products_reparsed.csv')
+    parser.add_argument('--catalogue', help="Also write the snapshot to this columnar catalogue root")
+    parser.add_argument('--workers', type=int, help="Parse processes (default SCRAPER_PARSE_WORKERS)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with PageArchive(args.db) as archive:
+        if args.runs:
+            for run in archive.runs():
+                first = datetime.fromtimestamp(run['first'], timezone.utc).isoformat(timespec='seconds')
+                print(f"{run['run_id'] or '-':28s} {first}  pages={run['pages']:5d}  "
+                      f"stored={run['stored_bytes'] / 1024 / 1024:7.1f} MiB  ratio={run['ratio']}x")
+        elif args.train:
+            archive.train()
+        else:
+            records = reparse(archive, args.csv, args.catalogue, args.run,
+                              _timestamp(args.since), _timestamp(args.until), args.workers)
+            print(f"Rebuilt {len(records)} products")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
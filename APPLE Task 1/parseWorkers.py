@@ -0,0 +1,193 @@
+import html
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from bs4 import BeautifulSoup
+from productSchema import flatten_product_data, missing_required
+from runMetrics import metrics
+from urlFrontier import canonicalize
+
+logger = logging.getLogger(__name__)
+
+# Parse processes; 0 parses in the calling process (no overlap, same results)
+PARSE_WORKERS = int(os.environ.get('SCRAPER_PARSE_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+
+GRID_SELECTORS = ['div[class*="product-grid"]', 'div[class*="product-list"]', 'div[class*="products"]', 'div[class*="results"]']
+NEXT_LINK_SELECTORS = ['a.next', 'a[class*="next-page"]', 'a[rel="next"]', 'a[class*="pagination-next"]']
+
+# Pagination link straight from the raw HTML, so the next fetch needn't wait for the parse
+NEXT_TAG_RE = re.compile(
+    r'<a\b[^>]*?(?:\bclass=["\'](?:[^"\']*\s)?(?:next|next-page|pagination-next)(?:\s[^"\']*)?["\']'
+    r'|\brel=["\']next["\'])[^>]*>',
+    re.I
+)
+HREF_RE = re.compile(r'\bhref=["\']([^"\']+)["\']', re.I)
+
+class ParsedPage:
+    def __init__(self, url, records, next_url, tiles, seconds):
+        self.url = url
+        self.records = records
+        self.next_url = next_url
+        self.tiles = tiles
+        self.seconds = seconds
+
+def find_next_href(page_source):
+    """href of the first pagination link in the raw HTML, or None."""
+    for match in NEXT_TAG_RE.finditer(page_source):
+        href = HREF_RE.search(match.group(0))
+        if href:
+            return html.unescape(href.group(1))
+    return None
+
+def parse_tile(product):
+    """Typed record for one listing tile, or None if it has no usable data layer or lacks a required column."""
+    data_layer = product.get('data-productdatalayer')
+    if not data_layer:
+        return None
+    try:
+        data = json.loads(data_layer)[0]
+    except (ValueError, IndexError, KeyError) as e:
+        logger.warning("Error parsing data-productdatalayer: %s", e)
+        return None
+    link = product.find('a', class_='pdpLink', href=True)
+    rating = product.find('span', class_='nvda_star_reading')
+    reviews = product.find('span', class_='average-reviews')
+    record = flatten_product_data(
+        data,
+        canonicalize(link['href']) if link else 'No URL',
+        rating.text.strip() if rating else 'No rating',
+        reviews.text.strip() if reviews else 'No reviews'
+    )
+    if not record or missing_required(record):
+        return None
+    return record
+
+def parse_listing_html(url, page_source, features='html.parser'):
+    """Raw listing HTML (str or bytes) -> ParsedPage. Runs in a worker process.
+
+    `features` picks the BeautifulSoup tree builder; the scrapers use the default, benchScraper
+    compares the others.
+    """
+    started = time.perf_counter()
+    if isinstance(page_source, bytes):
+        page_source = page_source.decode('utf-8', 'replace')
+    soup = BeautifulSoup(page_source, features)
+    try:
+        products = []
+        for selector in GRID_SELECTORS:
+            grid = soup.select_one(selector)
+            if grid:
+                products = grid.find_all('div', class_='product')
+                break
+        if not products:
+            products = soup.find_all('div', class_='product') or \
+                       soup.find_all('div', attrs={'data-productdatalayer': True}) or \
+                       soup.find_all('div', class_='product-card')
+        records = []
+        for product in products:
+            try:
+                record = parse_tile(product)
+            except Exception as e:
+                logger.warning("Error parsing product tile on %s: %s", url, e)
+                continue
+            if record:
+                records.append(record)
+        next_url = None
+        for selector in NEXT_LINK_SELECTORS:
+            next_link = soup.select_one(selector)
+            if next_link and next_link.get('href'):
+                next_url = canonicalize(next_link['href'])
+                break
+        return ParsedPage(url, records, next_url, len(products), time.perf_counter() - started)
+    finally:
+        soup.decompose()
+
+def _init_worker():
+    # Workers have no queue listener of their own; report their warnings on stderr
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - parse worker %(process)d - %(levelname)s - %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(logging.WARNING)
+
+class ParsePool:
+    """Parses listing pages in worker processes while the caller's browser fetches the next one.
+
+    crawl() drives one category: fetch a page, hand its HTML to a worker, read the next link
+    from the raw HTML with a regex and fetch that straight away. Parsed pages come back in
+    page order. At most `max_pending` pages wait for a parse before the fetch loop blocks.
+    """
+
+    def __init__(self, workers=PARSE_WORKERS, max_pending=None):
+        self.workers = workers
+        self.max_pending = max_pending or max(2, workers * 2)
+        # Spawn, not fork: by now the log listener, failed-page and archive writer threads are
+        # running, and a forked worker could inherit one of their locks held and deadlock
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker) if workers > 0 else None
+        logger.info("Parse pool started with %s worker process(es)", workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def submit(self, url, page_source):
+        """Future of a ParsedPage; parsed inline when the pool has no workers."""
+        if isinstance(page_source, str):
+            page_source = page_source.encode('utf-8')
+        if self.executor:
+            return self.executor.submit(parse_listing_html, url, page_source)
+        future = Future()
+        try:
+            future.set_result(parse_listing_html(url, page_source))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def crawl(self, start_url, fetch_page, follow):
+        """Yield ParsedPages for the pages reachable from `start_url` by next links.
+
+        fetch_page(url) returns the page HTML or None; follow(href) returns the URL to fetch
+        next (after any politeness delay), or None to stop.
+        """
+        pending = deque()
+        url = start_url
+        while url or pending:
+            next_url = None
+            if url:
+                page_source = fetch_page(url)
+                if page_source is not None:
+                    next_href = find_next_href(page_source)
+                    pending.append((self.submit(url, page_source), next_href is not None))
+                    if next_href:
+                        next_url = follow(next_href)
+            while pending and (pending[0][0].done() or len(pending) >= self.max_pending or not next_url):
+                future, followed = pending.popleft()
+                try:
+                    page = future.result()
+                except Exception as e:
+                    metrics.incr('parse_errors')
+                    logger.error("Parse worker failed: %s", e)
+                    continue
+                metrics.observe('parse', page.seconds)
+                metrics.incr('tiles', page.tiles)
+                metrics.incr('products', len(page.records))
+                if not followed and page.next_url and not next_url:
+                    # The regex missed a link the parser found
+                    next_url = follow(page.next_url)
+                yield page
+            url = next_url
@@ -0,0 +1,107 @@
+import html
+import json
+import logging
+import re
+from productSchema import parse_float, parse_int, parse_str
+
+logger = logging.getLogger(__name__)
+
+PDP_FIELDS = ['title', 'price', 'product_code', 'rating', 'reviews', 'url']
+
+# One scan of the raw HTML finds both JSON-LD script blocks and data-productdatalayer attributes
+STRUCTURED_RE = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(?P<ld>.*?)</script>'
+    r'|data-productdatalayer="(?P<dl>[^"]*)"',
+    re.S | re.I
+)
+PRODUCT_CODE_RE = re.compile(r'\d{5,}')
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+def _ld_products(block):
+    """Product objects in one JSON-LD block (top level, list or @graph)."""
+    items = block if isinstance(block, list) else block.get('@graph', [block]) if isinstance(block, dict) else []
+    return [item for item in items if isinstance(item, dict) and 'Product' in str(item.get('@type'))]
+
+def _from_json_ld(product):
+    offers = _first(product.get('offers')) or {}
+    rating = product.get('aggregateRating') or {}
+    return {
+        'title': product.get('name'),
+        'price': offers.get('price', offers.get('lowPrice')),
+        'product_code': product.get('sku') or product.get('productID') or product.get('mpn'),
+        'rating': rating.get('ratingValue'),
+        'reviews': rating.get('reviewCount', rating.get('ratingCount'))
+    }
+
+def _from_data_layer(data):
+    return {
+        'title': data.get('name'),
+        'price': (_first(data.get('price')) or {}).get('revenue'),
+        'product_code': data.get('id')
+    }
+
+def extract_structured(page_source):
+    """Fields from the page's JSON-LD Product and data-productdatalayer, JSON-LD winning on conflicts."""
+    found = {}
+    for match in STRUCTURED_RE.finditer(page_source):
+        try:
+            if match.group('ld') is not None:
+                candidates = [_from_json_ld(p) for p in _ld_products(json.loads(match.group('ld')))]
+            else:
+                candidates = [_from_data_layer(_first(json.loads(html.unescape(match.group('dl')))) or {})]
+        except (ValueError, AttributeError, TypeError) as e:
+            logger.debug("Skipping unparseable structured data block: %s", e)
+            continue
+        for fields in candidates:
+            for key, value in fields.items():
+                if found.get(key) is None and value not in (None, ''):
+                    found[key] = value
+    return found
+
+def extract_with_selectors(page_source, features='html.parser'):
+    """The original class-based lookups, used only when the structured data is missing."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page_source, features)
+    fields = {}
+    for key, tag, cls in [
+        ('title', 'h1', 'product-name'),
+        ('price', 'span', 'value'),
+        ('product_code', 'div', 'product-code'),
+        ('rating', 'span', 'nvda_star_reading'),
+        ('reviews', 'span', 'average-reviews')
+    ]:
+        element = soup.find(tag, class_=cls)
+        if element:
+            fields[key] = element.text.strip()
+    soup.decompose()
+    return fields
+
+def normalise(fields, url):
+    code = PRODUCT_CODE_RE.search(str(fields.get('product_code') or ''))
+    return {
+        'title': parse_str(fields.get('title')),
+        'price': parse_float(fields.get('price')),
+        'product_code': code.group() if code else None,
+        'rating': parse_float(fields.get('rating')),
+        'reviews': parse_int(fields.get('reviews')),
+        'url': url
+    }
+
+def extract_pdp(page_source, url):
+    """PDP record from one regex pass over the raw HTML, falling back to CSS selectors.
+
+    Returns (record, source) where source is 'structured' or 'selectors', or (None, None)
+    when neither yields a title and a price.
+    """
+    fields = extract_structured(page_source)
+    source = 'structured'
+    if not fields.get('title') or fields.get('price') is None:
+        selector_fields = extract_with_selectors(page_source)
+        fields = dict(selector_fields, **{k: v for k, v in fields.items() if v is not None})
+        source = 'selectors'
+    record = normalise(fields, url)
+    if not record['title'] or record['price'] is None:
+        return None, None
+    return record, source
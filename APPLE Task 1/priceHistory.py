@@ -0,0 +1,327 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from productSchema import SCHEMA, read_products_csv
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB = 'price_history.db'
+
+# Everything except the key columns is tracked as a change log
+TRACKED_FIELDS = [column for column in SCHEMA if column not in ('product_code', 'sku')]
+
+DAY = 24 * 60 * 60
+
+# Latency targets (seconds) checked by the `bench` command
+LATENCY_TARGETS = {
+    'history': 0.010,
+    'drops': 0.250
+}
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    product_code TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    UNIQUE (product_code, sku)
+);
+CREATE TABLE IF NOT EXISTS changes (
+    product_id INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    scraped_at INTEGER NOT NULL,
+    value,
+    PRIMARY KEY (product_id, field, scraped_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS changes_by_time ON changes (field, scraped_at);
+CREATE TABLE IF NOT EXISTS latest (
+    product_id INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    value,
+    PRIMARY KEY (product_id, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS runs (
+    scraped_at INTEGER PRIMARY KEY,
+    products INTEGER NOT NULL,
+    changes INTEGER NOT NULL
+);
+"""
+
+def encode_value(value):
+    """Lists are stored as JSON text, numbers and strings as native SQLite values."""
+    if isinstance(value, (list, tuple)):
+        return json.dumps(list(value))
+    return value
+
+def to_epoch(value):
+    if value is None:
+        return int(time.time())
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+def chunked(values, size=500):
+    """Slices of `values` small enough for SQLite's bound-parameter limit."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def to_iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+class PriceHistory:
+    """Append-only change log of scraped product fields, keyed by product_code/sku and scrape time."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA_SQL)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def product_ids(self, records):
+        """{(product_code, sku): id} for the given records, inserting products not seen before."""
+        keys = {(str(r.get('product_code')), str(r.get('sku') or '')) for r in records if r.get('product_code')}
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO products (product_code, sku) VALUES (?, ?)', keys
+        )
+        ids = {}
+        codes = sorted({code for code, _ in keys})
+        for chunk in chunked(codes):
+            placeholders = ','.join('?' * len(chunk))
+            for product_id, code, sku in self.conn.execute(
+                f'SELECT id, product_code, sku FROM products WHERE product_code IN ({placeholders})', chunk
+            ):
+                if (code, sku) in keys:
+                    ids[(code, sku)] = product_id
+        return ids
+
+    def record_run(self, records, scraped_at=None):
+        """Store the fields that changed since the previous run; returns the number of changes.
+
+        Can be called several times with the same scraped_at to record one run in batches.
+        """
+        scraped_at = to_epoch(scraped_at)
+        with self.conn:
+            ids = self.product_ids(records)
+            # Only the batch's products: memory follows the batch, not the whole catalogue
+            latest = {}
+            for chunk in chunked(sorted(set(ids.values()))):
+                placeholders = ','.join('?' * len(chunk))
+                for product_id, field, value in self.conn.execute(
+                    f'SELECT product_id, field, value FROM latest WHERE product_id IN ({placeholders})', chunk
+                ):
+                    latest[(product_id, field)] = value
+
+            changes = []
+            for record in records:
+                product_id = ids.get((str(record.get('product_code')), str(record.get('sku') or '')))
+                if product_id is None:
+                    continue
+                for field in TRACKED_FIELDS:
+                    value = encode_value(record.get(field))
+                    key = (product_id, field)
+                    if key in latest and latest[key] == value:
+                        continue
+                    latest[key] = value
+                    changes.append((product_id, field, scraped_at, value))
+
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO changes (product_id, field, scraped_at, value) VALUES (?, ?, ?, ?)',
+                changes
+            )
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO latest (product_id, field, value) VALUES (?, ?, ?)',
+                [(product_id, field, value) for product_id, field, _, value in changes]
+            )
+            # A streamed run is recorded in batches that share scraped_at; the run row sums them
+            self.conn.execute(
+                'INSERT INTO runs (scraped_at, products, changes) VALUES (?, ?, ?) '
+                'ON CONFLICT (scraped_at) DO UPDATE SET products = products + excluded.products, '
+                'changes = changes + excluded.changes',
+                (scraped_at, len(records), len(changes))
+            )
+        logger.info("Recorded %s changed values for %s products in %s", len(changes), len(records), self.path)
+        return len(changes)
+
+    def history(self, product_code, days=90, field='price_revenue', now=None):
+        """Values of `field` for product_code over the last `days` days.
+
+        Returns (scraped_at, sku, value) rows: the value in effect at the start of
+        the window followed by every change inside it.
+        """
+        since = to_epoch(now) - days * DAY
+        rows = []
+        for product_id, sku in self.conn.execute(
+            'SELECT id, sku FROM products WHERE product_code = ?', (str(product_code),)
+        ):
+            start = self.conn.execute(
+                'SELECT scraped_at, value FROM changes WHERE product_id = ? AND field = ? AND scraped_at <= ? '
+                'ORDER BY scraped_at DESC LIMIT 1',
+                (product_id, field, since)
+            ).fetchone()
+            if start:
+                rows.append((start[0], sku, start[1]))
+            for scraped_at, value in self.conn.execute(
+                'SELECT scraped_at, value FROM changes WHERE product_id = ? AND field = ? AND scraped_at > ? '
+                'ORDER BY scraped_at',
+                (product_id, field, since)
+            ):
+                rows.append((scraped_at, sku, value))
+        return rows
+
+    def price_drops(self, days=7, field='price_revenue', now=None):
+        """Products whose `field` is lower now than it was `days` days ago.
+
+        Returns (product_code, sku, old_value, new_value) sorted by the size of the drop.
+        """
+        since = to_epoch(now) - days * DAY
+        drops = []
+        query = """
+            SELECT p.product_code, p.sku, l.value,
+                   (SELECT c.value FROM changes c
+                    WHERE c.product_id = p.id AND c.field = :field AND c.scraped_at <= :since
+                    ORDER BY c.scraped_at DESC LIMIT 1) AS old_value
+            FROM (SELECT DISTINCT product_id FROM changes
+                  WHERE field = :field AND scraped_at > :since) moved
+            JOIN products p ON p.id = moved.product_id
+            JOIN latest l ON l.product_id = p.id AND l.field = :field
+        """
+        for code, sku, new_value, old_value in self.conn.execute(query, {'field': field, 'since': since}):
+            if isinstance(old_value, (int, float)) and isinstance(new_value, (int, float)) and new_value < old_value:
+                drops.append((code, sku, old_value, new_value))
+        drops.sort(key=lambda row: row[3] - row[2])
+        return drops
+
+def generate_synthetic_history(path, rows=1_000_000, products=5000, days=365):
+    """Fill `path` with roughly `rows` changed values spread over `days` days.
+
+    Product ids 1..`products` are synthetic, so `path` must be a new, empty history.
+    """
+    history = PriceHistory(path)
+    if history.conn.execute('SELECT 1 FROM products LIMIT 1').fetchone():
+        history.close()
+        raise ValueError(f"{path} already holds products; synthetic history needs an empty database")
+    now = int(time.time())
+    start = now - days * DAY
+    per_product = max(1, rows // products)
+    fields = ['price_revenue', 'price_base_revenue', 'payment_monthly_amount', 'availability_collect_type']
+    with history.conn:
+        history.conn.executemany(
+            'INSERT OR IGNORE INTO products (id, product_code, sku) VALUES (?, ?, ?)',
+            [(i, str(10_000_000 + i), str(300_000 + i)) for i in range(1, products + 1)]
+        )
+        batch = []
+        latest = {}
+        for product_id in range(1, products + 1):
+            price = round(random.uniform(20, 3000), 2)
+            times = sorted(random.sample(range(start, now), per_product))
+            for i, scraped_at in enumerate(times):
+                field = fields[i % len(fields)]
+                if field == 'availability_collect_type':
+                    value = random.choice(['FREE in-store collection in as little as 1 hour', 'Unavailable'])
+                else:
+                    price = round(price * random.uniform(0.9, 1.08), 2)
+                    value = price
+                batch.append((product_id, field, scraped_at, value))
+                latest[(product_id, field)] = value
+            if len(batch) >= 100_000:
+                history.conn.executemany('INSERT OR IGNORE INTO changes VALUES (?, ?, ?, ?)', batch)
+                batch = []
+        history.conn.executemany('INSERT OR IGNORE INTO changes VALUES (?, ?, ?, ?)', batch)
+        history.conn.executemany(
+            'INSERT OR REPLACE INTO latest VALUES (?, ?, ?)',
+            [(product_id, field, value) for (product_id, field), value in latest.items()]
+        )
+    return history
+
+def benchmark(rows, queries=200):
+    """Time the two query shapes against a synthetic history and compare with LATENCY_TARGETS.
+
+    The history is built in a throwaway database, never the one given by --db.
+    """
+    with tempfile.TemporaryDirectory(prefix='price-history-bench-') as tmp_dir:
+        return _benchmark(os.path.join(tmp_dir, HISTORY_DB), rows, queries)
+
+def _benchmark(path, rows, queries):
+    history = generate_synthetic_history(path, rows=rows)
+    total = history.conn.execute('SELECT COUNT(*) FROM changes').fetchone()[0]
+    codes = [row[0] for row in history.conn.execute('SELECT product_code FROM products')]
+
+    timings = {'history': [], 'drops': []}
+    for _ in range(queries):
+        t0 = time.perf_counter()
+        history.history(random.choice(codes), days=90)
+        timings['history'].append(time.perf_counter() - t0)
+    for _ in range(max(1, queries // 20)):
+        t0 = time.perf_counter()
+        history.price_drops(days=7)
+        timings['drops'].append(time.perf_counter() - t0)
+    history.close()
+
+    ok = True
+    print(f"Synthetic history: {total} change rows, {len(codes)} products")
+    for name, samples in timings.items():
+        samples.sort()
+        p50 = samples[len(samples) // 2]
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        passed = p95 <= LATENCY_TARGETS[name]
+        ok = ok and passed
+        print(f"{name:8s} p50={p50 * 1000:.2f}ms p95={p95 * 1000:.2f}ms "
+              f"target={LATENCY_TARGETS[name] * 1000:.0f}ms {'OK' if passed else 'SLOW'}")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the scraped product price history")
+    parser.add_argument('--db', default=HISTORY_DB)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    history_cmd = commands.add_parser('history', help="Values of a field for one product_code")
+    history_cmd.add_argument('product_code')
+    history_cmd.add_argument('--days', type=int, default=90)
+    history_cmd.add_argument('--field', default='price_revenue')
+
+    drops_cmd = commands.add_parser('drops', help="Products whose price dropped recently")
+    drops_cmd.add_argument('--days', type=int, default=7)
+    drops_cmd.add_argument('--field', default='price_revenue')
+
+    import_cmd = commands.add_parser('import', help="Record a products CSV as one run")
+    import_cmd.add_argument('csv_path')
+    import_cmd.add_argument('--scraped-at', help="ISO timestamp of the run (default: now)")
+
+    bench_cmd = commands.add_parser('bench', help="Check query latency on a synthetic history in a temporary database")
+    bench_cmd.add_argument('--rows', type=int, default=1_000_000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return 0 if benchmark(args.rows) else 1
+
+    with PriceHistory(args.db) as history:
+        if args.command == 'history':
+            for scraped_at, sku, value in history.history(args.product_code, args.days, args.field):
+                print(f"{to_iso(scraped_at)}\t{sku}\t{value}")
+        elif args.command == 'drops':
+            for code, sku, old_value, new_value in history.price_drops(args.days, args.field):
+                print(f"{code}\t{sku}\t{old_value}\t{new_value}")
+        elif args.command == 'import':
+            scraped_at = datetime.fromisoformat(args.scraped_at) if args.scraped_at else None
+            history.record_run(read_products_csv(args.csv_path), scraped_at)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import csv
+import logging
+import re
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+Field = namedtuple('Field', ['column', 'path', 'kind', 'default', 'required', 'dictionary'],
+                   defaults=[None, False, False])
+
+# Where each column of a record comes from. `path` walks the data-productdatalayer object:
+# a str is a key, an int a list index, {'key': value} the list entry whose key equals value
+# (the last one, as the old loops did) and '*' maps the rest of the path over a list.
+# path=None columns come from the tile HTML (url, rating, reviews). 'str' columns are None when
+# missing, 'float'/'int' are parsed numbers or None, 'list' columns are Python lists (stored
+# '|'-joined in CSV). `default` replaces a missing value, `required` columns must be present
+# for a record to be kept, and `dictionary` columns are dictionary-encoded in Parquet.
+FIELD_SPEC = [
+    Field('title', ('name',), 'str', required=True),
+    Field('price_revenue', ('price', 0, 'revenue'), 'float', required=True),
+    Field('product_code', ('id',), 'str'),
+    Field('rating', None, 'float'),
+    Field('reviews', None, 'int'),
+    Field('url', None, 'str'),
+    Field('brand', ('brand',), 'str', dictionary=True),
+    Field('ean', ('ean',), 'list'),
+    Field('sku', ('sku',), 'str'),
+    Field('price_base_revenue', ('price', 0, 'baseRevenue'), 'float'),
+    Field('price_currency', ('price', 0, 'currency'), 'str', dictionary=True),
+    Field('price_tax', ('price', 0, 'tax'), 'float'),
+    Field('price_offers', ('price', 0, 'offer', '*', 'name'), 'list'),
+    Field('payment_one_off_amount', ('payment', {'frequency': 'one off'}, 'amount'), 'float'),
+    Field('payment_monthly_amount', ('payment', {'frequency': 'monthly'}, 'amount'), 'float'),
+    Field('availability_shipping_status', ('availability', {'availabilityStatus': 'shipping'}, 'availabilityStatus'), 'str', dictionary=True),
+    Field('availability_collect_status', ('availability', {'availabilityStatus': 'collect in store'}, 'availabilityStatus'), 'str', dictionary=True),
+    Field('availability_shipping_type', ('availability', {'availabilityStatus': 'shipping'}, 'availabilityType'), 'str', dictionary=True),
+    Field('availability_collect_type', ('availability', {'availabilityStatus': 'collect in store'}, 'availabilityType'), 'str', dictionary=True),
+    Field('category_categories', ('category', 'categories'), 'list'),
+    Field('category_merchendising_area', ('category', 'merchendisingArea'), 'str', dictionary=True),
+    Field('category_sub_planning_group', ('category', 'subPlanningGroup'), 'str', dictionary=True),
+    Field('category_planning_group', ('category', 'planningGroup'), 'str'),
+    Field('category_product_type', ('category', 'productType'), 'str', dictionary=True)
+]
+
+SCHEMA = {field.column: field.kind for field in FIELD_SPEC}
+
+REQUIRED_COLUMNS = [field.column for field in FIELD_SPEC if field.required]
+
+DICTIONARY_COLUMNS = [field.column for field in FIELD_SPEC if field.dictionary]
+
+FIELDNAMES = list(SCHEMA)
+
+LIST_SEPARATOR = '|'
+LEGACY_LIST_SEPARATOR = ', '  # how the original scrapers joined list cells
+
+NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?')
+
+# Exactly the placeholders the scrapers write, or wrote into older CSVs, for missing values;
+# anything else is a real value
+MISSING_VALUES = frozenset([
+    'No URL', 'No price', 'No product code', 'No rating', 'No reviews', 'No title',
+    'No brand', 'No EAN', 'No SKU', 'No base revenue', 'No currency', 'No tax', 'No offers',
+    'No one-off amount', 'No monthly amount', 'No shipping status', 'No collect status',
+    'No shipping type', 'No collect type', 'No categories', 'No merchendising area',
+    'No sub planning group', 'No planning group', 'No product type'
+])
+
+def is_missing(value):
+    """True for None, empty strings and the MISSING_VALUES placeholders."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        value = value.strip()
+        return not value or value in MISSING_VALUES
+    return False
+
+def parse_float(value):
+    """Parse prices, taxes and ratings such as '4.80\\n out of 5 stars' into a float."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if is_missing(value):
+        return None
+    match = NUMBER_RE.search(str(value).replace(',', ''))
+    return float(match.group()) if match else None
+
+def parse_int(value):
+    """Parse counts such as '64 reviews' into an int."""
+    number = parse_float(value)
+    return int(number) if number is not None else None
+
+def parse_list(value, separator=LIST_SEPARATOR):
+    """Parse JSON lists, "['195949597091']" strings or `separator`-joined CSV cells into a list of strings."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value if not is_missing(item)]
+    if is_missing(value):
+        return []
+    text = str(value).strip()
+    if text.startswith('[') and text.endswith(']'):
+        return [item.strip().strip('\'"') for item in text[1:-1].split(',') if item.strip().strip('\'"')]
+    return [item.strip() for item in text.split(separator) if item.strip()]
+
+def parse_str(value):
+    if is_missing(value):
+        return None
+    return str(value).strip()
+
+PARSERS = {
+    'str': parse_str,
+    'float': parse_float,
+    'int': parse_int,
+    'list': parse_list
+}
+
+def normalise_product_data(flat_data, list_separator=LIST_SEPARATOR):
+    """Convert a flattened product record into the typed columns declared in SCHEMA."""
+    return {column: parse_list(flat_data.get(column), list_separator) if kind == 'list'
+            else PARSERS[kind](flat_data.get(column))
+            for column, kind in SCHEMA.items()}
+
+def missing_required(record):
+    """REQUIRED_COLUMNS that are None/empty in a typed record."""
+    return [column for column in REQUIRED_COLUMNS if record.get(column) in (None, '', [])]
+
+def compile_extractor(spec):
+    """Generate `extract(data, tile)` for a field spec: one straight-line function that reads each
+    shared path prefix once, indexes selector lists once per record instead of scanning them per
+    field, and converts each value with its column parser.
+    """
+    lines = ['def extract(data, tile):']
+    names = {(): 'data'}
+    counter = iter(range(1_000_000))
+
+    def node(prefix):
+        # Variable holding the value at `prefix`, emitting the lookup code the first time
+        if prefix in names:
+            return names[prefix]
+        parent, step = node(prefix[:-1]), prefix[-1]
+        name = f'v{next(counter)}'
+        if isinstance(step, str):
+            lines.append(f'    {name} = {parent}.get({step!r}) if type({parent}) is dict else None')
+        elif isinstance(step, int):
+            lines.append(f'    {name} = {parent}[{step}] if type({parent}) is list and len({parent}) > {step} else None')
+        else:
+            key, value = step
+            index = names.get((prefix[:-1], key))
+            if index is None:
+                index = names[(prefix[:-1], key)] = f'i{next(counter)}'
+                lines.append(f'    {index} = {{e.get({key!r}): e for e in {parent} if type(e) is dict}} '
+                             f'if type({parent}) is list else {{}}')
+            lines.append(f'    {name} = {index}.get({value!r})')
+        names[prefix] = name
+        return name
+
+    def steps(path):
+        # Hashable form of a path: {'key': value} selectors become (key, value)
+        return tuple(next(iter(step.items())) if isinstance(step, dict) else step for step in path)
+
+    parsers = {}
+    for position, field in enumerate(spec):
+        if field.path is None:
+            value = f'tile.get({field.column!r})'
+        elif '*' in field.path:
+            star = field.path.index('*')
+            items = node(steps(field.path[:star]))
+            getter = 'e'
+            for key in field.path[star + 1:]:
+                getter = f'({getter}.get({key!r}) if type({getter}) is dict else None)'
+            value = f'[{getter} for e in {items}] if type({items}) is list else None'
+        else:
+            value = node(steps(field.path))
+        parsers[field.kind] = PARSERS[field.kind]
+        column = f'c{position}'
+        lines.append(f'    {column} = parse_{field.kind}({value})')
+        if field.default is not None:
+            lines.append(f'    if {column} is None or {column} == []: {column} = {field.default!r}')
+    lines.append('    return {' + ', '.join(f'{field.column!r}: c{position}' for position, field in enumerate(spec)) + '}')
+    namespace = {f'parse_{kind}': parser for kind, parser in parsers.items()}
+    exec('\n'.join(lines), namespace)
+    return namespace['extract']
+
+extract_product = compile_extractor(FIELD_SPEC)
+
+def flatten_product_data(data, product_url, rating_text, reviews_text):
+    """Flatten the JSON data-productdatalayer into a typed record (see FIELD_SPEC)."""
+    try:
+        return extract_product(data, {'url': product_url, 'rating': rating_text, 'reviews': reviews_text})
+    except Exception as e:
+        logger.error("Error flattening product data: %s", e)
+        return None
+
+def to_csv_row(record):
+    """Serialise a typed record for csv.DictWriter (None -> '', lists -> '|'-joined)."""
+    row = {}
+    for column, kind in SCHEMA.items():
+        value = record.get(column)
+        if value is None:
+            row[column] = ''
+        elif kind == 'list':
+            row[column] = LIST_SEPARATOR.join(value)
+        else:
+            row[column] = value
+    return row
+
+def write_products_csv(path, records, mode='w', encoding='utf-8'):
+    """Write typed records to CSV using the declared column order."""
+    with open(path, mode, newline='', encoding=encoding) as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if f.tell() == 0:
+            writer.writeheader()
+        writer.writerows(to_csv_row(record) for record in records)
+
+def csv_list_separator(rows):
+    """LIST_SEPARATOR for CSVs written by to_csv_row; LEGACY_LIST_SEPARATOR for CSVs from the
+    original scrapers, recognised by list cells joined with ', ' and none with '|'. Legacy cells
+    are split on every ', ', so an offer name that itself holds ', ' comes back in pieces."""
+    list_columns = [column for column, kind in SCHEMA.items() if kind == 'list']
+    cells = [row.get(column) or '' for row in rows for column in list_columns]
+    if any(LIST_SEPARATOR in cell for cell in cells):
+        return LIST_SEPARATOR
+    if any(LEGACY_LIST_SEPARATOR in cell for cell in cells if not cell.startswith('[')):
+        return LEGACY_LIST_SEPARATOR
+    return LIST_SEPARATOR
+
+def read_products_csv(path):
+    """Read a products CSV (current or legacy format) back into typed records using SCHEMA."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.DictReader(f))
+    separator = csv_list_separator(rows)
+    return [normalise_product_data(row, separator) for row in rows]
+
+def pandas_dtypes():
+    """dtype mapping for pd.read_csv; list columns still need parse_list as a converter."""
+    dtypes = {'str': 'string', 'float': 'float64', 'int': 'Int64'}
+    return {column: dtypes[kind] for column, kind in SCHEMA.items() if kind != 'list'}
@@ -0,0 +1,90 @@
+import csv
+import logging
+import time
+from datetime import datetime, timezone
+from productSchema import FIELDNAMES, to_csv_row
+from columnarSink import CATALOGUE_DIR, CatalogueWriter
+from priceHistory import HISTORY_DB, PriceHistory
+from recrawlScheduler import RecrawlScheduler
+from runMetrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000      # records buffered before a catalogue/history flush
+CSV_FLUSH_SECONDS = 1  # CSV rows reach disk at least this often
+
+class RecordSink:
+    """Streaming destination for scraped records: CSV rows as they arrive, the columnar
+    catalogue and the price history in batches of `batch_size`.
+
+    Full records are held only for the current batch. The recrawl scheduler still needs the
+    (product_code, sku) key of every tile each category lists, so those keys grow with the
+    catalogue until close(); they are a small fraction of the records. Membership comes from add_member() for every
+    tile a category lists, so it does not depend on which category a duplicate was written under.
+    """
+
+    def __init__(self, csv_path, encoding='utf-8', batch_size=BATCH_SIZE,
+                 catalogue_root=CATALOGUE_DIR, history_path=HISTORY_DB, scraped_at=None):
+        self.scraped_at = scraped_at or datetime.now(timezone.utc)
+        self.batch_size = batch_size
+        self.catalogue = CatalogueWriter(catalogue_root, self.scraped_at)
+        self.batch = []
+        self.count = 0
+        self.members = {}
+        self.crawl_seconds = {}
+        self.last_flush = time.monotonic()
+        self.csv_file = open(csv_path, 'w', newline='', encoding=encoding)
+        self.writer = csv.DictWriter(self.csv_file, fieldnames=FIELDNAMES)
+        self.writer.writeheader()
+        self.history = PriceHistory(history_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_member(self, category_url, record):
+        self.members.setdefault(category_url, []).append(
+            {'product_code': record.get('product_code'), 'sku': record.get('sku')}
+        )
+
+    def write(self, record):
+        self.writer.writerow(to_csv_row(record))
+        if self.count == 0:
+            self.csv_file.flush()
+            metrics.set_gauge('first_record_seconds', round(time.time() - metrics.started, 3))
+        elif time.monotonic() - self.last_flush > CSV_FLUSH_SECONDS:
+            self.csv_file.flush()
+            self.last_flush = time.monotonic()
+        self.count += 1
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def end_category(self, category_url, seconds):
+        self.crawl_seconds[category_url] = seconds
+
+    def flush(self):
+        if not self.batch:
+            return
+        with metrics.stage('write'):
+            self.csv_file.flush()
+            self.catalogue.write(self.batch)
+            self.history.record_run(self.batch, int(self.scraped_at.timestamp()))
+        self.batch = []
+
+    def close(self):
+        """Flush the last batch, record the category crawls and close the files; returns the record count."""
+        if self.csv_file.closed:
+            return self.count
+        self.flush()
+        scheduler = RecrawlScheduler(self.history)
+        for category_url, seconds in self.crawl_seconds.items():
+            scheduler.record_crawl(category_url, self.members.get(category_url, []), seconds,
+                                   int(self.scraped_at.timestamp()))
+        self.csv_file.close()
+        self.catalogue.close()
+        self.history.close()
+        logger.info("Sink wrote %s records", self.count)
+        return self.count
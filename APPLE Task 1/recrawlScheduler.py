@@ -0,0 +1,230 @@
+import argparse
+import logging
+import math
+import os
+import sys
+from priceHistory import HISTORY_DB, PriceHistory, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Fields whose movement is worth a refetch; descriptive columns barely change
+WATCHED_FIELDS = [
+    'price_revenue', 'price_base_revenue', 'price_offers',
+    'availability_shipping_status', 'availability_collect_status',
+    'availability_shipping_type', 'availability_collect_type'
+]
+
+HOUR = 60 * 60
+MIN_INTERVAL = 1 * HOUR
+MAX_INTERVAL = 7 * 24 * HOUR
+CHANGE_TARGET = 0.2               # revisit once ~20% of a category's products are expected to have moved
+DEFAULT_CATEGORY_SECONDS = 300    # cost estimate for a category never crawled before
+CRAWL_BUDGET = float(os.environ.get('SCRAPER_CRAWL_BUDGET', 0)) or None  # seconds per run, unset = no limit
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS category_crawls (
+    category_url TEXT NOT NULL,
+    crawled_at INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    products INTEGER NOT NULL,
+    PRIMARY KEY (category_url, crawled_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS category_members (
+    category_url TEXT NOT NULL,
+    crawled_at INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    PRIMARY KEY (category_url, crawled_at, product_id)
+) WITHOUT ROWID;
+"""
+
+def change_rate(changed, observed, interval):
+    """Poisson change rate (per second) from `changed` of `observed` visits `interval` seconds apart.
+
+    A visit only shows *whether* something changed, not how often, so the naive changed/time
+    undercounts fast movers; this is the bias-reduced estimator -ln((n - X + 0.5) / (n + 0.5)) / I.
+    """
+    if not observed or not interval:
+        return None
+    return -math.log((observed - changed + 0.5) / (observed + 0.5)) / interval
+
+def revisit_interval(rate, target=CHANGE_TARGET):
+    """Seconds until a `target` share of items is expected to have changed, clamped to [MIN, MAX]."""
+    if rate is None:
+        return MIN_INTERVAL
+    if rate <= 0:
+        return MAX_INTERVAL
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, -math.log(1 - target) / rate))
+
+class RecrawlScheduler:
+    """Learns per-category and per-product change rates from the price history and plans runs."""
+
+    def __init__(self, history):
+        self.history = history
+        self.conn = history.conn
+        self.conn.executescript(SCHEMA_SQL)
+
+    def record_crawl(self, category_url, records, seconds, crawled_at=None):
+        """Remember which products a category crawl returned and how long it took.
+
+        Call after PriceHistory.record_run with the same crawled_at so changes line up.
+        """
+        crawled_at = to_epoch(crawled_at)
+        with self.conn:
+            ids = self.history.product_ids(records)
+            members = {ids[(str(r.get('product_code')), str(r.get('sku') or ''))]
+                       for r in records if r.get('product_code')}
+            self.conn.execute(
+                'INSERT OR REPLACE INTO category_crawls (category_url, crawled_at, seconds, products) VALUES (?, ?, ?, ?)',
+                (category_url, crawled_at, seconds, len(members))
+            )
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO category_members (category_url, crawled_at, product_id) VALUES (?, ?, ?)',
+                [(category_url, crawled_at, product_id) for product_id in members]
+            )
+
+    def _changed_at(self, crawled_at):
+        """product_ids with a watched field change recorded at `crawled_at`."""
+        placeholders = ','.join('?' * len(WATCHED_FIELDS))
+        return {row[0] for row in self.conn.execute(
+            f'SELECT DISTINCT product_id FROM changes WHERE scraped_at = ? AND field IN ({placeholders})',
+            (crawled_at, *WATCHED_FIELDS)
+        )}
+
+    def _visits(self):
+        """{category_url: [(crawled_at, {product_id}), ...]} oldest first."""
+        visits = {}
+        for url, crawled_at in self.conn.execute(
+            'SELECT category_url, crawled_at FROM category_crawls ORDER BY crawled_at'
+        ):
+            members = {row[0] for row in self.conn.execute(
+                'SELECT product_id FROM category_members WHERE category_url = ? AND crawled_at = ?', (url, crawled_at)
+            )}
+            visits.setdefault(url, []).append((crawled_at, members))
+        return visits
+
+    def rates(self):
+        """Per-category and per-product change rates learned from consecutive crawls.
+
+        Returns ({category_url: stats}, {product_id: rate}). Only products listed at both ends of
+        an interval are observed for it, and one counts as changed if any watched field has a
+        change row at the later crawl; products entering or leaving the listing are not changes.
+        """
+        changed_cache = {}
+        categories = {}
+        product_counts = {}
+        for url, visits in self._visits().items():
+            changed = observed = 0
+            weighted_interval = 0.0
+            for (previous_at, previous), (crawled_at, members) in zip(visits, visits[1:]):
+                if crawled_at not in changed_cache:
+                    changed_cache[crawled_at] = self._changed_at(crawled_at)
+                interval = crawled_at - previous_at
+                for product_id in members & previous:
+                    moved = product_id in changed_cache[crawled_at]
+                    changed += moved
+                    observed += 1
+                    weighted_interval += interval
+                    counts = product_counts.setdefault(product_id, [0, 0, 0.0])
+                    counts[0] += moved
+                    counts[1] += 1
+                    counts[2] += interval
+            last_at = visits[-1][0]
+            categories[url] = {
+                'rate': change_rate(changed, observed, weighted_interval / observed if observed else 0),
+                'last_crawled': last_at,
+                'products': len(visits[-1][1]),
+                'seconds': sum(s for s, in self.conn.execute(
+                    'SELECT seconds FROM category_crawls WHERE category_url = ? ORDER BY crawled_at DESC LIMIT 5', (url,)
+                )) / min(5, len(visits))
+            }
+        products = {product_id: change_rate(moved, observed, total / observed)
+                    for product_id, (moved, observed, total) in product_counts.items()}
+        return categories, products
+
+    def plan(self, category_urls, budget=None, now=None):
+        """Order `category_urls` for this run and drop what does not fit `budget` seconds.
+
+        Priority is the number of product changes expected since the last crawl; due categories
+        (past their revisit interval) go first, then the rest by priority per second of crawl cost.
+        Without a budget only due categories are planned; with one, spare budget goes to the
+        best of the rest. Categories without history are always due. At least one category is
+        always planned.
+        """
+        now = to_epoch(now)
+        categories, _ = self.rates()
+        entries = []
+        for url in category_urls:
+            stats = categories.get(url)
+            if not stats:
+                entries.append({'url': url, 'rate': None, 'interval': MIN_INTERVAL, 'due': True,
+                                'priority': math.inf, 'seconds': DEFAULT_CATEGORY_SECONDS})
+                continue
+            elapsed = now - stats['last_crawled']
+            interval = revisit_interval(stats['rate'])
+            if stats['rate'] is None:  # crawled once: no interval observed yet, assume everything moved
+                priority = float(stats['products'])
+            else:
+                priority = stats['products'] * (1 - math.exp(-stats['rate'] * elapsed))
+            entries.append({
+                'url': url,
+                'rate': stats['rate'],
+                'interval': interval,
+                'due': elapsed >= interval,
+                'priority': priority,
+                'seconds': stats['seconds'] or DEFAULT_CATEGORY_SECONDS
+            })
+        entries.sort(key=lambda e: (not e['due'], -e['priority'] / e['seconds']))
+
+        planned = []
+        spent = 0.0
+        for entry in entries:
+            if not budget and planned and not entry['due']:
+                logger.info("Skipping %s this run: not due for another %.0f min", entry['url'],
+                            (entry['interval'] - (now - categories[entry['url']]['last_crawled'])) / 60)
+                continue
+            if budget and planned and spent + entry['seconds'] > budget:
+                logger.info("Skipping %s this run: %.0fs would exceed the %.0fs budget", entry['url'], entry['seconds'], budget)
+                continue
+            planned.append(entry)
+            spent += entry['seconds']
+        return planned
+
+    def product_priorities(self, limit=None, now=None):
+        """(product_code, sku, expected_change_probability) for refetching individual PDPs, highest first."""
+        now = to_epoch(now)
+        _, rates = self.rates()
+        last_seen = dict(self.conn.execute(
+            'SELECT product_id, MAX(crawled_at) FROM category_members GROUP BY product_id'
+        ))
+        ranked = []
+        for product_id, code, sku in self.conn.execute('SELECT id, product_code, sku FROM products'):
+            rate = rates.get(product_id)
+            seen = last_seen.get(product_id)
+            probability = 1.0 if rate is None or seen is None else 1 - math.exp(-rate * (now - seen))
+            ranked.append((code, sku, probability))
+        ranked.sort(key=lambda row: row[2], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show learned change rates and the next recrawl plan")
+    parser.add_argument('category_urls', nargs='*', help="Categories to plan (default: every category crawled so far)")
+    parser.add_argument('--db', default=HISTORY_DB)
+    parser.add_argument('--budget', type=float, default=CRAWL_BUDGET, help="Seconds available for the run")
+    parser.add_argument('--products', type=int, default=0, help="Also list the N products most likely to have changed")
+    args = parser.parse_args(argv)
+
+    with PriceHistory(args.db) as history:
+        scheduler = RecrawlScheduler(history)
+        category_urls = args.category_urls or [row[0] for row in history.conn.execute(
+            'SELECT DISTINCT category_url FROM category_crawls ORDER BY category_url'
+        )]
+        for entry in scheduler.plan(category_urls, args.budget):
+            rate = f"{entry['rate'] * 86400:.3f}/day" if entry['rate'] is not None else 'unknown'
+            print(f"{'DUE ' if entry['due'] else '    '}{entry['url']}\trate={rate}\t"
+                  f"interval={entry['interval'] / HOUR:.1f}h\tpriority={entry['priority']:.1f}\tcost={entry['seconds']:.0f}s")
+        for code, sku, probability in scheduler.product_priorities(args.products) if args.products else []:
+            print(f"{code}\t{sku}\t{probability:.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import bisect
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+REPORT_DIR = 'reports'
+METRIC_PREFIX = 'currys_scraper'
+
+# Upper bounds (seconds) of the per-stage latency histogram buckets
+LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120]
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.samples = []
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.samples.append(value)
+        self.total += value
+
+    def quantile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            'count': len(self.samples),
+            'sum': round(self.total, 6),
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': max(self.samples) if self.samples else None
+        }
+
+class RunMetrics:
+    """Counters, gauges, time series and per-stage latency histograms for one scraper run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.series = {}
+        self.stages = {}
+        self.sections = {}
+
+    def incr(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def sample(self, name, value):
+        """Append (seconds since run start, value) to the `name` series; the gauge keeps the latest."""
+        self.series.setdefault(name, []).append([round(time.time() - self.started, 3), value])
+        self.gauges[name] = value
+
+    def set_section(self, name, value):
+        """Attach a JSON-serialisable breakdown (e.g. per-category stats) to the run report."""
+        self.sections[name] = value
+
+    def observe(self, stage, seconds):
+        if stage not in self.stages:
+            self.stages[stage] = Histogram()
+        self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one observation of `name` (also on error)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def report(self, run_id=None):
+        return {
+            'run_id': run_id,
+            'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            'duration_seconds': round(time.time() - self.started, 3),
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'series': {name: list(points) for name, points in self.series.items()},
+            'stages': {name: histogram.summary() for name, histogram in self.stages.items()},
+            **self.sections
+        }
+
+    def log_summary(self):
+        """Log each stage's count and tail latencies (p50/p95/p99/max) for the run summary."""
+        for name, histogram in sorted(self.stages.items()):
+            summary = histogram.summary()
+            logger.info("Stage %-16s n=%-5s p50=%.2fs p95=%.2fs p99=%.2fs max=%.2fs", name, summary['count'],
+                        summary['p50'], summary['p95'], summary['p99'], summary['max'])
+
+    def prometheus_text(self, job):
+        lines = []
+        labels = f'job="{job}"'
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name}_total counter')
+            lines.append(f'{METRIC_PREFIX}_{name}_total{{{labels}}} {value}')
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} gauge')
+            lines.append(f'{METRIC_PREFIX}_{name}{{{labels}}} {value}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_run_duration_seconds gauge')
+        lines.append(f'{METRIC_PREFIX}_run_duration_seconds{{{labels}}} {time.time() - self.started:.3f}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge')
+        lines.append(f'{METRIC_PREFIX}_last_run_timestamp_seconds{{{labels}}} {time.time():.0f}')
+        metric = f'{METRIC_PREFIX}_stage_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        for stage, histogram in sorted(self.stages.items()):
+            stage_labels = f'{labels},stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{stage_labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{stage_labels},le="+Inf"}} {len(histogram.samples)}')
+            lines.append(f'{metric}_sum{{{stage_labels}}} {histogram.total:.6f}')
+            lines.append(f'{metric}_count{{{stage_labels}}} {len(histogram.samples)}')
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, job='scraper', run_id=None, report_dir=REPORT_DIR):
+        """Write reports/<job>-<run_id>.json and the Prometheus textfile reports/<job>.prom."""
+        os.makedirs(report_dir, exist_ok=True)
+        run_id = run_id or datetime.now().strftime('%Y%m%d-%H%M%S')
+        json_path = os.path.join(report_dir, f'{job}-{run_id}.json')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(run_id), f, indent=2)
+
+        # Write then rename so the textfile collector never reads a partial file
+        prom_path = os.path.join(report_dir, f'{job}.prom')
+        with open(prom_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text(job))
+        os.replace(prom_path + '.tmp', prom_path)
+        logger.info("Wrote run report %s and metrics %s", json_path, prom_path)
+        return json_path
+
+# Shared by every module of a scraper process
+metrics = RunMetrics()
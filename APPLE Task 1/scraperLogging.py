@@ -0,0 +1,108 @@
+import atexit
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.environ.get('SCRAPER_LOG_DIR', 'logs')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Keep 1 in N per-tile INFO lines; warnings and errors are always kept
+TILE_SAMPLE_EVERY = 20
+
+_listener = None
+run_id = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; the message is only rendered here, on the listener thread."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'run_id': run_id,
+            'thread': record.threadName
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves msg/args untouched so formatting happens in the listener thread.
+
+    The stock QueueHandler.prepare() renders the message in the calling thread; the
+    queue here never leaves the process, so the record can be passed through as-is.
+    """
+
+    def prepare(self, record):
+        return record
+
+class SampleFilter(logging.Filter):
+    """Pass every `every`-th record below WARNING, and every record at WARNING or above."""
+
+    def __init__(self, every=TILE_SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self.count = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        self.count += 1
+        return (self.count - 1) % self.every == 0
+
+def setup_logging(name='scraper', level=logging.INFO, log_dir=LOG_DIR):
+    """Route all logging through a background QueueListener.
+
+    Records go to a rotating per-run JSON-lines file (logs/<name>-<run_id>.jsonl)
+    and to the console. Safe to call more than once; later calls are no-ops.
+    """
+    global _listener, run_id
+    if _listener is not None:
+        return run_id
+
+    run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f'{name}-{run_id}.jsonl')
+
+    file_handler = RotatingFileHandler(
+        log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    logging.getLogger(__name__).info("Logging to %s", log_path)
+    return run_id
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def get_tile_logger(name, every=TILE_SAMPLE_EVERY):
+    """Logger for per-tile/per-product lines, sampled to 1 in `every` below WARNING."""
+    tile_logger = logging.getLogger(f'{name}.tiles')
+    if not any(isinstance(f, SampleFilter) for f in tile_logger.filters):
+        tile_logger.addFilter(SampleFilter(every))
+    return tile_logger
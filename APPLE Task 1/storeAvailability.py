@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from blockCoordinator import detect_block, get_coordinator, host_of
+from httpClient import RETRIES, RETRY_STATUSES, RateLimiter, async_headers, make_async_client, retry_delay
+from priceHistory import HISTORY_DB
+from productSchema import read_products_csv
+from runMetrics import metrics
+from urlFrontier import BASE_URL
+
+try:
+    import httpx
+except ImportError:  # make_async_client reports the missing dependency
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+STORE_DB = os.environ.get('SCRAPER_STORE_DB', 'store_stock.db')
+# Per-store stock lookup; {product_code} and {store_ids} (comma separated) are filled in per batch.
+# The site's store-stock call is not a documented API, so point this at whatever the PDP's
+# "check stock in store" panel requests when it changes.
+STORE_ENDPOINT = os.environ.get(
+    'SCRAPER_STORE_ENDPOINT',
+    BASE_URL + '/on/demandware.store/Sites-curry-uk-Site/en_GB/Stores-InventoryCheck?pid={product_code}&storeIds={store_ids}'
+)
+STORE_BATCH = int(os.environ.get('SCRAPER_STORE_BATCH', 20))            # stores per request
+STORE_CONCURRENCY = int(os.environ.get('SCRAPER_STORE_CONCURRENCY', 4))
+STORE_RATE = float(os.environ.get('SCRAPER_STORE_RATE', 4))             # requests per second, all products
+STORE_TTL = int(os.environ.get('SCRAPER_STORE_TTL', 30 * 60))           # seconds a product's row stays fresh
+
+# One byte per product x store cell
+STATUSES = ['unknown', 'in_stock', 'low_stock', 'out_of_stock']
+UNKNOWN, IN_STOCK, LOW_STOCK, OUT_OF_STOCK = range(len(STATUSES))
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS stores (
+    idx INTEGER PRIMARY KEY,
+    store_id TEXT NOT NULL UNIQUE,
+    name TEXT,
+    region TEXT
+);
+CREATE TABLE IF NOT EXISTS stock (
+    product_code TEXT PRIMARY KEY,
+    fetched_at INTEGER NOT NULL,
+    cells BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+def status_code(entry):
+    """STATUSES index for one store entry of the endpoint's JSON."""
+    for key in ('quantity', 'stockLevel', 'ats'):
+        if isinstance(entry.get(key), (int, float)) and not isinstance(entry.get(key), bool):
+            quantity = entry[key]
+            return OUT_OF_STOCK if quantity <= 0 else LOW_STOCK if quantity < 3 else IN_STOCK
+    for key in ('inStock', 'available', 'orderable'):
+        if isinstance(entry.get(key), bool):
+            return IN_STOCK if entry[key] else OUT_OF_STOCK
+    text = str(entry.get('status') or entry.get('availability') or entry.get('stockStatus') or '').lower()
+    if not text:
+        return UNKNOWN
+    if 'low' in text or 'limited' in text or 'few' in text:
+        return LOW_STOCK
+    if 'out' in text or 'unavailable' in text or text.startswith('no'):
+        return OUT_OF_STOCK
+    if 'stock' in text or 'available' in text or 'collect' in text:
+        return IN_STOCK
+    return UNKNOWN
+
+def parse_store_response(payload):
+    """{store_id: status} from the store-stock JSON: a list of store entries, or an object holding one."""
+    if isinstance(payload, dict):
+        for key in ('stores', 'storeAvailability', 'results', 'data'):
+            if isinstance(payload.get(key), list):
+                payload = payload[key]
+                break
+    if not isinstance(payload, list):
+        return {}
+    statuses = {}
+    for entry in payload:
+        if not isinstance(entry, dict):
+            continue
+        store_id = entry.get('storeId') or entry.get('storeID') or entry.get('id') or entry.get('ID')
+        if store_id is not None:
+            statuses[str(store_id)] = status_code(entry)
+    return statuses
+
+def region_filter(regions):
+    """Lower-cased set of `regions` (one name or a list of them), or None for every region."""
+    if not regions:
+        return None
+    if isinstance(regions, str):
+        regions = [regions]
+    return {region.lower() for region in regions}
+
+def read_stores(path, regions=None):
+    """[(store_id, name, region)] from a CSV with a store_id column and optional name/region columns."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        stores = [(row['store_id'].strip(), row.get('name') or None, row.get('region') or None)
+                  for row in csv.DictReader(f) if row.get('store_id')]
+    wanted = region_filter(regions)
+    if wanted:
+        stores = [store for store in stores if (store[2] or '').lower() in wanted]
+    return stores
+
+class StoreMatrix:
+    """Product x store click-and-collect status, one byte per cell.
+
+    Each product's row is a bytes value indexed by the store's position in the stores table,
+    so a product's stock across every store is one row read, and the whole matrix for a few
+    thousand products and a few hundred stores fits in a couple of MB. A row older than the
+    TTL is cleared and fetched again in full; a fresh row only fetches the stores it has no
+    answer for yet.
+    """
+
+    def __init__(self, path=STORE_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA_SQL)
+        self.stores = []
+        self.index = {}
+        for idx, store_id, name, region in self.conn.execute('SELECT idx, store_id, name, region FROM stores ORDER BY idx'):
+            self.stores.append((store_id, name, region))
+            self.index[store_id] = idx
+        self.rows = {code: [fetched_at, bytearray(cells)]
+                     for code, fetched_at, cells in self.conn.execute('SELECT product_code, fetched_at, cells FROM stock')}
+        self.dirty = set()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_stores(self, stores):
+        """Register (store_id, name, region) tuples; known stores keep their column."""
+        with self.conn:
+            for store_id, name, region in stores:
+                if store_id in self.index:
+                    self.conn.execute('UPDATE stores SET name = ?, region = ? WHERE store_id = ?', (name, region, store_id))
+                    self.stores[self.index[store_id]] = (store_id, name, region)
+                    continue
+                self.index[store_id] = len(self.stores)
+                self.stores.append((store_id, name, region))
+                self.conn.execute('INSERT INTO stores (idx, store_id, name, region) VALUES (?, ?, ?, ?)',
+                                  (self.index[store_id], store_id, name, region))
+
+    def pending(self, product_code, store_ids, ttl=STORE_TTL, now=None):
+        """Stores in `store_ids` that need a fetch for this product; starts a new row if the old one expired."""
+        now = int(now or time.time())
+        row = self.rows.get(product_code)
+        if row is None or now - row[0] > ttl:
+            self.rows[product_code] = [now, bytearray(len(self.stores))]
+            self.dirty.add(product_code)
+            return list(store_ids)
+        cells = row[1]
+        return [store_id for store_id in store_ids
+                if self.index[store_id] >= len(cells) or cells[self.index[store_id]] == UNKNOWN]
+
+    def set(self, product_code, statuses):
+        """Write {store_id: status} into the product's row."""
+        cells = self.rows[product_code][1]
+        for store_id, status in statuses.items():
+            idx = self.index.get(store_id)
+            if idx is None:
+                continue
+            if idx >= len(cells):
+                cells.extend(bytes(idx + 1 - len(cells)))
+            cells[idx] = status
+        self.dirty.add(product_code)
+
+    def save(self):
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO stock (product_code, fetched_at, cells) VALUES (?, ?, ?)',
+                [(code, self.rows[code][0], bytes(self.rows[code][1])) for code in self.dirty]
+            )
+        self.dirty.clear()
+
+    def stock(self, product_code, regions=None, statuses=(IN_STOCK, LOW_STOCK)):
+        """[(store_id, name, region, status)] for the stores holding the product, optionally only in `regions`."""
+        row = self.rows.get(product_code)
+        if row is None:
+            return []
+        cells = row[1]
+        wanted = region_filter(regions)
+        return [(store_id, name, store_region, STATUSES[cells[idx]])
+                for idx, (store_id, name, store_region) in enumerate(self.stores[:len(cells)])
+                if cells[idx] in statuses and (wanted is None or (store_region or '').lower() in wanted)]
+
+    def products_at(self, store_id, statuses=(IN_STOCK, LOW_STOCK)):
+        """{product_code: status} for the products a store holds; empty for a store never collected."""
+        idx = self.index.get(store_id)
+        if idx is None:
+            return {}
+        return {code: STATUSES[cells[idx]] for code, (_, cells) in self.rows.items()
+                if idx < len(cells) and cells[idx] in statuses}
+
+    def export_csv(self, path, regions=None):
+        """Wide CSV: one row per product, one column per store (in `regions`, if given)."""
+        wanted = region_filter(regions)
+        columns = [idx for idx, store in enumerate(self.stores)
+                   if wanted is None or (store[2] or '').lower() in wanted]
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['product_code', 'fetched_at'] + [self.stores[idx][0] for idx in columns])
+            for code, (fetched_at, cells) in sorted(self.rows.items()):
+                writer.writerow([code, fetched_at] + [STATUSES[cells[idx]] if idx < len(cells) else STATUSES[UNKNOWN]
+                                                      for idx in columns])
+
+async def fetch_batch(client, url, semaphore, limiter, coordinator, retries=RETRIES):
+    """Store-stock JSON for one product and batch of stores, or None once the retries run out."""
+    host = host_of(url)
+    for attempt in range(1, retries + 2):
+        response = None
+        paused = coordinator.blocked_for(host)
+        if paused:
+            await asyncio.sleep(paused)
+        await limiter.wait()
+        started = time.perf_counter()
+        try:
+            async with semaphore:
+                response = await client.get(url, headers=dict(async_headers(), Accept='application/json'))
+            metrics.observe('store_fetch', time.perf_counter() - started)
+            metrics.incr('store_requests')
+            if response.status_code == 200:
+                coordinator.report_ok(host)
+                return response.json()
+            if response.status_code == 403:
+                coordinator.report_block(host, detect_block(response.status_code))
+            elif response.status_code not in RETRY_STATUSES:
+                logger.warning("Store stock request got %s for %s", response.status_code, url)
+                return None
+            error = f"{response.status_code} {response.reason_phrase}"
+        except ValueError as e:
+            logger.warning("Store stock response for %s is not JSON: %s", url, e)
+            return None
+        except httpx.TransportError as e:
+            error = e
+        if attempt > retries:
+            break
+        await asyncio.sleep(retry_delay(attempt, response))
+    metrics.incr('fetch_errors')
+    logger.error("Store stock request failed for %s: %s", url, error)
+    return None
+
+async def collect(matrix, product_codes, store_ids, endpoint=STORE_ENDPOINT, batch=STORE_BATCH,
+                  concurrency=STORE_CONCURRENCY, rate=STORE_RATE, ttl=STORE_TTL):
+    """Fill the matrix for `product_codes` x `store_ids`, skipping cells still fresh; returns requests made."""
+    jobs = []
+    for code in product_codes:
+        stores = matrix.pending(code, store_ids, ttl)
+        metrics.incr('store_cache_hits', len(store_ids) - len(stores))
+        jobs += [(code, stores[start:start + batch]) for start in range(0, len(stores), batch)]
+    logger.info("Store stock: %s products x %s stores, %s requests after cache", len(product_codes), len(store_ids), len(jobs))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+    coordinator = get_coordinator()
+
+    async def run(client, code, stores):
+        payload = await fetch_batch(client, endpoint.format(product_code=code, store_ids=','.join(stores)),
+                                    semaphore, limiter, coordinator)
+        if payload is None:
+            return
+        statuses = parse_store_response(payload)
+        # Stores the endpoint left out of its answer hold no stock for collection
+        matrix.set(code, {store_id: statuses.get(store_id, OUT_OF_STOCK) for store_id in stores})
+        metrics.incr('store_cells', len(stores))
+
+    async with make_async_client(concurrency) as client:
+        await asyncio.gather(*(run(client, code, stores) for code, stores in jobs))
+    matrix.save()
+    return len(jobs)
+
+def product_codes_from(args):
+    codes = list(args.products)
+    if args.csv:
+        codes += [str(record['product_code']) for record in read_products_csv(args.csv) if record.get('product_code')]
+    if not codes and os.path.exists(args.history):
+        conn = sqlite3.connect(args.history)
+        try:
+            codes = [code for code, in conn.execute('SELECT DISTINCT product_code FROM products ORDER BY product_code')]
+        finally:
+            conn.close()
+    return list(dict.fromkeys(codes))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect per-store click-and-collect stock into a product x store matrix")
+    parser.add_argument('products', nargs='*', help="Product codes (default: every product in --csv or the price history)")
+    parser.add_argument('--stores', help="CSV of stores to check: store_id, name, region")
+    parser.add_argument('--region', action='append', help="Only stores in this region (repeatable)")
+    parser.add_argument('--csv', help="Take product codes from a scraped products CSV")
+    parser.add_argument('--history', default=HISTORY_DB, help="Price history to take product codes from")
+    parser.add_argument('--db', default=STORE_DB, help="Store stock matrix database")
+    parser.add_argument('--endpoint', default=STORE_ENDPOINT, help="URL template with {product_code} and {store_ids}")
+    parser.add_argument('--batch', type=int, default=STORE_BATCH, help="Stores per request")
+    parser.add_argument('--concurrency', type=int, default=STORE_CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=STORE_RATE, help="Requests per second")
+    parser.add_argument('--ttl', type=int, default=STORE_TTL, help="Seconds before a product's stock is fetched again")
+    parser.add_argument('--query', metavar='PRODUCT_CODE', help="Print the stores holding this product and exit")
+    parser.add_argument('--store', metavar='STORE_ID', help="Print the products this store holds and exit")
+    parser.add_argument('--export', metavar='CSV', help="Write the matrix as a wide CSV and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with StoreMatrix(args.db) as matrix:
+        if args.query:
+            for store_id, name, store_region, status in matrix.stock(args.query, args.region):
+                print(f"{store_id}\t{name or ''}\t{store_region or ''}\t{status}")
+            return 0
+        if args.store:
+            print(json.dumps(matrix.products_at(args.store), indent=2))
+            return 0
+        if args.export:
+            matrix.export_csv(args.export, args.region)
+            return 0
+
+        if not args.stores:
+            parser.error("--stores is required to collect")
+        stores = read_stores(args.stores, args.region)
+        codes = product_codes_from(args)
+        if not stores or not codes:
+            parser.error("nothing to collect: no stores or no product codes")
+        matrix.add_stores(stores)
+        started = time.perf_counter()
+        requests_made = asyncio.run(collect(matrix, codes, [store[0] for store in stores], args.endpoint,
+                                            args.batch, args.concurrency, args.rate, args.ttl))
+        elapsed = time.perf_counter() - started
+        logger.info("Collected %s products x %s stores with %s requests in %.1fs: %s", len(codes), len(stores),
+                    requests_made, elapsed, metrics.report()['counters'])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import html
+import json
+import random
+
+# Shapes taken from apple_products_dataLayer.csv so synthetic tiles exercise the same code paths
+PRODUCT_LINES = [
+    ('APPLE Mac mini (2024) - M4, 256 GB SSD, Silver', 'APPLE MAC', 'APPLE MAC MINI', 'APPLE DESKTOP', ['Computing', 'Desktop PCs', 'Desktops']),
+    ('APPLE MacBook Air 13" (2025) - M4, 256 GB SSD, Sky Blue', 'APPLE MAC', 'APPLE MACBOOK AIR', 'APPLE LAPTOP', ['Computing', 'Laptops', 'Laptops']),
+    ('APPLE iPhone 16 - 128 GB, Black', 'APPLE IPHONE', 'APPLE IPHONE 16', 'APPLE PHONE', ['Phones', 'Mobile phones', 'Mobile phones']),
+    ('APPLE Watch Series 10 - 42 mm, Jet Black', 'APPLE WATCH', 'APPLE WATCH SERIES 10', 'APPLE WEARABLES', ['Smart Tech', 'Smart watches & fitness', 'Smart watches']),
+    ('APPLE 11" iPad Air (2025) - 128 GB, Space Grey', 'APPLE IPAD', 'APPLE IPAD AIR', 'APPLE TABLET', ['Computing', 'iPad, tablets & eReaders', 'Tablets']),
+    ('APPLE USB-C to MagSafe 3 Cable - 2 m', 'APPLE ACCESSORIES', 'APPLE CABLES', 'APPLE ACCESSORIES', ['Phones', 'Mobile phone accessories', 'Mobile phone accessories'])
+]
+
+OFFERS = [
+    'price drop',
+    'Get up to 3 months of Apple TV+, Apple Music, Apple Fitness+ and Apple Arcade with this product.',
+    'Free next day delivery on this product in most areas.',
+    'Free standard delivery',
+    'BNPL6'
+]
+
+COLLECT_TYPES = [
+    'FREE in-store collection in as little as 1 hour',
+    'Free collection (subject to availability) '
+]
+
+BASE_URL = 'https://www.currys.co.uk'
+
+def slugify(title):
+    return ''.join(c if c.isalnum() else '-' for c in title.lower()).strip('-').replace('--', '-')
+
+def make_data_layer(index, rng=random):
+    """A data-productdatalayer object shaped like the live site's."""
+    title, area, sub_group, group, categories = PRODUCT_LINES[index % len(PRODUCT_LINES)]
+    base_price = rng.choice([29, 49, 199, 599, 799, 1099, 1499, 1999])
+    price = base_price - rng.choice([0, 0, 20, 50])
+    code = str(10_000_000 + index)
+    return {
+        'name': f'{title} #{index}',
+        'id': code,
+        'brand': 'APPLE',
+        'ean': [str(195_949_000_000 + index)],
+        'sku': str(300_000 + index),
+        'price': [{
+            'revenue': price,
+            'baseRevenue': base_price,
+            'currency': 'GBP',
+            'tax': round(price / 6, 2),
+            'offer': [{'name': name} for name in rng.sample(OFFERS, 3)]
+        }],
+        'payment': [
+            {'frequency': 'one off', 'amount': price},
+            {'frequency': 'monthly', 'amount': round(price / 24, 2)}
+        ],
+        'availability': [
+            {'availabilityStatus': 'shipping', 'availabilityType': 'Delivery available'},
+            {'availabilityStatus': 'collect in store', 'availabilityType': rng.choice(COLLECT_TYPES)}
+        ],
+        'category': {
+            'categories': categories,
+            'merchendisingArea': area,
+            'subPlanningGroup': sub_group,
+            'planningGroup': group,
+            'productType': 'product'
+        }
+    }
+
+def make_tile(index, rng=random):
+    """One listing tile: data-productdatalayer attribute, pdpLink, rating and review count."""
+    data = make_data_layer(index, rng)
+    href = f"/products/{slugify(data['name'])}-{data['id']}.html"
+    data_attr = html.escape(json.dumps([data]), quote=True)
+    rating = f'{rng.uniform(3.5, 5):.2f}'
+    return (
+        f'<div class="product" data-pid="{data["id"]}" data-productdatalayer="{data_attr}">'
+        f'<div class="row plp-list-grid">'
+        f'<div class="product-image"><img src="/images/{data["id"]}.jpg" alt="{html.escape(data["name"])}"></div>'
+        f'<a class="link text-truncate pdpLink" href="{href}">'
+        f'<h2 class="pdp-grid-product-name">{html.escape(data["name"])}</h2></a>'
+        f'<div class="rating"><span class="nvda_star_reading">{rating}\n            out of 5 stars</span>'
+        f'<span class="rating-count average-reviews">{rng.randint(1, 900)} reviews</span></div>'
+        f'<div class="price"><span class="value">£{data["price"][0]["revenue"]:.2f}</span></div>'
+        f'</div></div>'
+    )
+
+# Appends the HTML returned by the load-more URL to the grid, then removes the button
+LOAD_MORE_SCRIPT = (
+    '<script>document.addEventListener("click",function(e){'
+    'var b=e.target.closest(".load-more");if(!b)return;'
+    'fetch(b.dataset.url).then(function(r){return r.text()}).then(function(t){'
+    'document.querySelector(".product-grid").insertAdjacentHTML("beforeend",t);b.remove();});});</script>'
+)
+
+def make_tiles(count, start=0, seed=None):
+    rng = random.Random(seed if seed is not None else start)
+    return ''.join(make_tile(start + i, rng) for i in range(count))
+
+def make_listing_page(tiles, start=0, next_href=None, load_more=None, seed=None):
+    """A category page with `tiles` product tiles and an optional a.next link.
+
+    load_more: URL of the remaining tiles; adds a button.load-more that fetches and appends them.
+    """
+    body = make_tiles(tiles, start, seed)
+    next_link = f'<a class="next" href="{html.escape(next_href)}">Next</a>' if next_href else ''
+    more = f'<button class="load-more btn" data-url="{html.escape(load_more)}">Load more</button>{LOAD_MORE_SCRIPT}' if load_more else ''
+    return (
+        '<!DOCTYPE html><html lang="en-GB"><head><meta charset="utf-8">'
+        '<title>Apple | Currys</title></head><body>'
+        '<header><nav class="main-nav"><a href="/computing">Computing</a><a href="/phones">Phones</a></nav></header>'
+        '<main><div class="row product-grid list-view justify-content-center">'
+        f'{body}</div>'
+        f'<div class="pagination">{more}{next_link}</div></main>'
+        '<footer><p>Currys stand-in</p></footer></body></html>'
+    )
+
+def make_brand_page(links):
+    """A brand landing page whose navigation lists `links` as (href, text) pairs."""
+    items = ''.join(f'<li><a href="{html.escape(href)}">{html.escape(text)}</a></li>' for href, text in links)
+    return (
+        '<!DOCTYPE html><html lang="en-GB"><head><meta charset="utf-8">'
+        '<title>Apple | Currys</title></head><body>'
+        '<header><nav class="main-nav"><a href="/computing">Computing</a><a href="/phones">Phones</a>'
+        '<a href="/help-and-support">Help</a></nav></header>'
+        f'<main><ul class="brand-nav">{items}</ul></main>'
+        '<footer><p>Currys stand-in</p></footer></body></html>'
+    )
+
+def make_pdp_page(index, rng=None, availability=None):
+    """A product detail page carrying the same product as JSON-LD, a data-productdatalayer
+    element and the CSS classes currysPDPScrapeSelenium.py reads.
+
+    availability: replaces the data layer's availability list (e.g. to simulate a sell-out).
+    """
+    rng = rng or random.Random(index)
+    data = make_data_layer(index, rng)
+    if availability is not None:
+        data['availability'] = availability
+    price = data['price'][0]
+    rating = f'{rng.uniform(3.5, 5):.2f}'
+    reviews = rng.randint(1, 900)
+    href = f"{BASE_URL}/products/{slugify(data['name'])}-{data['id']}.html"
+    json_ld = {
+        '@context': 'https://schema.org',
+        '@type': 'Product',
+        'name': data['name'],
+        'sku': data['id'],
+        'gtin13': data['ean'][0],
+        'brand': {'@type': 'Brand', 'name': data['brand']},
+        'url': href,
+        'aggregateRating': {'@type': 'AggregateRating', 'ratingValue': rating, 'reviewCount': reviews},
+        'offers': {
+            '@type': 'Offer',
+            'price': f"{price['revenue']:.2f}",
+            'priceCurrency': price['currency'],
+            'availability': 'https://schema.org/InStock'
+        }
+    }
+    data_attr = html.escape(json.dumps([data]), quote=True)
+    return (
+        '<!DOCTYPE html><html lang="en-GB"><head><meta charset="utf-8">'
+        f'<title>{html.escape(data["name"])} | Currys</title>'
+        f'<script type="application/ld+json">{json.dumps(json_ld)}</script>'
+        '</head><body><main>'
+        f'<div class="product-detail" data-productdatalayer="{data_attr}">'
+        f'<h1 class="product-name">{html.escape(data["name"])}</h1>'
+        f'<div class="product-code">Product code: {data["id"]}</div>'
+        f'<div class="prices"><span class="value">£{price["revenue"]:.2f}</span></div>'
+        f'<div class="rating"><span class="nvda_star_reading">{rating}\n            out of 5 stars</span>'
+        f'<span class="rating-count d-inline-flex mt-1 d-block average-reviews">{reviews} reviews</span></div>'
+        '<section class="specifications">' + ''.join(f'<p>Specification line {i}</p>' for i in range(40)) + '</section>'
+        '</div></main></body></html>'
+    )
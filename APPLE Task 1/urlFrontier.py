@@ -0,0 +1,80 @@
+import hashlib
+import heapq
+import itertools
+import logging
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = 'https://www.currys.co.uk'
+
+# Query parameters that only track the visitor/campaign and never change the page content
+TRACKING_PARAMS = {'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', 'cmpid', 'icid',
+                   'intcmp', 'srcid', '_ga', '_gl', 'ref', 'referrer', 'cm_mmc', 'awc', 'sv1', 'sv_campaign_id'}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_', 'sc_')
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+def canonicalize(url, base=BASE_URL):
+    """One spelling per page: absolute, lower-case scheme/host, no default port, no fragment,
+    no tracking parameters, remaining query parameters sorted, no duplicate or trailing slashes.
+
+    Returns None for missing/placeholder URLs.
+    """
+    if not url or not isinstance(url, str) or url.startswith('No '):
+        return None
+    parts = urlsplit(urljoin(base + '/', url.strip()))
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    path = '/'.join(segment for segment in parts.path.split('/') if segment)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit((scheme, host, '/' + path, urlencode(query), ''))
+
+def url_key(url):
+    """8-byte digest of a canonical URL, the unit stored in the seen-set."""
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+
+class FetchTask:
+    def __init__(self, url, priority=0, kind='page', category_url=None):
+        self.url = url
+        self.priority = priority
+        self.kind = kind
+        self.category_url = category_url
+
+class Frontier:
+    """Priority queue of URLs to fetch in front of a seen-set for the run.
+
+    add() canonicalises and drops URLs already queued in this run, so a page reached under two
+    spellings (or a pagination loop) is fetched once. pop() hands out the highest-priority task,
+    first-in first-out among equals. Nothing persists between runs: when a listing is due again
+    is the recrawl scheduler's call.
+    """
+
+    def __init__(self):
+        self.queued = set()
+        self.heap = []
+        self.order = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def seen(self, url):
+        """True if `url` was queued in this run."""
+        url = canonicalize(url)
+        return bool(url) and url_key(url) in self.queued
+
+    def add(self, url, priority=0, kind='page', category_url=None):
+        """Queue `url` unless already seen; returns the canonical URL, or None if it was skipped."""
+        url = canonicalize(url)
+        if not url or self.seen(url):
+            return None
+        self.queued.add(url_key(url))
+        heapq.heappush(self.heap, (-priority, next(self.order), FetchTask(url, priority, kind, category_url)))
+        return url
+
+    def pop(self):
+        return heapq.heappop(self.heap)[2] if self.heap else None
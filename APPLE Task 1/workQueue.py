@@ -0,0 +1,398 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from urlFrontier import canonicalize
+from runMetrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB = 'work_queue.db'
+VISIBILITY_TIMEOUT = 300   # seconds a lease hides a task from other workers
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 30         # seconds before the first retry, doubled per attempt
+# WAL needs shared memory, i.e. every worker on one machine; workers on several hosts sharing
+# the file over a network volume need the rollback journal instead
+MULTI_HOST_ENV = 'SCRAPER_QUEUE_MULTI_HOST'
+
+PAGE = 'page'              # category listing page: fullDataLayerCatSync.scrape_page
+PDP = 'pdp'                # product detail page: currysPDPScrapeSelenium.scrape_product_detail
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    category_url TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'ready',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_until REAL,
+    last_error TEXT,
+    seconds REAL,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, url)
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (state, priority DESC, available_at);
+CREATE TABLE IF NOT EXISTS results (
+    task_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    category_url TEXT,
+    record TEXT NOT NULL
+);
+"""
+
+class Task:
+    def __init__(self, id, kind, url, category_url, attempts):
+        self.id = id
+        self.kind = kind
+        self.url = url
+        self.category_url = category_url
+        self.attempts = attempts
+
+class LeaseLost(Exception):
+    """The lease expired and another worker took the task over."""
+
+class WorkQueue:
+    """Durable task queue in SQLite with leases, visibility timeouts and retries.
+
+    Any number of worker processes on one machine can share one database file (WAL mode).
+    For workers on several hosts, run every one of them with --multi-host (or
+    SCRAPER_QUEUE_MULTI_HOST=1), which switches to the rollback journal, and put the file on a
+    volume with working POSIX locks (not most NFS mounts).
+    """
+
+    def __init__(self, path=QUEUE_DB, visibility=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS, multi_host=None):
+        self.path = path
+        self.visibility = visibility
+        self.max_attempts = max_attempts
+        if multi_host is None:
+            multi_host = os.environ.get(MULTI_HOST_ENV) == '1'
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        if multi_host:
+            self.conn.execute('PRAGMA journal_mode=DELETE')
+            self.conn.execute('PRAGMA synchronous=FULL')
+        else:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA_SQL)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front so two workers can't lease the same row
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def enqueue(self, url, kind=PAGE, category_url=None, priority=0):
+        """Add a task unless the same (kind, canonical url) was already queued; returns True if added."""
+        now = time.time()
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO tasks (kind, url, category_url, priority, available_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (kind, canonicalize(url), canonicalize(category_url), priority, now, now)
+        )
+        return cursor.rowcount == 1
+
+    def lease(self, owner, kinds=(PAGE, PDP)):
+        """Take the highest-priority available task, or None. Expired leases are available again."""
+        now = time.time()
+        placeholders = ','.join('?' * len(kinds))
+        self._transaction()
+        try:
+            # Tasks whose last lease expired on the final attempt are given up on
+            self.conn.execute(
+                "UPDATE tasks SET state = 'failed', last_error = 'lease expired', updated_at = ? "
+                "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            row = self.conn.execute(
+                f"SELECT id, kind, url, category_url, attempts FROM tasks "
+                f"WHERE kind IN ({placeholders}) AND ((state = 'ready' AND available_at <= ?) "
+                f"OR (state = 'leased' AND lease_until < ?)) "
+                f"ORDER BY priority DESC, id LIMIT 1",
+                (*kinds, now, now)
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_until = ?, updated_at = ? WHERE id = ?",
+                    (owner, now + self.visibility, now, row[0])
+                )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        if not row:
+            return None
+        task_id, kind, url, category_url, attempts = row
+        return Task(task_id, kind, url, category_url, attempts + 1)
+
+    def extend(self, task, owner):
+        """Push the lease's visibility timeout forward; raises LeaseLost if it is no longer ours."""
+        cursor = self.conn.execute(
+            "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+            (time.time() + self.visibility, time.time(), task.id, owner)
+        )
+        if cursor.rowcount != 1:
+            raise LeaseLost(task.url)
+
+    def complete(self, task, owner, records=(), follow_ups=(), seconds=None):
+        """Store the task's records, queue follow-up (url, kind, priority) tasks and mark it done, atomically."""
+        now = time.time()
+        self._transaction()
+        try:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET state = 'done', lease_owner = NULL, lease_until = NULL, seconds = ?, updated_at = ? "
+                "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (seconds, now, task.id, owner)
+            )
+            if cursor.rowcount != 1:
+                raise LeaseLost(task.url)
+            self.conn.executemany(
+                'INSERT INTO results (task_id, kind, category_url, record) VALUES (?, ?, ?, ?)',
+                [(task.id, task.kind, task.category_url, json.dumps(record)) for record in records]
+            )
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO tasks (kind, url, category_url, priority, available_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(kind, canonicalize(url), task.category_url, priority, now, now) for url, kind, priority in follow_ups]
+            )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def fail(self, task, owner, error):
+        """Release the lease for a retry after an exponential backoff, or give up after max_attempts."""
+        now = time.time()
+        if task.attempts >= self.max_attempts:
+            state, available_at = 'failed', now
+        else:
+            state, available_at = 'ready', now + RETRY_BACKOFF * 2 ** (task.attempts - 1)
+        self.conn.execute(
+            "UPDATE tasks SET state = ?, available_at = ?, lease_owner = NULL, lease_until = NULL, "
+            "last_error = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+            (state, available_at, str(error)[:500], now, task.id, owner)
+        )
+        logger.warning("Task %s %s failed (attempt %s/%s): %s", task.kind, task.url, task.attempts, self.max_attempts, error)
+
+    def counts(self):
+        """{(kind, state): n}"""
+        return {(kind, state): n for kind, state, n in self.conn.execute(
+            'SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state'
+        )}
+
+    def pending(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tasks WHERE state IN ('ready', 'leased')").fetchone()[0]
+
+    def reset(self):
+        """Forget every task and result, e.g. before seeding the next crawl."""
+        with self.conn:
+            self.conn.execute('DELETE FROM tasks')
+            self.conn.execute('DELETE FROM results')
+
+    def category_seconds(self):
+        """{category_url: seconds spent on its listing pages across all workers}"""
+        return dict(self.conn.execute(
+            'SELECT category_url, SUM(seconds) FROM tasks WHERE kind = ? AND state = ? GROUP BY category_url', (PAGE, 'done')
+        ))
+
+    def results(self, kind=PAGE):
+        for category_url, record in self.conn.execute(
+            'SELECT category_url, record FROM results WHERE kind = ? ORDER BY task_id', (kind,)
+        ):
+            yield category_url, json.loads(record)
+
+class Heartbeat(threading.Thread):
+    """Keeps extending a lease from its own connection while the page is being scraped."""
+
+    def __init__(self, path, task, owner, visibility):
+        super().__init__(name=f'lease-{task.id}', daemon=True)
+        self.path = path
+        self.task = task
+        self.owner = owner
+        self.visibility = visibility
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        queue = WorkQueue(self.path, self.visibility)
+        try:
+            while not self.stopped.wait(self.visibility / 3):
+                try:
+                    queue.extend(self.task, self.owner)
+                except LeaseLost:
+                    self.lost = True
+                    logger.error("Lost lease on %s", self.task.url)
+                    return
+        finally:
+            queue.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def worker_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+def handle_task(task, driver, pdp):
+    """Run the existing scraper logic for one task; returns (records, follow-up tasks)."""
+    if task.kind == PAGE:
+        import fullDataLayerCatSync
+        page = fullDataLayerCatSync.scrape_page(task.url, driver)
+        if page is None:
+            raise RuntimeError('page fetch failed')
+        records, next_url = page  # an empty last page is still a finished task
+        follow_ups = [(next_url, PAGE, 1)] if next_url else []
+        if pdp:
+            follow_ups += [(record['url'], PDP, 0) for record in records if record.get('url')]
+        return records, follow_ups
+    import currysPDPScrapeSelenium
+    record = currysPDPScrapeSelenium.scrape_product_detail(task.url, driver)
+    if record is None:
+        raise RuntimeError('no product detail extracted')
+    return [record], []
+
+def run_worker(path, kinds=(PAGE, PDP), visibility=VISIBILITY_TIMEOUT, max_tasks=None, idle_exit=60, pdp=False):
+    """Lease and process tasks until the queue stays empty for `idle_exit` seconds."""
+    import fullDataLayerCatSync
+    from browserDaemon import close_driver
+    from driverLifecycle import DriverManager
+
+    owner = worker_id()
+    done = 0
+    idle_since = None
+    manager = DriverManager(fullDataLayerCatSync.setup_driver, close_driver)
+    with WorkQueue(path, visibility) as queue:
+        try:
+            while max_tasks is None or done < max_tasks:
+                task = queue.lease(owner, kinds)
+                if task is None:
+                    idle_since = idle_since or time.time()
+                    if time.time() - idle_since > idle_exit or not queue.pending():
+                        break
+                    time.sleep(2)
+                    continue
+                idle_since = None
+                logger.info("Leased %s %s (attempt %s)", task.kind, task.url, task.attempts)
+                heartbeat = Heartbeat(path, task, owner, visibility)
+                heartbeat.start()
+                started = time.perf_counter()
+                try:
+                    # A page that overruns the deadline kills its browser and raises PageTimeout: the task is requeued
+                    with manager.deadline(task.url) as driver:
+                        records, follow_ups = handle_task(task, driver, pdp)
+                except Exception as e:
+                    heartbeat.stop()
+                    queue.fail(task, owner, e)
+                else:
+                    heartbeat.stop()
+                    if heartbeat.lost:
+                        logger.warning("Dropping results for %s: lease was taken over", task.url)
+                    else:
+                        try:
+                            queue.complete(task, owner, records, follow_ups, time.perf_counter() - started)
+                        except LeaseLost:
+                            logger.warning("Dropping results for %s: lease was taken over", task.url)
+                done += 1
+                manager.page_done()
+        finally:
+            manager.close()
+    metrics.log_summary()
+    logger.info("Worker %s finished after %s tasks", owner, done)
+    return done
+
+def export_results(path, csv_path='apple_products_dataLayer.csv', pdp_csv_path='apple_products.csv'):
+    """Write every stored record once to the same outputs the single-process scrapers produce."""
+    import csv
+    from productSchema import write_products_csv
+    from columnarSink import write_catalogue
+    from priceHistory import PriceHistory
+    from recrawlScheduler import RecrawlScheduler
+    from pdpExtractor import PDP_FIELDS
+
+    with WorkQueue(path) as queue:
+        by_category = {}
+        for category_url, record in queue.results(PAGE):
+            by_category.setdefault(category_url, []).append(record)
+        pdp_records = [record for _, record in queue.results(PDP)]
+        seconds = queue.category_seconds()
+
+    records = [record for category in by_category.values() for record in category]
+    write_products_csv(csv_path, records, mode='w', encoding='utf-8')
+    write_catalogue(records)
+    scraped_at = int(time.time())
+    with PriceHistory() as history:
+        history.record_run(records, scraped_at)
+        scheduler = RecrawlScheduler(history)
+        for category_url, category_records in by_category.items():
+            scheduler.record_crawl(category_url, category_records, seconds.get(category_url) or 0, scraped_at)
+    if pdp_records:
+        with open(pdp_csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=PDP_FIELDS)
+            writer.writeheader()
+            writer.writerows(pdp_records)
+    logger.info("Exported %s listing records and %s PDP records", len(records), len(pdp_records))
+    return len(records), len(pdp_records)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Durable work queue for multi-process / multi-host crawls")
+    parser.add_argument('--db', default=QUEUE_DB)
+    parser.add_argument('--multi-host', action='store_true',
+                        help="Workers on several hosts share --db: use the rollback journal instead of WAL")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_cmd = commands.add_parser('seed', help="Queue category first pages")
+    seed_cmd.add_argument('category_urls', nargs='+')
+    seed_cmd.add_argument('--fresh', action='store_true', help="Drop the previous crawl's tasks and results first")
+
+    worker_cmd = commands.add_parser('worker', help="Lease and scrape tasks until the queue drains")
+    worker_cmd.add_argument('--kind', action='append', choices=[PAGE, PDP], help="Task kinds to take (default: both)")
+    worker_cmd.add_argument('--pdp', action='store_true', help="Queue a PDP task for every product found on listing pages")
+    worker_cmd.add_argument('--visibility', type=float, default=VISIBILITY_TIMEOUT)
+    worker_cmd.add_argument('--max-tasks', type=int)
+    worker_cmd.add_argument('--idle-exit', type=float, default=60, help="Exit after this long without work")
+
+    commands.add_parser('status', help="Task counts by kind and state")
+    commands.add_parser('export', help="Write stored records to CSV, the catalogue and the price history")
+    args = parser.parse_args(argv)
+    if args.multi_host:
+        os.environ[MULTI_HOST_ENV] = '1'  # also read by each worker's heartbeat connection
+
+    if args.command == 'worker':
+        from scraperLogging import setup_logging
+        setup_logging('worker')
+        run_worker(args.db, tuple(args.kind or (PAGE, PDP)), args.visibility, args.max_tasks, args.idle_exit, args.pdp)
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'seed':
+        with WorkQueue(args.db) as queue:
+            if args.fresh:
+                queue.reset()
+            added = sum(queue.enqueue(url, PAGE, category_url=url, priority=1) for url in args.category_urls)
+        print(f"Queued {added} category pages")
+    elif args.command == 'status':
+        with WorkQueue(args.db) as queue:
+            for (kind, state), n in sorted(queue.counts().items()):
+                print(f"{kind}\t{state}\t{n}")
+    elif args.command == 'export':
+        export_results(args.db)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())